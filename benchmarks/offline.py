@@ -0,0 +1,112 @@
+#!/usr/bin/env python
+"""Runs the Cosmid CLI against an in-memory FTP server
+
+Lets the startup benchmark time the commands that talk to servers (clone,
+update) without depending on the network. The server only hosts the
+"example" resource.
+
+Usage:
+  offline.py <cosmid arguments>...
+"""
+import ftplib
+import gzip
+import os
+import runpy
+import sys
+from StringIO import StringIO
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+SCRIPT = os.path.join(ROOT, "scripts", "cosmid")
+
+
+def gzipped(data):
+  """Returns the data gzip compressed."""
+  buffer = StringIO()
+  with gzip.GzipFile(fileobj=buffer, mode="wb", mtime=0) as handle:
+    handle.write(data)
+
+  return buffer.getvalue()
+
+
+FILES = {}
+for version in ("2.5", "2.8"):
+  folder = "bundle/{}/exampleFASTA/".format(version)
+  FILES[folder + "exampleBAM.bam"] = "BAM\1" * 256
+  FILES[folder + "exampleBAM.bam.bai.gz"] = gzipped("BAI\1")
+  FILES[folder + "exampleFASTA.fasta.fai.gz"] = gzipped("chr1\t8\t6\t4\t5\n")
+  FILES[folder + "exampleFASTA.fasta.gz"] = gzipped(">chr1\nACGT\nACGT\n")
+
+
+class Data(object):
+  """Data connection streaming (the rest of) a file."""
+  def __init__(self, data):
+    super(Data, self).__init__()
+    self.handle = StringIO(data)
+
+  def recv(self, size):
+    return self.handle.read(size)
+
+  def makefile(self, *args):
+    return self.handle
+
+  def close(self):
+    pass
+
+
+class Server(object):
+  """Stands in for :class:`ftplib.FTP` serving ``FILES``."""
+  def __init__(self, host=None, user=None, passwd=None, *args, **kwargs):
+    super(Server, self).__init__()
+
+  def _find(self, dl_path):
+    if dl_path not in FILES:
+      raise ftplib.error_perm("550 No such file")
+
+    return FILES[dl_path]
+
+  def voidcmd(self, command):
+    return "200 OK"
+
+  def sendcmd(self, command):
+    if command.startswith("MDTM "):
+      self._find(command[5:])
+      return "213 20140101000000"
+
+    return "200 OK"
+
+  def size(self, dl_path):
+    return len(self._find(dl_path))
+
+  def nlst(self, dir_path):
+    prefix = dir_path.rstrip("/") + "/"
+
+    return sorted(set(prefix + name[len(prefix):].split("/")[0]
+                      for name in FILES if name.startswith(prefix)))
+
+  def transfercmd(self, command, rest=None):
+    return Data(self._find(command[5:])[int(rest or 0):])
+
+  def retrbinary(self, command, callback, blocksize=8192, rest=None):
+    data = self._find(command[5:])[int(rest or 0):]
+    for start in range(0, len(data), blocksize):
+      callback(data[start:start + blocksize])
+
+    return "226 Transfer complete"
+
+  def voidresp(self):
+    return "226 Transfer complete"
+
+  def abort(self):
+    return "426 Transfer aborted"
+
+  def quit(self):
+    pass
+
+  def close(self):
+    pass
+
+
+if __name__ == "__main__":
+  ftplib.FTP = Server
+  sys.argv = ["cosmid"] + sys.argv[1:]
+  runpy.run_path(SCRIPT, run_name="__main__")
@@ -0,0 +1,119 @@
+#!/usr/bin/env python
+"""Cosmid startup benchmark
+
+Times how long commands take to run from a cold interpreter and compares
+them with a saved baseline. Timings are relative to a reference run (just
+importing the command line parser) measured at the same time, so baselines
+carry over between machines. Exits with a non-zero status if any command
+got slower than the baseline allows for.
+
+"clone" and "update" run in a throwaway project against an in-memory server
+(see "offline.py") holding the "example" resource.
+
+Usage:
+  startup.py [options]
+
+Options:
+  -h --help             Show this screen
+  -n --runs=<n>         Number of runs per command [default: 10]
+  -b --baseline=<file>  Baseline timings [default: benchmarks/startup.json]
+  -t --tolerance=<x>    Allowed slowdown relative to baseline [default: 0.25]
+  --save                Write the timings as the new baseline
+"""
+from __future__ import print_function
+
+import json
+import os
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+
+from docopt import docopt
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+SCRIPT = os.path.join(ROOT, "scripts", "cosmid")
+OFFLINE = os.path.join(ROOT, "benchmarks", "offline.py")
+
+# What every command pays for regardless of Cosmid
+REFERENCE = ["-c", "import docopt"]
+
+COMMANDS = [[SCRIPT, "--version"], [SCRIPT, "--help"], [SCRIPT, "list"],
+            [SCRIPT, "search", "ensembl"],
+            [OFFLINE, "clone", "example#2.8", "--dry"],
+            [OFFLINE, "update", "--dry"]]
+
+
+def timeit(arguments, runs, cwd=None):
+  """
+  Returns the median wall time (ms) of running the interpreter.
+  """
+  # Benchmark this checkout rather than whatever is installed
+  env = dict(os.environ)
+  env["PYTHONPATH"] = os.pathsep.join([ROOT, env.get("PYTHONPATH", "")])
+
+  timings = []
+  with open(os.devnull, "w") as devnull:
+    for _ in range(runs):
+      start = time.time()
+      status = subprocess.call([sys.executable] + arguments, stdout=devnull,
+                               stderr=devnull, env=env, cwd=cwd)
+      timings.append((time.time() - start) * 1000)
+
+      if status != 0:
+        sys.exit("Failed running: {}".format(" ".join(arguments)))
+
+  timings.sort()
+
+  return timings[len(timings) // 2]
+
+
+def main(args):
+  runs = int(args["--runs"])
+  tolerance = float(args["--tolerance"])
+
+  # Something for "update" to check and the OS file cache warmed up
+  project = tempfile.mkdtemp(prefix="cosmid-benchmark.")
+  try:
+    timeit([OFFLINE, "clone", "example#2.8"], 1, cwd=project)
+    timeit([SCRIPT, "search", "ensembl"], 1)
+
+    reference = timeit(REFERENCE, runs)
+
+    timings = {}
+    for command in COMMANDS:
+      name = " ".join(command[1:])
+      timings[name] = round(timeit(command, runs, cwd=project) / reference, 2)
+
+  finally:
+    shutil.rmtree(project)
+
+  if args["--save"]:
+    with open(args["--baseline"], "w") as handle:
+      json.dump(timings, handle, indent=2, sort_keys=True)
+
+  baseline = {}
+  if os.path.exists(args["--baseline"]):
+    with open(args["--baseline"], "r") as handle:
+      baseline = json.load(handle)
+
+  print("{0:<27} {1:>7.1f} ms".format("reference", reference))
+
+  regressions = []
+  for command in sorted(timings):
+    limit = baseline.get(command, float("inf")) * (1 + tolerance)
+    status = "ok" if timings[command] <= limit else "SLOWER"
+
+    print("{0:<27} {1:>7.2f} x  (baseline {2} x) {3}"
+          .format(command, timings[command], baseline.get(command), status))
+
+    if status != "ok":
+      regressions.append(command)
+
+  if regressions:
+    sys.exit("Startup got slower: {}".format(", ".join(regressions)))
+
+
+if __name__ == "__main__":
+  main(docopt(__doc__))
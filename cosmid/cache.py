@@ -0,0 +1,418 @@
+#!/usr/bin/env python
+"""
+Caches for lookups that are slow to repeat: remote listings and things
+derived from the bundled resource modules.
+"""
+import fnmatch
+import hashlib
+import json
+import marshal
+import os
+import threading
+import time
+from stat import S_IWGRP, S_IWOTH
+
+from magicmethods import atomic_write
+
+
+class ListingCache(object):
+  """
+  Persistent cache of remote directory listings keyed by ``(host, path)``.
+  Entries expire after ``ttl`` seconds and the least recently used entries
+  are evicted once there are more than ``limit`` of them.
+
+  The cache is kept in memory until it's pointed to a file with
+  :meth:`load`; nothing is persisted before then. A directory is only
+  listed once at a time: concurrent lookups wait for the listing in flight.
+
+  .. code-block:: python
+
+    >>> listings.load("resources/.cosmid.listings")
+    >>> listings.fetch("ftp.ensembl.org", "pub", lambda: ftp.nlst("pub"))
+
+  .. versionadded:: 0.5.0
+
+  :param int ttl: (optional) Seconds before a listing is fetched again
+  :param int limit: (optional) Max number of listings to keep
+  """
+  def __init__(self, ttl=3600, limit=512):
+    super(ListingCache, self).__init__()
+    self.ttl = ttl
+    self.limit = limit
+
+    # Ignore cached listings (but still store fresh ones)
+    self.refresh = False
+
+    self.source = None
+    self.entries = {}
+    self.changed = False
+    self.lock = threading.Lock()
+
+    # Listings already refreshed; they're not fetched again
+    self.refreshed = set()
+
+    # Listings being fetched: ``{ key: threading.Event }``
+    self.pending = {}
+
+  def load(self, source):
+    """
+    <public> Loads cached listings from a file which is also where they will
+    be saved. A missing or broken file results in an empty cache.
+
+    :param str source: Path to the cache file
+    :returns: self
+    """
+    self.source = source
+
+    try:
+      with open(source, "r") as handle:
+        entries = json.load(handle)
+
+    except (IOError, ValueError):
+      entries = {}
+
+    with self.lock:
+      self.entries = entries if isinstance(entries, dict) else {}
+
+    return self
+
+  def fetch(self, host, dir_path, lister):
+    """
+    <public> Returns the cached listing for a directory unless it has
+    expired, in which case ``lister`` is called to fetch a fresh one.
+
+    :param str host: URL of the server
+    :param str dir_path: Path to the directory on the server
+    :param function lister: Returns a fresh listing as a list
+    :returns: The directory listing
+    :rtype: list
+    """
+    key = self._key(host, dir_path)
+
+    while True:
+      now = time.time()
+
+      with self.lock:
+        entry = self.entries.get(key)
+
+        if (entry is not None and
+            (key in self.refreshed or not self.refresh) and
+            now - entry["fetched"] < self.ttl):
+          entry["used"] = now
+          return list(entry["items"])
+
+        event = self.pending.get(key)
+        if event is None:
+          # It's up to us to list the directory
+          self.pending[key] = threading.Event()
+          break
+
+      # Someone else is already listing it; check again once they're done
+      event.wait()
+
+    try:
+      items = list(lister())
+
+      with self.lock:
+        self.entries[key] = {"items": items, "fetched": now, "used": now}
+        if self.refresh:
+          self.refreshed.add(key)
+        self.changed = True
+        self._evict()
+
+    finally:
+      with self.lock:
+        self.pending.pop(key).set()
+
+    return list(items)
+
+  def save(self):
+    """
+    <public> Writes the cache to its file if anything has changed. The file
+    is replaced atomically so a crash can't leave it half written.
+
+    :returns: self
+    """
+    with self.lock:
+      if not (self.source and self.changed):
+        return self
+
+      folder = os.path.dirname(self.source)
+      if folder and not os.path.isdir(folder):
+        # Nowhere to save it (yet)
+        return self
+
+      with atomic_write(self.source) as handle:
+        json.dump(self.entries, handle)
+      self.changed = False
+
+    return self
+
+  def _evict(self):
+    """
+    <private> Drops the least recently used entries above the limit. Must be
+    called with the lock held.
+    """
+    overflow = len(self.entries) - self.limit
+
+    if overflow > 0:
+      oldest = sorted(self.entries, key=lambda key: self.entries[key]["used"])
+      for key in oldest[:overflow]:
+        del self.entries[key]
+
+  def _key(self, host, dir_path):
+    """
+    <private> JSON friendly key for a directory on a server.
+    """
+    return "{host}/{path}".format(host=host, path=dir_path.strip("/"))
+
+
+# Shared by all servers in the process
+listings = ListingCache()
+
+
+def fingerprint(folder, pattern="*.py"):
+  """
+  Cheap signature of the files in a folder (names, sizes and modification
+  times) that changes whenever one of them is edited, added or removed.
+
+  .. versionadded:: 0.5.0
+
+  :param str folder: Path to the folder
+  :param str pattern: (optional) Glob pattern of files to include
+  :returns: Hex digest
+  :rtype: str
+  """
+  signature = hashlib.md5()
+
+  for name in sorted(fnmatch.filter(os.listdir(folder), pattern)):
+    stat = os.stat(os.path.join(folder, name))
+    signature.update("{} {} {}\n".format(name, stat.st_size, stat.st_mtime))
+
+  return signature.hexdigest()
+
+
+class PackageCache(object):
+  """
+  JSON cache of data derived from the package itself (like the resource
+  modules) that stays valid for as long as the ``fingerprint`` does. It's
+  kept next to the package when that's writable and otherwise in
+  "~/.cache/cosmid".
+
+  .. code-block:: python
+
+    >>> cache = PackageCache("search")
+    >>> data = cache.load(fingerprint(resources.__path__[0]))
+
+  .. versionadded:: 0.5.0
+
+  :param str name: Name of the cache
+  """
+  def __init__(self, name):
+    super(PackageCache, self).__init__()
+    self.name = name
+    self.folders = [
+      os.path.dirname(os.path.abspath(__file__)),
+      os.path.join(os.path.expanduser("~"), ".cache", "cosmid")
+    ]
+
+  def load(self, fingerprint):
+    """
+    <public> Returns the cached data unless it's missing or out of date.
+
+    :param str fingerprint: Signature of what the data was derived from
+    :returns: The cached data or ``None``
+    """
+    for folder in self.folders:
+      try:
+        with open(self._path(folder), "r") as handle:
+          cached = json.load(handle)
+
+      except (IOError, ValueError):
+        continue
+
+      if isinstance(cached, dict) and cached.get("fingerprint") == fingerprint:
+        return cached.get("data")
+
+    return None
+
+  def save(self, fingerprint, data):
+    """
+    <public> Writes the data to the first writable location. Failing to do
+    so is ignored; the data is simply derived again next time.
+
+    :param str fingerprint: Signature of what the data was derived from
+    :param object data: JSON serializable data
+    :returns: Path to the cache file or ``None``
+    """
+    for folder in self.folders:
+      source = self._path(folder)
+
+      try:
+        if not os.path.isdir(folder):
+          os.makedirs(folder)
+
+        with atomic_write(source) as handle:
+          json.dump({"fingerprint": fingerprint, "data": data}, handle)
+
+      except (IOError, OSError):
+        continue
+
+      return source
+
+    return None
+
+  def _path(self, folder):
+    """
+    <private> Path to the cache file in a folder.
+    """
+    return os.path.join(folder, ".{}.json".format(self.name))
+
+
+class ParseCache(object):
+  """
+  Cache of parsed files (like YAML configs) keyed by their path,
+  modification time and size. Hits are kept in memory for the rest of the
+  process and written to "~/.cache/cosmid/parsed" for later runs. Every
+  lookup returns a fresh copy that is safe to modify.
+
+  The copies are stored with :mod:`marshal` rather than :mod:`pickle` so
+  loading them can't run code, and only files owned (and only writable)
+  by the current user are read. Data that :mod:`marshal` can't store (like
+  the dates YAML can hold) simply isn't cached.
+
+  .. code-block:: python
+
+    >>> items = parsed.fetch("cosmid.yaml", parse_yaml)
+
+  .. versionadded:: 0.5.0
+
+  :param str folder: (optional) Where to keep the cached copies
+  """
+  def __init__(self, folder=None):
+    super(ParseCache, self).__init__()
+    self.folder = folder or os.path.join(os.path.expanduser("~"), ".cache",
+                                         "cosmid", "parsed")
+
+    # ``{ path: (signature, marshalled data) }``
+    self.memory = {}
+    self.lock = threading.Lock()
+
+  def fetch(self, file_path, parse):
+    """
+    <public> Returns what the file was parsed into last time unless it has
+    changed since, in which case ``parse`` is called to parse it again.
+
+    :param str file_path: Path to the file
+    :param function parse: Parses the file at the path it's passed
+    :returns: A copy of the parsed data
+    """
+    file_path = os.path.abspath(file_path)
+
+    # Taken before parsing so a change while parsing isn't missed
+    signature = self._signature(file_path)
+    cached = self._cached(file_path)
+
+    if cached is not None and cached[0] == signature:
+      return marshal.loads(cached[1])
+
+    data = parse(file_path)
+    self._store(file_path, signature, data)
+
+    return data
+
+  def save(self, file_path, data):
+    """
+    <public> Remembers what a file that was just written contains so it
+    doesn't have to be parsed again.
+
+    :param str file_path: Path to the file
+    :param object data: The data that the file holds
+    """
+    file_path = os.path.abspath(file_path)
+    self._store(file_path, self._signature(file_path), data)
+
+  def _cached(self, file_path):
+    """
+    <private> Looks up the cached copy of a file, in memory first.
+    """
+    with self.lock:
+      cached = self.memory.get(file_path)
+
+    if cached is None:
+      try:
+        with open(self._path(file_path), "rb") as handle:
+          if not self._trusted(os.fstat(handle.fileno())):
+            return None
+
+          cached = marshal.load(handle)
+
+      except Exception:
+        return None
+
+      with self.lock:
+        self.memory[file_path] = cached
+
+    return cached
+
+  def _store(self, file_path, signature, data):
+    """
+    <private> Keeps a copy of parsed data in memory and on disk. Failing to
+    write it to disk is ignored.
+    """
+    if signature is None:
+      return
+
+    try:
+      cached = (signature, marshal.dumps(data))
+
+    except ValueError:
+      # Holds something marshal can't store
+      return
+
+    with self.lock:
+      self.memory[file_path] = cached
+
+    source = self._path(file_path)
+
+    try:
+      if not os.path.isdir(self.folder):
+        os.makedirs(self.folder)
+
+      with atomic_write(source, "wb") as handle:
+        marshal.dump(cached, handle)
+
+    except (IOError, OSError):
+      pass
+
+  def _signature(self, file_path):
+    """
+    <private> Modification time and size of a file or ``None`` if missing.
+    """
+    try:
+      stat = os.stat(file_path)
+
+    except OSError:
+      return None
+
+    return (stat.st_mtime, stat.st_size)
+
+  def _trusted(self, stat):
+    """
+    <private> Whether a cached copy can only have been written by the
+    current user.
+    """
+    return (stat.st_uid == os.getuid() and
+            not stat.st_mode & (S_IWGRP | S_IWOTH))
+
+  def _path(self, file_path):
+    """
+    <private> Path to the cached copy of a file.
+    """
+    name = hashlib.md5(file_path).hexdigest()
+
+    return os.path.join(self.folder, name + ".marshal")
+
+
+# Shared by all readers in the process
+parsed = ParseCache()
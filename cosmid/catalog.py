@@ -0,0 +1,221 @@
+#!/usr/bin/env python
+"""
+Static catalog of the bundled resources.
+
+The resource modules are parsed (not imported) to find out what each
+resource is called, what it contains and which server it's downloaded
+from. Listing or matching resources therefore never runs resource code,
+imports its dependencies or touches the network.
+"""
+import ast
+import os
+
+
+def parse(file_path):
+  """
+  Parses a Python module without importing it.
+
+  .. versionadded:: 0.5.0
+
+  :param str file_path: Path to the module
+  :returns: The syntax tree or ``None`` if it can't be parsed
+  :rtype: :class:`ast.Module`
+  """
+  try:
+    with open(file_path, "r") as handle:
+      return ast.parse(handle.read(), file_path)
+
+  except (IOError, SyntaxError):
+    return None
+
+
+def evaluate(node):
+  """
+  Evaluates simple expressions like literals and the list comprehensions
+  used to name chromosome files, without access to any names but ``range``.
+
+  .. versionadded:: 0.5.0
+
+  :param ast.expr node: Expression to evaluate
+  :returns: The value or ``None`` if it can't be worked out statically
+  """
+  try:
+    return ast.literal_eval(node)
+
+  except ValueError:
+    pass
+
+  try:
+    code = compile(ast.Expression(node), "<catalog>", "eval")
+    return eval(code, {"__builtins__": {}, "range": range})
+
+  except Exception:
+    return None
+
+
+class Catalog(object):
+  """
+  Describes the resources in a folder of resource modules (and the servers
+  in a folder of server modules) by reading their syntax trees.
+
+  .. code-block:: python
+
+    >>> catalog = Catalog("cosmid/resources", "cosmid/servers")
+    >>> catalog.describe()["ccds"]["host"]
+    'ftp.ncbi.nlm.nih.gov'
+
+  .. versionadded:: 0.5.0
+
+  :param str folder: Path to the resource modules
+  :param str servers: Path to the server modules
+  """
+  def __init__(self, folder, servers):
+    super(Catalog, self).__init__()
+    self.folder = folder
+    self.servers = servers
+
+    # Parsed modules by name
+    self.modules = {}
+
+  def describe(self):
+    """
+    <public> Describes every resource module in the folder.
+
+    :returns: ``{ module_name: { "id", "doc", "server", "host", "names",
+              "parts" } }``
+    :rtype: dict
+    """
+    entries = {}
+
+    for file_name in sorted(os.listdir(self.folder)):
+      name, extension = os.path.splitext(file_name)
+
+      if extension != ".py" or name.startswith("_"):
+        continue
+
+      entry = self.resource(name)
+      if entry is not None:
+        entries[name] = entry
+
+    return entries
+
+  def resource(self, name):
+    """
+    <public> Describes a single resource module. Attributes set in the
+    ``__init__`` of base resources are inherited.
+
+    :param str name: Name of the module
+    :returns: Description of the resource or ``None`` if it's not a resource
+    :rtype: dict
+    """
+    tree = self._module(self.folder, name)
+    if tree is None:
+      return None
+
+    entry = {"id": name, "doc": ast.get_docstring(tree, clean=False),
+             "server": None, "host": None, "names": None, "parts": None}
+
+    attributes = self._attributes(tree, "Resource", set())
+    if attributes is None:
+      return None
+
+    for attribute in ("id", "names", "parts"):
+      if attribute in attributes:
+        entry[attribute] = evaluate(attributes[attribute][1])
+
+    # The server is imported in whichever module sets it up
+    origin, server = attributes.get("ftp", (None, None))
+    if isinstance(server, ast.Call) and isinstance(server.func, ast.Name):
+      entry["server"] = server.func.id
+      entry["host"] = self._host(origin, server.func.id)
+
+    return entry
+
+  def _attributes(self, tree, class_name, seen):
+    """
+    <private> Collects the ``self.<attribute> = <expression>`` assignments in
+    ``__init__`` of a class, including those of its bases in the resource
+    folder, as ``{ attribute: (tree, expression) }``.
+    """
+    classes = dict((node.name, node) for node in tree.body
+                   if isinstance(node, ast.ClassDef))
+    node = classes.get(class_name)
+
+    if node is None or (id(tree), class_name) in seen:
+      return None
+
+    seen.add((id(tree), class_name))
+    attributes = {}
+
+    # Start from what the base class (possibly in another module) sets up
+    for base in node.bases:
+      if isinstance(base, ast.Name) and base.id in classes:
+        attributes.update(self._attributes(tree, base.id, seen) or {})
+
+      elif isinstance(base, ast.Name):
+        module, base_name = self._imported(tree, base.id)
+        base_tree = self._module(self.folder, module) if module else None
+
+        if base_tree is not None:
+          attributes.update(
+            self._attributes(base_tree, base_name, seen) or {})
+
+    for method in node.body:
+      if isinstance(method, ast.FunctionDef) and method.name == "__init__":
+        for statement in ast.walk(method):
+          if not isinstance(statement, ast.Assign):
+            continue
+
+          for target in statement.targets:
+            if (isinstance(target, ast.Attribute) and
+                isinstance(target.value, ast.Name) and
+                target.value.id == "self"):
+              attributes[target.attr] = (tree, statement.value)
+
+    return attributes
+
+  def _imported(self, tree, alias):
+    """
+    <private> Finds which sibling module and name an imported alias refers
+    to, e.g. ``from example import Resource as iResource``.
+    """
+    for node in tree.body:
+      if isinstance(node, ast.ImportFrom):
+        for imported in node.names:
+          if (imported.asname or imported.name) == alias:
+            module = (node.module or "").split(".")[-1]
+            return module, imported.name
+
+    return None, None
+
+  def _host(self, tree, server_name):
+    """
+    <private> Looks up the host that a server class connects to from the
+    first argument of its ``super(...).__init__`` call.
+    """
+    module, class_name = self._imported(tree, server_name)
+    server_tree = self._module(self.servers, module) if module else None
+
+    if server_tree is None:
+      return None
+
+    for node in server_tree.body:
+      if isinstance(node, ast.ClassDef) and node.name == class_name:
+        for call in ast.walk(node):
+          if (isinstance(call, ast.Call) and
+              isinstance(call.func, ast.Attribute) and
+              call.func.attr == "__init__" and call.args):
+            return evaluate(call.args[0])
+
+    return None
+
+  def _module(self, folder, name):
+    """
+    <private> Parses (and remembers) a module in a folder.
+    """
+    file_path = os.path.join(folder, name + ".py")
+
+    if file_path not in self.modules:
+      self.modules[file_path] = parse(file_path)
+
+    return self.modules[file_path]
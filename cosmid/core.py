@@ -3,24 +3,500 @@
 from __future__ import print_function
 from __future__ import division
 
-import ftplib
+import atexit
+import contextlib
+import json
+import os
+import threading
+import time
 from fnmatch import fnmatch
-from StringIO import StringIO
-import pkgutil
 import importlib
-from path import path
-from fuzzywuzzy import process
 
 import resources
-from magicmethods import load_class
+import servers
+from cache import fingerprint, listings, PackageCache
+from catalog import Catalog
+from magicmethods import cached_property, lazy_import, load_class
+from streams import Checksum, FastaIndex, Gunzip
 from yml import ConfigReader, HistoryReader
 from messenger import Messenger
+from search import SearchIndex
+
+# Imported on first use to keep the CLI quick to start
+ftplib = lazy_import("ftplib")
+path = lazy_import("path", "path")
+process = lazy_import("fuzzywuzzy.process")
+
+
+class ConnectionPool(object):
+  """
+  Process-wide pool of logged in FTP sessions. Connections are opened on
+  first use and reused between calls for the same ``(url, username)``. Idle
+  sessions that have gone stale are replaced with fresh ones and the number
+  of open connections per host is capped.
+
+  .. code-block:: python
+
+    >>> with pool.session("ftp.ensembl.org", "anonymous", "") as ftp:
+    ...   ftp.nlst("pub")
+
+  .. versionadded:: 0.5.0
+
+  :param int limit: (optional) Max number of open connections per host
+  """
+  def __init__(self, limit=4):
+    super(ConnectionPool, self).__init__()
+    self.limit = limit
+
+    # Logged in, unused sessions: ``{ (url, username): [ftplib.FTP, ...] }``
+    self.idle = {}
+
+    # Number of open (idle + leased) connections per host: ``{ url: int }``
+    self.open = {}
+
+    self.lock = threading.Condition()
+
+  @contextlib.contextmanager
+  def session(self, url, username, password):
+    """
+    <public> Context manager that leases a logged in connection from the pool
+    and hands it back when done. Connections that raise anything but a
+    permanent FTP error (e.g. "550 No such file") are considered broken and
+    closed rather than reused.
+
+    :param str url: URL for the server to connect to
+    :param str username: Username for an account on the server
+    :param str password: Password to the accound on the server
+    :returns: A logged in connection
+    :rtype: :class:`ftplib.FTP`
+    """
+    connection = self.acquire(url, username, password)
+
+    try:
+      yield connection
+
+    except ftplib.error_perm:
+      # The server simply said no; the connection is still fine
+      self.release(url, username, connection)
+      raise
+
+    except:
+      self.release(url, username, connection, discard=True)
+      raise
+
+    else:
+      self.release(url, username, connection)
+
+  def acquire(self, url, username, password):
+    """
+    <public> Leases a logged in connection. Blocks while the host is at its
+    connection limit. Must be handed back with :meth:`release`.
+
+    :param str url: URL for the server to connect to
+    :param str username: Username for an account on the server
+    :param str password: Password to the accound on the server
+    :returns: A logged in connection
+    :rtype: :class:`ftplib.FTP`
+    """
+    key = (url, username)
+    connection = None
+
+    with self.lock:
+      while True:
+        if self.idle.get(key):
+          # Reuse an existing session
+          connection = self.idle[key].pop()
+          break
+
+        elif self.open.get(url, 0) < self.limit:
+          # Reserve a slot for a new connection
+          self.open[url] = self.open.get(url, 0) + 1
+          break
+
+        else:
+          # Free up a slot held by an idle session for another user
+          others = [other for other in self.idle
+                    if other[0] == url and self.idle[other]]
+
+          if others:
+            self._close(self.idle[others[0]].pop())
+            self.open[url] -= 1
+
+          else:
+            self.lock.wait()
+
+    # Make sure the idle session is still alive; reuse the slot otherwise
+    if connection is not None:
+      if self._alive(connection):
+        return connection
+
+      self._close(connection)
+
+    try:
+      return ftplib.FTP(url, username, password)
+
+    except:
+      # Give up the reserved slot
+      with self.lock:
+        self.open[url] -= 1
+        self.lock.notify_all()
+
+      raise
+
+  def release(self, url, username, connection, discard=False):
+    """
+    <public> Hands a leased connection back to the pool.
+
+    :param str url: URL for the server the connection belongs to
+    :param str username: Username the connection is logged in with
+    :param ftplib.FTP connection: The connection to hand back
+    :param bool discard: (optional) Close the connection instead of reusing it
+    """
+    with self.lock:
+      if discard:
+        self._close(connection)
+        self.open[url] -= 1
+
+      else:
+        self.idle.setdefault((url, username), []).append(connection)
+
+      self.lock.notify_all()
+
+  def closeAll(self):
+    """
+    <public> Logs out and closes all idle connections.
+    """
+    with self.lock:
+      for key, connections in self.idle.iteritems():
+        for connection in connections:
+          self._close(connection, polite=True)
+          self.open[key[0]] -= 1
+
+      self.idle = {}
+      self.lock.notify_all()
+
+  def _alive(self, connection):
+    """
+    <private> Checks whether an idle connection is still usable.
+
+    :param ftplib.FTP connection: The connection to check
+    :returns: ANS: The server responded
+    :rtype: bool
+    """
+    try:
+      connection.voidcmd("NOOP")
+      return True
+
+    except (ftplib.all_errors + (EOFError,)):
+      return False
+
+  def _close(self, connection, polite=False):
+    """
+    <private> Closes a connection, optionally saying goodbye first.
+
+    :param ftplib.FTP connection: The connection to close
+    :param bool polite: (optional) Send "QUIT" before closing
+    """
+    try:
+      if polite:
+        connection.quit()
+      else:
+        connection.close()
+
+    except (ftplib.all_errors + (EOFError,)):
+      connection.close()
+
+
+# All connections in the process are shared through this pool
+pool = ConnectionPool()
+atexit.register(pool.closeAll)
+
+
+class Scheduler(object):
+  """
+  Keeps all transfers in the process within a global bandwidth ceiling
+  (a token bucket shared by every download) and caps the number of
+  simultaneous transfers per host.
+
+  .. code-block:: python
+
+    >>> scheduler.configure(bandwidth=50000000,
+    ...                     transfers={"ftp.ncbi.nlm.nih.gov": 2})
+    >>> with scheduler.transfer("ftp.ncbi.nlm.nih.gov"):
+    ...   ftp.retrbinary("RETR " + path, scheduler.metered(handle.write))
+
+  .. versionadded:: 0.5.0
+
+  :param int bandwidth: (optional) Max bytes/sec for all transfers together
+  :param object transfers: (optional) Max simultaneous transfers; either one
+                           number for all hosts or ``{ host: number }`` with
+                           an optional "default" key
+  :param function clock: (optional) Returns the current time in seconds
+  :param function sleep: (optional) Waits for a number of seconds
+  """
+  def __init__(self, bandwidth=None, transfers=None, clock=time.time,
+               sleep=time.sleep):
+    super(Scheduler, self).__init__()
+    self.configure(bandwidth, transfers)
+    self.clock = clock
+    self.sleep = sleep
+
+    # Number of running transfers: ``{ host: int }``
+    self.active = {}
+    self.lock = threading.Condition()
+
+    # The token bucket
+    self.tokens = 0
+    self.stamp = self.clock()
+    self.bucket = threading.Lock()
+
+  def configure(self, bandwidth=None, transfers=None):
+    """
+    <public> Updates the limits. ``None`` means unlimited.
+
+    :param int bandwidth: (optional) Max bytes/sec for all transfers together
+    :param object transfers: (optional) Max simultaneous transfers per host
+    :returns: self
+    """
+    self.bandwidth = bandwidth and int(bandwidth)
+
+    if isinstance(transfers, dict):
+      self.transfers = dict(transfers)
+    else:
+      self.transfers = {"default": transfers}
+
+    return self
+
+  def limit(self, host):
+    """
+    <public> Returns the max number of simultaneous transfers for a host.
+
+    :param str host: URL of the server
+    :returns: The limit or ``None`` if unlimited
+    :rtype: int
+    """
+    return self.transfers.get(host, self.transfers.get("default"))
+
+  @contextlib.contextmanager
+  def transfer(self, host):
+    """
+    <public> Context manager that holds one of the transfer slots for a host.
+    Blocks while the host is at its limit.
+
+    :param str host: URL of the server
+    """
+    with self.lock:
+      while (self.limit(host) is not None and
+             self.active.get(host, 0) >= self.limit(host)):
+        self.lock.wait()
+
+      self.active[host] = self.active.get(host, 0) + 1
+
+    try:
+      yield
+
+    finally:
+      with self.lock:
+        self.active[host] -= 1
+        self.lock.notify_all()
+
+  def throttle(self, amount):
+    """
+    <public> Takes `amount` bytes worth of tokens from the bucket and sleeps
+    for as long as it takes to refill any shortfall. Allows bursts of up to
+    one second worth of data.
+
+    :param int amount: Number of bytes that were transferred
+    """
+    if not self.bandwidth:
+      return
+
+    with self.bucket:
+      now = self.clock()
+      self.tokens = min(self.bandwidth,
+                        self.tokens + (now - self.stamp) * self.bandwidth)
+      self.stamp = now
+
+      # Go into debt; later callers wait for it to be paid off
+      self.tokens -= amount
+      wait = -self.tokens / self.bandwidth if self.tokens < 0 else 0
+
+    if wait > 0:
+      self.sleep(wait)
+
+  def metered(self, callback):
+    """
+    <public> Wraps a data callback so every chunk is throttled first.
+
+    :param function callback: Called with each chunk of data
+    :returns: The wrapped callback
+    :rtype: function
+    """
+    if not self.bandwidth:
+      return callback
+
+    def throttled(chunk):
+      self.throttle(len(chunk))
+      return callback(chunk)
+
+    return throttled
+
+
+# All transfers in the process are scheduled here
+scheduler = Scheduler()
+
+
+class RemoteFile(object):
+  """
+  Read-only, line-iterable file object that streams a file from an FTP
+  server over a pooled connection. Closing the file before reaching the end
+  aborts the transfer.
+
+  .. versionadded:: 0.5.0
+
+  :param FTP ftp: The server to read from
+  :param str path: Path to the file on the server
+  :param int max_bytes: (optional) Raise ``IOError`` rather than read past
+                        this many bytes
+  """
+  def __init__(self, ftp, path, max_bytes=None):
+    super(RemoteFile, self).__init__()
+    self.ftp = ftp
+    self.path = path
+    self.max_bytes = max_bytes
+
+    self.received = 0
+    self.finished = False
+
+    # Nothing to close until the transfer has been set up
+    self.closed = True
+
+    self.connection = pool.acquire(ftp.url, ftp.username, ftp.password)
+
+    try:
+      self.connection.voidcmd("TYPE I")
+      self.data = self.connection.transfercmd("RETR " + path)
+
+    except ftplib.error_perm:
+      pool.release(ftp.url, ftp.username, self.connection)
+      raise
+
+    except:
+      pool.release(ftp.url, ftp.username, self.connection, discard=True)
+      raise
+
+    self.reader = self.data.makefile("rb")
+    self.closed = False
+
+  def __enter__(self):
+    return self
+
+  def __exit__(self, exc_type, exc_value, traceback):
+    self.close()
+
+  def __iter__(self):
+    return self
+
+  def __del__(self):
+    self.close()
+
+  def next(self):
+    """
+    <magic> Returns the next line in the file.
+    """
+    line = self.readline()
+
+    if not line:
+      raise StopIteration
+
+    return line
+
+  def read(self, size=-1):
+    """
+    <public> Reads up to `size` bytes (or the rest of the file).
+
+    :param int size: (optional) Max number of bytes to read
+    :returns: The data that was read; empty at the end of the file
+    :rtype: str
+    """
+    return self._consume(self.reader.read(self._limit(size)))
+
+  def readline(self, size=-1):
+    """
+    <public> Reads the next line, including the trailing newline.
+
+    :param int size: (optional) Max number of bytes to read
+    :returns: The line; empty at the end of the file
+    :rtype: str
+    """
+    return self._consume(self.reader.readline(self._limit(size)))
+
+  def close(self):
+    """
+    <public> Stops the transfer and hands the connection back to the pool.
+    A transfer that's aborted before the end of the file is cancelled with
+    "ABOR". The server answers that with two replies of which
+    :meth:`ftplib.FTP.abort` only reads one, so the connection is closed
+    rather than reused.
+    """
+    if self.closed:
+      return
+
+    self.closed = True
+    self.reader.close()
+    self.data.close()
+
+    discard = not self.finished
+    try:
+      if self.finished:
+        self.connection.voidresp()
+      else:
+        self.connection.abort()
+
+    except (ftplib.all_errors + (EOFError,)):
+      discard = True
+
+    pool.release(self.ftp.url, self.ftp.username, self.connection,
+                 discard=discard)
+
+  def _limit(self, size):
+    """
+    <private> Caps a read so that at most one byte more than `max_bytes` is
+    read; enough to tell whether the file goes on past the limit.
+    """
+    if self.max_bytes is None:
+      return size
+
+    remaining = self.max_bytes - self.received + 1
+    return remaining if size < 0 else min(size, remaining)
+
+  def _consume(self, chunk):
+    """
+    <private> Keeps track of how much has been read.
+    """
+    if self.closed:
+      raise ValueError("I/O operation on closed file")
+
+    self.received += len(chunk)
+    scheduler.throttle(len(chunk))
+
+    if not chunk:
+      self.finished = True
+
+    elif self.max_bytes is not None and self.received > self.max_bytes:
+      self.close()
+      raise IOError("'{path}' is larger than {limit} bytes"
+                    .format(path=self.path, limit=self.max_bytes))
+
+    return chunk
 
 
 class FTP(object):
   """
   Model of a basic FTP server. Inherits a few methods from class:`ftplib.FTP`
   as well as extends with a few new methods making it more like `ftputil`.
+  No connection is opened until the server is first used; connections are
+  then shared through the process-wide :class:`ConnectionPool`.
 
   .. code-block::
 
@@ -38,20 +514,59 @@ class FTP(object):
   :param str username: Username for an account on the server
   :param str password: Password to the accound on the server
   """
+  # Size of the chunks to read from data connections
+  blocksize = 8192
+
+  # Smallest byte range worth opening an extra connection for (32 MB)
+  min_segment = 32 * 1024 * 1024
+
   def __init__(self, url, username, password):
     super(FTP, self).__init__()
     self.url = url
     self.username = username
     self.password = password
 
-    # Connect to the FTP server
-    self.ftp = ftplib.FTP(url, username, password)
+  def session(self):
+    """
+    <public> Leases a logged in connection to the server from the shared
+    :class:`ConnectionPool`. Nothing is opened before this is first called.
+
+    .. versionadded:: 0.5.0
+
+    :returns: Context manager yielding a :class:`ftplib.FTP` connection
+    """
+    return pool.session(self.url, self.username, self.password)
+
+  def nlst(self, *args):
+    """
+    <public> Shortcut to :meth:`ftplib.FTP.nlst` on a pooled connection.
+    """
+    with self.session() as ftp:
+      return ftp.nlst(*args)
 
-    # Shortcuts
-    self.nlst = self.ftp.nlst
-    self.retrbinary = self.ftp.retrbinary
-    self.sendcmd = self.ftp.sendcmd
-    self.size = self.ftp.size
+  def retrbinary(self, cmd, callback, *args, **kwargs):
+    """
+    <public> Shortcut to :meth:`ftplib.FTP.retrbinary` on a pooled connection.
+    The transfer is subject to the limits of the :class:`Scheduler`.
+    """
+    with scheduler.transfer(self.url):
+      with self.session() as ftp:
+        return ftp.retrbinary(cmd, scheduler.metered(callback), *args,
+                              **kwargs)
+
+  def sendcmd(self, cmd):
+    """
+    <public> Shortcut to :meth:`ftplib.FTP.sendcmd` on a pooled connection.
+    """
+    with self.session() as ftp:
+      return ftp.sendcmd(cmd)
+
+  def size(self, path):
+    """
+    <public> Shortcut to :meth:`ftplib.FTP.size` on a pooled connection.
+    """
+    with self.session() as ftp:
+      return ftp.size(path)
 
   def ls(self, dir_path="."):
     """
@@ -59,29 +574,36 @@ class FTP(object):
     in a specific directory. Compared to `nlst` it doesn't return the full
     path for each file/folder.
 
+    Listings are cached (see :data:`cosmid.cache.listings`).
+
     :param str dir_path: (optional) Path to directory
     :returns: List of files/folders in the directory
     :rtype: list
     """
-    return [path_.split("/")[-1] for path_ in self.nlst(dir_path)]
+    return listings.fetch(self.url, dir_path, lambda: [
+      path_.split("/")[-1] for path_ in self.nlst(dir_path)])
 
-  def file(self, path):
+  def file(self, path, max_bytes=None):
     """
     <public> Open a file-like object for reading txt-files on the server
-    without downloading it locally first.
+    without downloading it locally first. The file is streamed as it's read
+    so closing it early (e.g. after a couple of lines) cancels the rest of
+    the transfer.
 
-    :param str path: Path to file
-    :returns: File-like object
-    :rtype: StringIO object
-    """
-    r = StringIO()
+    .. code-block:: python
 
-    self.retrbinary("RETR " + path, r.write)
+      >>> with ftp.file("pub/CCDS/current_human/BuildInfo.current.txt") as f:
+      ...   header = f.readline()
 
-    # Rewind the "file"
-    r.seek(0)
+    .. versionchanged:: 0.5.0
+       Streams the file instead of downloading all of it up front.
 
-    return r
+    :param str path: Path to file
+    :param int max_bytes: (optional) Refuse to read more than this many bytes
+    :returns: File-like object
+    :rtype: :class:`RemoteFile`
+    """
+    return RemoteFile(self, path, max_bytes=max_bytes)
 
   def fileSize(self, path):
     """
@@ -91,10 +613,51 @@ class FTP(object):
     :returns: Size of file in megabytes
     :rtype: int
     """
-    # Switch to Binary mode (to be able to get size)
-    self.sendcmd("TYPE i")
+    return round(self.byteSize(path)/1000000, 2)
+
+  def byteSize(self, path):
+    """
+    <public> Returns the exact file size of a certain file on the server.
+
+    .. versionadded:: 0.5.0
+
+    :param str path: Path to file
+    :returns: Size of file in bytes
+    :rtype: int
+    """
+    with self.session() as ftp:
+      # Switch to Binary mode (to be able to get size)
+      ftp.sendcmd("TYPE i")
+
+      return ftp.size(path)
+
+  def stat(self, path):
+    """
+    <public> Returns the exact size and the last modification time ("MDTM")
+    of a file on the server. Either is ``None`` if the server doesn't
+    support the command.
+
+    .. versionadded:: 0.5.0
+
+    :param str path: Path to file
+    :returns: ``{ "size": <bytes>, "modified": "YYYYMMDDHHMMSS" }``
+    :rtype: dict
+    """
+    with self.session() as ftp:
+      # Switch to Binary mode (to be able to get size)
+      ftp.sendcmd("TYPE i")
+
+      try:
+        size = ftp.size(path)
+      except ftplib.error_perm:
+        size = None
+
+      try:
+        modified = ftp.sendcmd("MDTM " + path).split()[-1]
+      except ftplib.error_perm:
+        modified = None
 
-    return round(self.size(path)/1000000, 2)
+    return {"size": size, "modified": modified}
 
   def listFiles(self, dirPath, pattern):
     """
@@ -108,52 +671,687 @@ class FTP(object):
     """
     return [item for item in self.ls(dirPath) if fnmatch(item, pattern)]
 
-  def commit(self, fullPath, dest, mode=None):
+  def commit(self, fullPath, dest, mode=None, retries=3, segments=1,
+             decompress=False, algorithm=None, checksum=None, index=False):
     """
     <public>: Saves a file from the server, locally in the `dest`.
 
+    The file is first downloaded to "<dest>.part". If the transfer is
+    interrupted, it's resumed from the end of the partial file (using
+    "REST <offset>"), both on retry and the next time the same file is
+    committed. Which remote file (path, size and "MDTM") a partial file
+    belongs to is kept in "<dest>.part.meta"; a partial file of another
+    file or release is started over. Once complete, the size is checked
+    against the server and the partial file is renamed to `dest`.
+
+    Large files can be split into `segments` byte ranges that are downloaded
+    over separate connections at the same time. Servers that refuse "REST"
+    fall back to a single stream.
+
+    Gzipped files can also be decompressed on the fly so that `dest` ends up
+    holding the decompressed data. Such downloads can't be resumed or
+    segmented since the decompression has to start from the beginning.
+    Decompressed FASTA files can be indexed on the way ("<dest>.fai").
+
+    With an `algorithm` the file is checksummed while it's written (the
+    compressed data when decompressing). A file that doesn't match the
+    expected `checksum` is thrown away and fetched once more before giving up.
+
+    .. versionchanged:: 0.5.0
+       Resumes interrupted downloads from ".part" files, supports segmented
+       and decompressing downloads and verifies checksums.
+
     :param str fullPath: Path from the cwd to the file to download
     :param str dest: Local path+filename where you want to save the file
-    :param str mode: (optional) "b" for binary files
-    :returns: 0: OK, >0: NOT OK
+    :param str mode: (optional) Ignored; files are always written in binary
+                     mode to be able to resume at exact byte offsets
+    :param int retries: (optional) Times to resume after a dropped connection
+    :param int segments: (optional) Number of connections to split the
+                         download over
+    :param bool decompress: (optional) Gunzip the file while downloading
+    :param str algorithm: (optional) Checksum algorithm, see
+                          :class:`cosmid.streams.Checksum`
+    :param str checksum: (optional) Expected checksum of the remote file
+    :param bool index: (optional) Write a FASTA index of the decompressed
+                       file
+    :returns: The checksum of the file if `algorithm` is set, otherwise 0
+    """
+    partial = dest + ".part"
+    progress = partial + ".segments"
+    meta = partial + ".meta"
+
+    # Either is ``None`` if the server doesn't support "SIZE"/"MDTM"
+    remote = dict(self.stat(fullPath), path=fullPath)
+    expected = remote["size"]
+
+    if self._partialSource(meta) != remote:
+      # Only resume what an earlier download of this very file left behind
+      self._cleanup(partial, progress)
+
+      with open(meta, "w") as handle:
+        json.dump(remote, handle)
+
+    fai = FastaIndex() if decompress and index else None
+
+    for attempt in range(2):
+      digest = Checksum(algorithm=algorithm) if algorithm else None
+
+      self._transfer(fullPath, partial, expected, retries, segments,
+                     decompress, digest, fai)
+
+      if digest is None or checksum is None or digest.verify(checksum):
+        break
+
+      # Corrupt download; start over from scratch
+      self._cleanup(partial, progress)
+
+    else:
+      # Nothing left to resume
+      self._cleanup(meta)
+      raise IOError("Checksum mismatch for '{path}': {actual} instead of "
+                    "{expected}".format(path=fullPath,
+                                        actual=digest.hexdigest(),
+                                        expected=checksum))
+
+    # Atomically move the finished download in place
+    os.rename(partial, dest)
+    self._cleanup(meta)
+
+    if fai is not None:
+      fai.save(dest)
+
+    return digest.hexdigest() if digest else 0
+
+  def _transfer(self, fullPath, partial, expected, retries=3, segments=1,
+                decompress=False, digest=None, fai=None):
     """
-    # Is the remote file gzipped? (Binary format)
-    if mode is None:
-      if fullPath.endswith(".gz") or fullPath.endswith(".bam"):
-        mode = "b"
+    <private> Downloads a file to `partial` in the most suitable way (see
+    :meth:`commit`) and checks that it's complete.
+
+    :param str fullPath: Path from the cwd to the file to download
+    :param str partial: Local path+filename to write to
+    :param int expected: Size of the remote file in bytes (or ``None``)
+    :param int retries: (optional) Times to resume after a dropped connection
+    :param int segments: (optional) Number of connections to split the
+                         download over
+    :param bool decompress: (optional) Gunzip the file while downloading
+    :param Checksum digest: (optional) Checksum to update with the data
+    :param FastaIndex fai: (optional) Index to build of the decompressed data
+    """
+    progress = partial + ".segments"
+
+    # Segments are only worth it for large files (and need a known size).
+    # A plain partial download is resumed as a single stream.
+    segmented = expected is not None and (
+      os.path.exists(progress) or
+      (segments > 1 and expected >= segments * self.min_segment and
+       not os.path.exists(partial)))
+
+    if os.path.exists(progress) and not segmented:
+      # A segmented partial file has holes and can't simply be appended to
+      self._cleanup(partial, progress)
+
+    if decompress:
+      # Compare the size of the compressed data instead
+      actual = self._inflate(fullPath, partial, retries, digest, fai)
+
+    elif segmented:
+      try:
+        self._segmented(fullPath, partial, expected, segments, retries)
+
+        if digest is not None:
+          # Ranges arrive out of order so checksum the file afterwards
+          digest.sync(partial, expected)
+
+      except ftplib.error_perm as error:
+        if not self._restRefused(error):
+          raise
+
+        # Fall back to a single stream from the start
+        self._cleanup(partial, progress)
+        self._stream(fullPath, partial, expected, retries, digest)
+
+    else:
+      self._stream(fullPath, partial, expected, retries, digest)
+
+    if not decompress:
+      actual = os.path.getsize(partial)
+
+    if expected is not None and actual != expected:
+      raise IOError("Incomplete download of '{path}': {actual} of {expected} "
+                    "bytes".format(path=fullPath, actual=actual,
+                                   expected=expected))
+
+  def feed(self, fullPath, opener, retries=3, expected=None):
+    """
+    <public> Streams a remote file through a writer instead of saving it
+    directly. `opener` is called to get a fresh writer (with ``write`` and
+    ``close``) for every attempt since a dropped connection restarts the
+    transfer from the beginning.
+
+    .. code-block:: python
+
+      >>> ftp.feed("pub/CCDS/current_human/CCDS.current.txt",
+      ...          lambda: open("CCDS.current.txt", "wb"))
+
+    .. versionadded:: 0.5.0
+
+    :param str fullPath: Path from the cwd to the file to download
+    :param function opener: Returns a new writer to send the data to
+    :param int retries: (optional) Times to restart after a dropped connection
+    :param int expected: (optional) Size of the remote file to check against
+    :returns: Number of bytes that were downloaded
+    :rtype: int
+    """
+    attempt = 0
+    while True:
+      writer = opener()
+      received = [0]
+
+      def callback(chunk):
+        received[0] += len(chunk)
+        writer.write(chunk)
+
+      try:
+        self.retrbinary("RETR " + fullPath, callback)
+        writer.close()
+        break
+
+      except ftplib.error_perm:
+        raise
+
+      except (ftplib.all_errors + (EOFError,)):
+        attempt += 1
+        if attempt > retries:
+          raise
+
+    if expected is not None and received[0] != expected:
+      raise IOError("Incomplete download of '{path}': {actual} of {expected} "
+                    "bytes".format(path=fullPath, actual=received[0],
+                                   expected=expected))
+
+    return received[0]
+
+  def _stream(self, fullPath, partial, expected=None, retries=3,
+              digest=None):
+    """
+    <private> Downloads a file over a single connection, resuming from the
+    end of `partial` if it exists.
+
+    :param str fullPath: Path from the cwd to the file to download
+    :param str partial: Local path+filename to write to
+    :param int expected: (optional) Size of the remote file in bytes
+    :param int retries: (optional) Times to resume after a dropped connection
+    :param Checksum digest: (optional) Checksum to update with the data
+    """
+    attempt = 0
+    while True:
+      offset = os.path.getsize(partial) if os.path.exists(partial) else 0
+
+      if expected is not None and offset > expected:
+        # The partial file can't belong to the current remote file
+        offset = 0
+
+      if digest is not None:
+        # Only reads from disk when resuming an earlier partial download
+        digest.sync(partial, offset)
+
+      try:
+        self._retrieve(fullPath, partial, offset, digest)
+        break
+
+      except ftplib.error_perm as error:
+        if offset and self._restRefused(error):
+          # The server doesn't understand "REST"; start over
+          os.remove(partial)
+          continue
+
+        raise
+
+      except (ftplib.all_errors + (EOFError,)):
+        attempt += 1
+        if attempt > retries:
+          raise
+
+  def _retrieve(self, fullPath, dest, offset=0, digest=None):
+    """
+    <private> Downloads a file, appending to `dest` from `offset` bytes into
+    the remote file.
+
+    :param str fullPath: Path from the cwd to the file to download
+    :param str dest: Local path+filename to write to
+    :param int offset: (optional) Byte offset to start the transfer at
+    :param Checksum digest: (optional) Checksum to update with the data
+    """
+    with open(dest, "ab" if offset else "wb") as handle:
+      handle.truncate(offset)
+
+      if digest is None:
+        callback = handle.write
       else:
-        # Default mode is to download non-binary files
-        mode = ""
+        # Write straight to the file; the checksum only keeps count
+        digest.handle = handle
+        callback = digest.write
+
+      try:
+        self.retrbinary("RETR " + fullPath, callback, rest=offset or None)
+      finally:
+        # Keep the checksum in line with what actually made it to disk
+        handle.flush()
+
+  def _inflate(self, fullPath, partial, retries=3, digest=None, fai=None):
+    """
+    <private> Downloads a gzipped file and decompresses it on the fly. A
+    dropped connection restarts the download from the beginning.
+
+    :param str fullPath: Path from the cwd to the file to download
+    :param str partial: Local path+filename to write decompressed data to
+    :param int retries: (optional) Times to restart after a dropped connection
+    :param Checksum digest: (optional) Checksum to update with the
+                            compressed data
+    :param FastaIndex fai: (optional) Index to build of the decompressed data
+    :returns: Number of compressed bytes that were downloaded
+    :rtype: int
+    """
+    with open(partial, "wb") as handle:
+
+      def restart():
+        # Throw away anything written by an earlier attempt
+        handle.seek(0)
+        handle.truncate()
+
+        writer = handle
+        if fai is not None:
+          fai.reset().handle = handle
+          writer = fai
+
+        if digest is None:
+          return Gunzip(writer)
+
+        digest.reset().handle = Gunzip(writer)
+        return digest
+
+      return self.feed(fullPath, restart, retries=retries)
+
+  def _segmented(self, fullPath, partial, size, segments, retries=3):
+    """
+    <private> Downloads a file as a number of byte ranges in parallel. Each
+    range is fetched over its own connection starting at its own "REST"
+    offset and written in place into a preallocated `partial` file.
+
+    Progress is kept in "<partial>.segments" as a list of
+    ``[start, position, end]`` ranges so an interrupted download can be
+    resumed later.
+
+    :param str fullPath: Path from the cwd to the file to download
+    :param str partial: Local path+filename to write to
+    :param int size: Size of the remote file in bytes
+    :param int segments: Number of ranges to split a new download into
+    :param int retries: (optional) Times to resume each range
+    """
+    progress = partial + ".segments"
+    ranges = None
+
+    if os.path.exists(progress) and os.path.exists(partial):
+      with open(progress, "r") as handle:
+        ranges = json.load(handle)
+
+      if not ranges or ranges[-1][2] != size:
+        # Progress belongs to another version of the remote file
+        ranges = None
+
+    if ranges is None:
+      # Split the file into (roughly) equally large ranges
+      step = -(-size // segments)
+      ranges = [[start, start, min(start + step, size)]
+                for start in range(0, size, step)]
+
+      # Preallocate the file
+      with open(partial, "wb") as handle:
+        handle.truncate(size)
+
+    self._saveSegments(progress, ranges)
+
+    stop = threading.Event()
+    errors = []
+    threads = [threading.Thread(target=self._segment,
+                                args=(fullPath, partial, segment, size, stop,
+                                      errors, retries))
+               for segment in ranges if segment[1] < segment[2]]
+
+    try:
+      for thread in threads:
+        thread.start()
+
+      for thread in threads:
+        thread.join()
+
+    finally:
+      # Record how far we got in case we need to resume later
+      stop.set()
+      self._saveSegments(progress, ranges)
+
+    if errors:
+      raise errors[0]
+
+    # A preallocated file has its full size whether or not it's complete
+    unfinished = [segment for segment in ranges if segment[1] != segment[2]]
+    if unfinished:
+      raise IOError("Incomplete download of '{path}': {count} of {total} "
+                    "ranges unfinished".format(path=fullPath,
+                                               count=len(unfinished),
+                                               total=len(ranges)))
+
+    os.remove(progress)
+
+  def _segment(self, fullPath, partial, segment, size, stop, errors,
+               retries=3):
+    """
+    <private> Downloads a single byte range. Runs in its own thread. The first
+    error stops all the other ranges of the same file.
+
+    :param str fullPath: Path from the cwd to the file to download
+    :param str partial: Local path+filename to write to
+    :param list segment: The ``[start, position, end]`` range to download
+    :param int size: Size of the remote file in bytes
+    :param threading.Event stop: Set when all ranges should stop
+    :param list errors: Shared list to report errors to
+    :param int retries: (optional) Times to resume the range
+    """
+    attempt = 0
+    while segment[1] < segment[2] and not stop.is_set():
+      try:
+        self._retrieveRange(fullPath, partial, segment, size, stop)
+
+      except (ftplib.all_errors + (EOFError,)) as error:
+        attempt += 1
+        if isinstance(error, ftplib.error_perm) or attempt > retries:
+          errors.append(error)
+          stop.set()
+
+      except Exception as error:
+        # Not worth retrying, but the other ranges have to know
+        errors.append(error)
+        stop.set()
+
+  def _retrieveRange(self, fullPath, partial, segment, size, stop):
+    """
+    <private> Streams the rest of a byte range into place in `partial`.
+
+    A transfer that's cut short at the end of the range leaves the control
+    connection in an unknown state so it's closed rather than reused.
+
+    :param str fullPath: Path from the cwd to the file to download
+    :param str partial: Local path+filename to write to
+    :param list segment: The ``[start, position, end]`` range to download
+    :param int size: Size of the remote file in bytes
+    :param threading.Event stop: Set when the transfer should stop
+    """
+    with scheduler.transfer(self.url):
+      connection = pool.acquire(self.url, self.username, self.password)
+      discard = True
+
+      try:
+        connection.voidcmd("TYPE I")
+        data = connection.transfercmd("RETR " + fullPath,
+                                      rest=segment[1] or None)
+
+        with open(partial, "r+b") as handle:
+          handle.seek(segment[1])
+
+          while segment[1] < segment[2] and not stop.is_set():
+            chunk = data.recv(min(self.blocksize, segment[2] - segment[1]))
+            if not chunk:
+              break
+
+            scheduler.throttle(len(chunk))
+            handle.write(chunk)
+            segment[1] += len(chunk)
+
+        data.close()
+
+        if segment[1] == size:
+          # The server sent the whole rest of the file; wait for "226"
+          connection.voidresp()
+          discard = False
+
+      finally:
+        pool.release(self.url, self.username, connection, discard=discard)
+
+    if segment[1] < segment[2] and not stop.is_set():
+      raise EOFError("Connection closed in the middle of a segment")
+
+  def _saveSegments(self, progress, ranges):
+    """
+    <private> Writes the progress of a segmented download to disk.
+
+    :param str progress: Path to the progress file
+    :param list ranges: List of ``[start, position, end]`` ranges
+    """
+    with open(progress, "w") as handle:
+      json.dump(ranges, handle)
+
+  def _restRefused(self, error):
+    """
+    <private> Checks whether an error means the server doesn't support
+    "REST" (500-504: command unknown/not implemented).
+
+    :param Exception error: The error raised by the server
+    :rtype: bool
+    """
+    return isinstance(error, ftplib.error_perm) and str(error)[:2] == "50"
+
+  def _partialSource(self, meta):
+    """
+    <private> Reads which remote file a partial download belongs to.
+
+    :param str meta: Path to the "<dest>.part.meta" file
+    :returns: ``{ "path": ..., "size": ..., "modified": ... }`` or ``None``
+    :rtype: dict
+    """
+    try:
+      with open(meta, "r") as handle:
+        return json.load(handle)
+
+    except (IOError, ValueError):
+      return None
+
+  def _cleanup(self, *paths):
+    """
+    <private> Removes any of the paths that exist.
+    """
+    for path_ in paths:
+      if os.path.exists(path_):
+        os.remove(path_)
+
+
+class Resolution(object):
+  """
+  Run-scoped memo of what resources ask their servers while they're being
+  resolved. Resources that share an implementation and a server directory
+  (like the GATK bundle resources that all list "bundle") share the
+  results of :meth:`versions` and :meth:`latest`, also when they're
+  resolved at the same time in different threads.
+
+  .. code-block:: python
+
+    >>> resolution = Resolution()
+    >>> dbsnp = resolution.bind(load_class("cosmid.resources.dbsnp.Resource")())
+    >>> hapmap = resolution.bind(load_class("cosmid.resources.hapmap.Resource")())
+    >>> dbsnp.latest() == hapmap.latest()  # "bundle" is listed once
+    True
+
+  .. versionadded:: 0.5.0
+  """
+  # Resource methods that only depend on the server and base directory
+  methods = ("versions", "latest")
+
+  def __init__(self):
+    super(Resolution, self).__init__()
+    self.results = {}
+
+    # Lookups in flight: ``{ key: threading.Event }``
+    self.pending = {}
+    self.lock = threading.Lock()
 
-    # Open connection to the destination file and retrive the file
-    with open(dest, "w" + mode) as handle:
-      self.retrbinary("RETR " + fullPath, handle.write)
+  def bind(self, resource):
+    """
+    <public> Makes a resource share the results of its lookups with other
+    resources bound to the same resolution. Also applies to the resource's
+    own calls, e.g. :meth:`latest` from :meth:`paths`.
+
+    :param object resource: The resource to bind
+    :returns: The resource
+    """
+    server = getattr(getattr(resource, "ftp", None), "url", None)
+
+    for name in self.methods:
+      method = getattr(resource, name)
+      key = (name, getattr(method, "__func__", method), server,
+             getattr(resource, "baseUrl", None))
+
+      setattr(resource, name, self._memoized(key, method))
+
+    return resource
+
+  def call(self, key, func):
+    """
+    <public> Returns the result of a lookup, calling `func` only if no one
+    has done the same lookup before. Failures aren't remembered.
+
+    :param tuple key: Identifies the lookup
+    :param function func: Does the lookup
+    :returns: The (possibly shared) result
+    """
+    while True:
+      with self.lock:
+        if key in self.results:
+          return self._copy(self.results[key])
+
+        event = self.pending.get(key)
+        if event is None:
+          self.pending[key] = threading.Event()
+          break
+
+      # Wait for the same lookup in another thread to finish
+      event.wait()
+
+    try:
+      result = func()
+
+      with self.lock:
+        self.results[key] = result
+
+    finally:
+      with self.lock:
+        self.pending.pop(key).set()
+
+    return self._copy(result)
+
+  def _memoized(self, key, method):
+    """
+    <private> Wraps a bound method in :meth:`call`.
+    """
+    def memoized():
+      return self.call(key, method)
+
+    memoized.__doc__ = method.__doc__
+
+    return memoized
+
+  def _copy(self, result):
+    """
+    <private> Hands out copies of lists so callers can't change the result.
+    """
+    return list(result) if isinstance(result, list) else result
 
 
 class Registry(object):
   """
   Hub of-sorts to talk with different `Cosmid` related files and resources. Can
   be seen as the API endpoint for `Cosmid`.
+
+  The config and history files are only read once they're first needed so
+  commands like ``cosmid list`` never touch them.
   """
   def __init__(self):
     super(Registry, self).__init__()
 
-    # Set up YAML parser for optional config file
-    self.config_path = path("cosmid.yaml")
-    self.config = ConfigReader(self.config_path)
+    # Set up a :class:`cosmid.messenger.Messenger`
+    self.messenger = Messenger("cosmid")
 
-    # Extract stuff from config
-    self.email = self.config.find("email")
+    # Catalog of and search index over the resources; built on first use
+    self.entries = None
+    self.index = None
 
-    # Path to resource storage directory
-    self.directory = path(self.config.find("directory", default="resources"))
+    # Shares server lookups between the resources resolved in this run
+    self.resolution = Resolution()
 
-    # Load history file consisting of already downloaded resources
-    self.history_path = path(self.directory + "/.cosmid.yaml")
-    self.history = HistoryReader(self.history_path)
+  @cached_property
+  def config_path(self):
+    """
+    <public> Path to the optional project config file.
+    """
+    return path("cosmid.yaml")
 
-    # Set up a :class:`cosmid.messenger.Messenger`
-    self.messenger = Messenger("cosmid")
+  @cached_property
+  def config(self):
+    """
+    <public> YAML parser for the optional config file.
+    """
+    return ConfigReader(self.config_path)
+
+  @cached_property
+  def email(self):
+    """
+    <public> Email address from the config (FTP login).
+    """
+    return self.config.find("email")
+
+  @cached_property
+  def directory(self):
+    """
+    <public> Path to resource storage directory.
+    """
+    return path(self.config.find("directory", default="resources"))
+
+  @cached_property
+  def history_path(self):
+    """
+    <public> Path to the history file of already downloaded resources.
+    """
+    return path(self.directory + "/.cosmid.yaml")
+
+  @cached_property
+  def journal_path(self):
+    """
+    <public> Path to the append-only journal that the history is kept in.
+    """
+    return path(self.directory + "/.cosmid.journal")
+
+  @cached_property
+  def history(self):
+    """
+    <public> History of downloaded resources, committed to the journal as
+    each resource is registered and exported to the history file.
+    """
+    return HistoryReader(self.history_path, self.journal_path)
+
+  @cached_property
+  def listings_path(self):
+    """
+    <public> Path to cached listings of directories on the servers.
+    """
+    return path(self.directory + "/.cosmid.listings")
+
+  @cached_property
+  def objects_path(self):
+    """
+    <public> Path to downloaded files by checksum; can be shared between
+    projects.
+    """
+    return path(self.config.find("objects",
+                                 default=self.directory + "/.objects"))
 
   def get(self, resource_id, type_="class"):
     """
@@ -167,13 +1365,19 @@ class Registry(object):
       >>> resource.latest()
       'Hs104'
 
+    .. versionchanged:: 0.5.0
+       Resources share server lookups through :attr:`resolution`.
+
     :param str resource_id: The resource key (name of module)
     :returns: A class instance of the resource
     """
     try:
 
       if type_ == "class":
-        return load_class("cosmid.resources.{}.Resource".format(resource_id))()
+        resource = load_class("cosmid.resources.{}.Resource"
+                              .format(resource_id))()
+
+        return self.resolution.bind(resource)
 
       elif type_ == "module":
         return importlib.import_module("cosmid.resources." + resource_id)
@@ -190,23 +1394,32 @@ class Registry(object):
     The method will try to correct both ``resource_id`` and the ``target``
     release tag.
 
+    .. versionchanged:: 0.5.0
+       Close matches found in the resource docstrings are only suggested,
+       see :meth:`matchResource`.
+
     :param str resource_id: What resource to download
     :param str target: What release of the resource to download
     """
     # Either import resource class or print warning and move on.
     # Test matching the resource ID
-    options = [item[0] for item in self.ls()]
-    resource_id = self.matchOne(resource_id, options)
-
-    if resource_id is None:
+    match = self.matchResource(resource_id)
 
+    if match is None:
       message = "Couldn't match resource ID: '{}'".format(resource_id)
+
+      suggestions = [match for match, score in self.search(resource_id,
+                                                           limit=3)
+                     if score >= 60]
+      if suggestions:
+        message += "; did you mean: {}?".format(", ".join(suggestions))
+
       self.messenger.send("warning", message)
 
       return None, None, None, None
 
     # Get the resource
-    resource = self.get(resource_id)
+    resource = self.get(match)
 
     # Now let's figure out the version
     # No specified version will match to the latest resource release
@@ -242,14 +1455,6 @@ class Registry(object):
                      .format(dir=self.directory, mid=resource_dir, file=name))
                     for name in resource.names]
 
-      # Add the resource to the history file as downloaded
-      self.history.add(resource_id, {
-        "version": version,
-        "target": target,
-        "names": resource.names,
-        "sources": dl_paths
-      })
-
       return resource, dl_paths, save_paths, version
 
     else:
@@ -257,45 +1462,172 @@ class Registry(object):
       # The resource was already downloaded
       return None, None, None, None
 
+  def register(self, resource, version, target, dl_paths, stats=None,
+               checksums=None, indexes=None):
+    """
+    <public> Adds a resource to the history file as downloaded. Should only be
+    called once *all* the files of the resource have been downloaded.
+
+    Each file is recorded under its local name along with where it came from,
+    its size and modification time on the server and its checksum. Files
+    that were left alone as unchanged keep their earlier checksum. Index
+    files written next to the resource's files are recorded too.
+
+    The record is committed to the history journal straight away.
+
+    .. versionadded:: 0.5.0
+
+    :param object resource: The resource that was downloaded
+    :param object version: The resolved version that was downloaded
+    :param object target: The version target requested by the user
+    :param list dl_paths: The remote paths the files were downloaded from
+    :param list stats: (optional) :meth:`FTP.stat` of each file
+    :param dict checksums: (optional) Checksums of the downloaded files:
+                           ``{ dl_path: "<algorithm>:<checksum>" }``
+    :param list indexes: (optional) Names of the index files, see
+                         :meth:`cosmid.resource.BaseResource.indexes`
+    :returns: self
+    """
+    previous = self.history.find(resource.id, default={}).get("files", {})
+    stats = stats or [{} for dl_path in dl_paths]
+    checksums = checksums or {}
+
+    files = {}
+    for name, dl_path, stat in zip(resource.names, dl_paths, stats):
+      record = dict(stat, source=dl_path)
+
+      checksum = (checksums.get(dl_path) or
+                  previous.get(name, {}).get("checksum"))
+      if checksum:
+        record["checksum"] = checksum
+
+      files[name] = record
+
+    record = {
+      "version": version,
+      "target": target,
+      "names": resource.names,
+      "sources": dl_paths,
+      "files": files
+    }
+
+    if indexes:
+      record["indexes"] = indexes
+
+    self.history.add(resource.id, record)
+
+    return self
+
+  def unchanged(self, resource, dl_paths, save_paths, stats):
+    """
+    <public> Compares the files about to be downloaded with the history. A
+    file doesn't need to be downloaded again if it comes from the same path
+    on the server as last time, with the same size and modification time,
+    and it's still around locally (possibly decompressed). A new release
+    saved under the same local name is always downloaded.
+
+    A combined assembly (see ``resource.assembly``) counts as all of its
+    parts, but only when none of them have changed.
+
+    .. versionadded:: 0.5.0
+
+    :param object resource: The resource to download
+    :param list dl_paths: The remote paths of the files
+    :param list save_paths: The local paths to save the files to
+    :param list stats: :meth:`FTP.stat` of each file
+    :returns: ``{ dl_path: local_path }`` for the unchanged files
+    :rtype: dict
+    """
+    files = self.history.find(resource.id, default={}).get("files", {})
+    same = {}
+    unchanged = {}
+
+    for name, dl_path, save_path, stat in zip(resource.names, dl_paths,
+                                              save_paths, stats):
+      record = files.get(name)
+
+      if (record is None or None in (stat["size"], stat["modified"]) or
+          record.get("source") != dl_path or
+          record.get("size") != stat["size"] or
+          record.get("modified") != stat["modified"]):
+        continue
+
+      same[dl_path] = save_path
+
+      # Files are usually decompressed after download
+      local_paths = [save_path]
+      if save_path.endswith(".gz"):
+        local_paths.append(save_path[:-3])
+
+      for local_path in local_paths:
+        if os.path.isfile(local_path):
+          unchanged[dl_path] = local_path
+          break
+
+    assembly = getattr(resource, "assembly", None)
+    if assembly and len(same) == len(dl_paths) and dl_paths:
+      combined = os.path.join(os.path.dirname(save_paths[0]), assembly)
+
+      if os.path.isfile(combined):
+        unchanged = dict.fromkeys(dl_paths, combined)
+
+    return unchanged
+
   def ls(self):
     """
     <public> Returns a list of resource IDs and docstrings for all the
     included resource modules.
 
-    *Reference*: http://stackoverflow.com/questions/1707709/list-all-the-modules-that-are-part-of-a-python-package
-
     .. code-block:: python
 
       >>> registry.ls()
       [('ccds', 'A curated database of generic element'), ...]
 
+    .. versionchanged:: 0.5.0
+       Reads the :meth:`catalog` instead of importing every module.
+
     :returns: A list of tuples: ``(resource_id, docstring)``
     :rtype: list
     """
-    # Store everything here
-    items = []
+    catalog = self.catalog()
+
+    return [(name, catalog[name]["doc"]) for name in sorted(catalog)]
 
-    prefix = resources.__name__ + "."
-    # Fetch all the resource modules
-    modules = pkgutil.iter_modules(resources.__path__, prefix)
+  def catalog(self):
+    """
+    <public> Describes all the included resources without importing them
+    (see :class:`cosmid.catalog.Catalog`). The catalog is cached between runs
+    and only rebuilt when the resource or server modules change.
 
-    # Loop over all resource modules
-    for importer, modpath, ispkg in modules:
-      # Strip path
-      modname = modpath.split(".")[-1]
+    .. code-block:: python
 
-      # Load the `Resource` class for the module
-      module = self.get(modname, type_="module")
+      >>> registry.catalog()["ccds"]
+      {'id': 'ccds', 'doc': '...', 'server': 'NCBI',
+       'host': 'ftp.ncbi.nlm.nih.gov', 'names': ['CCDS.txt'], 'parts': 1}
+
+    .. versionadded:: 0.5.0
+
+    :returns: ``{ resource_id: description }``
+    :rtype: dict
+    """
+    if self.entries is None:
+      cache = PackageCache("catalog")
+      signature = (fingerprint(resources.__path__[0]) +
+                   fingerprint(servers.__path__[0]))
+      self.entries = cache.load(signature)
 
-      # Save name and docstring
-      items.append((modname, module.__doc__))
+      if self.entries is None:
+        self.entries = Catalog(resources.__path__[0],
+                               servers.__path__[0]).describe()
+        cache.save(signature, self.entries)
 
-    return items
+    return self.entries
 
   def search(self, query, limit=5):
     """
-    <public> Fuzzy matches a query string against each of the resource IDs and
-    returns a limited number of results in order of match score.
+    <public> Fuzzy matches a query string against each of the resource IDs
+    (and the words in their docstrings) and returns a limited number of
+    results in order of match score.
 
     .. code-block:: python
 
@@ -303,19 +1635,64 @@ class Registry(object):
       [('ensembl_assembly', 68),
        ('ncbi_assembly', 68)]
 
+    .. versionchanged:: 0.5.0
+       Looks up matches in a :class:`cosmid.search.SearchIndex`.
+
     :param str query: A string to match against the resource IDs
     :param int limit: (optional) A maximum number of results to return
     :returns: A list of tuples: ``(resource_id, score)`
     :rtype: list
     """
-    # List all the available resources
-    resources = self.ls()
+    return self.searchIndex().search(query, limit=limit)
+
+  def searchIndex(self):
+    """
+    <public> Returns the search index over the resources. It's cached
+    between runs and only rebuilt when the resource modules change.
+
+    .. versionadded:: 0.5.0
+
+    :rtype: :class:`cosmid.search.SearchIndex`
+    """
+    if self.index is None:
+      cache = PackageCache("search")
+      signature = fingerprint(resources.__path__[0])
+      data = cache.load(signature)
+
+      if data is None:
+        self.index = SearchIndex.build(self.ls())
+        cache.save(signature, self.index.dump())
+
+      else:
+        self.index = SearchIndex.load(data)
+
+    return self.index
+
+  def matchResource(self, resource_id, threshold=60):
+    """
+    <public> Fuzzy matches a (misspelled) resource ID against the IDs of the
+    available resources. Unlike :meth:`search` the docstrings are left out
+    so a general term can't pick an unrelated resource.
+
+    .. code-block:: python
+
+      >>> registry.matchResource("ensembl")
+      'ensembl_assembly'
+
+    .. versionadded:: 0.5.0
+
+    :param str resource_id: The resource ID to match
+    :param int threshold: A lower threshold for accepting a best match
+    :returns: The matching resource ID (unless score is below threshold)
+    :rtype: str
+    """
+    options = [item[0] for item in self.ls()]
 
-    # Focus on resource IDs
-    resource_ids = [resource[0] for resource in resources]
+    if resource_id in options:
+      # No need to load the fuzzy matcher
+      return resource_id
 
-    # Fuzzy match against the resource IDs and return in order of best match
-    return process.extract(query, resource_ids, limit=limit)
+    return self.matchOne(resource_id, options, threshold=threshold)
 
   def matchOne(self, target, options, threshold=60):
     """
@@ -353,8 +1730,9 @@ class Registry(object):
     # Get any currently downloaded resources
     current = self.history.find(resource.id, default={})
 
-    # Make sure we haven't already downloaded the resource
-    if current.get("version") == version:
+    # Make sure we haven't already downloaded the resource. Files recorded
+    # with size and modification time are compared one by one later.
+    if current.get("version") == version and "files" not in current:
       message = "'{}' already downloaded and up-to-date.".format(resource.id)
       self.messenger.send("update", message)
 
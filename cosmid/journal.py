@@ -0,0 +1,147 @@
+#!/usr/bin/env python
+"""
+Append-only journal of key/item records.
+
+Every change is a single JSON line appended (and synced) to the end of the
+file so committing a change never rewrites what's already there. A crash
+can at worst leave a half-written last line which is simply dropped when
+the journal is loaded again. The journal is compacted to one record per key
+once superseded records start to pile up.
+"""
+import json
+import os
+import threading
+
+from magicmethods import atomic_write
+
+
+class Journal(object):
+  """
+  Dict-like store backed by an append-only JSON lines file. The most recent
+  record of each key wins; a ``None`` item removes the key.
+
+  .. code-block:: python
+
+    >>> journal = Journal("resources/.cosmid.journal")
+    >>> items = journal.load()
+    >>> journal.append("ccds", {"version": "Hs104", "target": "latest"})
+
+  .. versionadded:: 0.5.0
+
+  :param str source: Path to the journal file
+  :param int slack: (optional) Number of superseded records to tolerate
+                    before compacting
+  """
+  def __init__(self, source, slack=64):
+    super(Journal, self).__init__()
+    self.source = source
+    self.slack = slack
+
+    # Number of records in the file
+    self.records = 0
+
+    self.items = {}
+    self.lock = threading.Lock()
+
+  def exists(self):
+    """
+    <public> Whether the journal file has been created yet.
+
+    :rtype: bool
+    """
+    return os.path.isfile(self.source)
+
+  def load(self):
+    """
+    <public> Replays the journal. A torn last record is cut off and the
+    journal is compacted if it has grown well beyond what it describes.
+
+    :returns: ``{ key: item }``
+    :rtype: dict
+    """
+    items = {}
+    records = 0
+    valid = 0
+
+    if self.exists():
+      with open(self.source, "rb") as handle:
+        for line in handle:
+          try:
+            if not line.endswith("\n"):
+              raise ValueError("Incomplete record")
+
+            record = json.loads(line)
+            key, item = record["key"], record["item"]
+
+          except (ValueError, KeyError, TypeError):
+            # Nothing after a broken record can be trusted to be in order
+            break
+
+          if item is None:
+            items.pop(key, None)
+          else:
+            items[key] = item
+
+          records += 1
+          valid += len(line)
+
+      if valid < os.path.getsize(self.source):
+        with open(self.source, "r+b") as handle:
+          handle.truncate(valid)
+
+    self.items = items
+    self.records = records
+
+    if self.records > len(self.items) + self.slack:
+      self.compact()
+
+    return self.items
+
+  def append(self, key, item):
+    """
+    <public> Commits a new record for a key. It's on disk once this returns.
+
+    :param str key: Key to set
+    :param object item: JSON serializable item; ``None`` removes the key
+    """
+    line = json.dumps({"key": key, "item": item}, sort_keys=True) + "\n"
+
+    with self.lock:
+      # One write to a file opened for appending: the record ends up whole
+      # at the end of the file or (after a crash) is cut off and dropped.
+      descriptor = os.open(self.source,
+                           os.O_WRONLY | os.O_APPEND | os.O_CREAT, 0o644)
+      try:
+        os.write(descriptor, line)
+        os.fsync(descriptor)
+
+      finally:
+        os.close(descriptor)
+
+      if item is None:
+        self.items.pop(key, None)
+      else:
+        self.items[key] = item
+
+      self.records += 1
+
+  def replace(self, items):
+    """
+    <public> Atomically replaces the journal with one record per item.
+
+    :param dict items: ``{ key: item }``
+    """
+    with self.lock:
+      with atomic_write(self.source, "wb", sync=True) as handle:
+        for key in sorted(items):
+          handle.write(json.dumps({"key": key, "item": items[key]},
+                                  sort_keys=True) + "\n")
+
+      self.items = dict(items)
+      self.records = len(items)
+
+  def compact(self):
+    """
+    <public> Drops superseded records from the journal.
+    """
+    self.replace(self.items)
@@ -1,6 +1,7 @@
 import contextlib
 import os
 import importlib
+import threading
 
 
 @contextlib.contextmanager
@@ -16,6 +17,44 @@ def cd(path):
   finally:
     os.chdir(prev_cwd)
 
+@contextlib.contextmanager
+def atomic_write(dest, mode="w", sync=False):
+  """
+  A context manager which yields a handle to a temporary file next to
+  `dest` and renames it over `dest` on exit. Each call gets a file of its
+  own so concurrent writers can't trip over each other. The temporary file
+  is removed if anything goes wrong.
+
+  .. versionadded:: 0.5.0
+
+  :param str dest: Path to the file to (over)write
+  :param str mode: (optional) Mode to open the temporary file with
+  :param bool sync: (optional) Flush the file to disk before renaming it
+  """
+  # Only needed when writing something
+  import tempfile
+
+  folder, name = os.path.split(dest)
+  descriptor, temp_path = tempfile.mkstemp(prefix=name + ".", suffix=".tmp",
+                                           dir=folder or ".")
+  try:
+    with os.fdopen(descriptor, mode) as handle:
+      yield handle
+
+      if sync:
+        handle.flush()
+        os.fsync(handle.fileno())
+
+    # Temporary files are only readable by their owner
+    os.chmod(temp_path, 0o644)
+    os.rename(temp_path, dest)
+
+  except BaseException:
+    if os.path.exists(temp_path):
+      os.remove(temp_path)
+
+    raise
+
 def memoize(f):
   """
   Memoization decorator for a function taking one or more arguments.
@@ -41,3 +80,77 @@ def load_class(full_class_string):
   module = importlib.import_module(module_path)
   # Finally, we retrieve the Class
   return getattr(module, class_str)
+
+class LazyModule(object):
+  """
+  Stand-in for a module (or an attribute of one) that isn't imported until
+  it's first used. Keeps commands that don't need a heavy dependency from
+  paying for importing it.
+
+  .. code-block:: python
+
+    >>> yaml = LazyModule("yaml")
+    >>> path = LazyModule("path", "path")
+    >>> path("cosmid.yaml").exists()
+
+  .. versionadded:: 0.5.0
+
+  :param str name: Full name of the module
+  :param str attribute: (optional) Stand in for this attribute of the module
+  """
+  def __init__(self, name, attribute=None):
+    super(LazyModule, self).__init__()
+    self.__dict__["_name"] = name
+    self.__dict__["_attribute"] = attribute
+    self.__dict__["_target"] = None
+
+  def __getattr__(self, name):
+    return getattr(self._load(), name)
+
+  def __call__(self, *args, **kwargs):
+    return self._load()(*args, **kwargs)
+
+  def _load(self):
+    """
+    <private> Imports the module (once) and returns what's stood in for.
+    """
+    target = self.__dict__["_target"]
+
+    if target is None:
+      target = importlib.import_module(self.__dict__["_name"])
+
+      if self.__dict__["_attribute"] is not None:
+        target = getattr(target, self.__dict__["_attribute"])
+
+      self.__dict__["_target"] = target
+
+    return target
+
+def lazy_import(name, attribute=None):
+  """
+  Returns a :class:`LazyModule` for a module or one of its attributes.
+  """
+  return LazyModule(name, attribute)
+
+class cached_property(object):
+  """
+  Decorator for a property that's worked out on first access and then
+  stored on the instance. Threads racing for the first access wait for the
+  value to be worked out once.
+  """
+  def __init__(self, func):
+    self.func = func
+    self.__name__ = func.__name__
+    self.__doc__ = func.__doc__
+    self.lock = threading.RLock()
+
+  def __get__(self, instance, owner):
+    if instance is None:
+      return self
+
+    with self.lock:
+      # Another thread might have worked it out while we were waiting
+      if self.__name__ not in instance.__dict__:
+        instance.__dict__[self.__name__] = self.func(instance)
+
+    return instance.__dict__[self.__name__]
@@ -1,7 +1,12 @@
 #!/usr/bin/env python
 
 from __future__ import print_function
-from termcolor import colored
+import threading
+
+from magicmethods import lazy_import
+
+# Plain "--help" doesn't print anything in color
+colored = lazy_import("termcolor", "colored")
 
 
 class Messenger(object):
@@ -11,6 +16,9 @@ class Messenger(object):
 
   :param str sender: The program handle that will send the messages.
   """
+  # Messages can be sent from several threads; don't let them interleave
+  lock = threading.Lock()
+
   def __init__(self, sender=None):
     super(Messenger, self).__init__()
 
@@ -58,7 +66,8 @@ class Messenger(object):
     }.get(category, self._note())
 
     # Print the parts with tab-separation
-    print("\t".join((self.sender, statement, message)))
+    with self.lock:
+      print("\t".join((self.sender, statement, message)))
 
     return self
 
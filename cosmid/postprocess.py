@@ -0,0 +1,602 @@
+#!/usr/bin/env python
+"""
+Post processing of downloaded files without calling out to system tools.
+
+Decompressing is CPU bound so several files are decompressed at once in a
+pool of worker processes, one per core (see :class:`WorkerPool`). Each
+function returns the number of bytes written so the caller can report how
+much was processed.
+"""
+import atexit
+import os
+import struct
+import tarfile
+import threading
+import zipfile
+from fnmatch import fnmatch
+
+from magicmethods import atomic_write, lazy_import
+from streams import (Bgzf, Checksum, FastaIndex, Gunzip, TabixIndex, gzi,
+                     replace)
+
+# Only needed once there's something to process
+multiprocessing = lazy_import("multiprocessing")
+
+# Size of the chunks to read and write
+CHUNK_SIZE = 1024 * 1024
+
+
+class WorkerPool(object):
+  """
+  Worker processes shared by all post processing. Forking while other
+  threads hold locks or sockets (like the download threads) can deadlock
+  the children, so the pool is meant to be started up front, before any
+  threads. Without a started pool, work is only spread over processes
+  while the caller is the sole thread; otherwise it's done in-process.
+
+  .. code-block:: python
+
+    >>> workers.start()
+    >>> workers.map(faidx, ["chr1.fa", "chr2.fa"])
+    [32, 32]
+
+  .. versionadded:: 0.5.0
+  """
+  def __init__(self):
+    super(WorkerPool, self).__init__()
+    self.pool = None
+    self.lock = threading.Lock()
+
+  def start(self, jobs=None):
+    """
+    <public> Forks the worker processes unless they're already running.
+
+    :param int jobs: (optional) Number of processes; defaults to the number
+                     of cores
+    :returns: self
+    """
+    with self.lock:
+      if self.pool is None:
+        self.pool = multiprocessing.Pool(jobs or cpu_count())
+        atexit.register(self.close)
+
+    return self
+
+  def map(self, func, tasks, jobs=None):
+    """
+    <public> Calls a (module level) function with each task in parallel.
+
+    :param function func: Function to call
+    :param list tasks: One argument for each call
+    :param int jobs: (optional) Max number of processes to fork when the
+                     pool isn't started; defaults to the number of cores
+    :returns: The results in the same order as the tasks
+    :rtype: list
+    """
+    if self.pool is not None and tasks:
+      # Also keeps the work from competing with any download threads
+      return self._wait(self.pool.map_async(func, tasks, chunksize=1))
+
+    jobs = min(jobs or cpu_count(), len(tasks))
+
+    if jobs <= 1:
+      # Not worth starting any processes
+      return map(func, tasks)
+
+    if threading.active_count() > 1:
+      # Not safe to fork now
+      return map(func, tasks)
+
+    pool = multiprocessing.Pool(jobs)
+
+    try:
+      return self._wait(pool.map_async(func, tasks, chunksize=1))
+
+    except:
+      pool.terminate()
+      raise
+
+    finally:
+      pool.close()
+      pool.join()
+
+  def apply(self, func, *args):
+    """
+    <public> Calls a (module level) function in a worker process if the
+    pool is started and in-process otherwise.
+
+    :param function func: Function to call
+    :param args: Arguments to call ``func`` with
+    :returns: What ``func`` returned
+    """
+    if self.pool is None:
+      return func(*args)
+
+    return self._wait(self.pool.apply_async(func, args))
+
+  def close(self):
+    """
+    <public> Waits for the worker processes to finish and stops them.
+    """
+    with self.lock:
+      if self.pool is not None:
+        self.pool.close()
+        self.pool.join()
+        self.pool = None
+
+  def _wait(self, result):
+    """
+    <private> Waits for an asynchronous result.
+    """
+    # A timeout keeps the wait interruptible (Ctrl-C)
+    return result.get(2 ** 31)
+
+
+workers = WorkerPool()
+
+
+def gunzip(source, dest=None, remove=True, index=False):
+  """
+  Decompresses a gzip file like ``gunzip -f`` does. Files made up of several
+  gzip members (like BGZF files) are handled too. The decompressed file is
+  moved in place once complete.
+
+  .. versionadded:: 0.5.0
+
+  :param str source: Path to the gzip file
+  :param str dest: (optional) Where to write the result; defaults to the
+                   source without ".gz"
+  :param bool remove: (optional) Remove the gzip file afterwards
+  :param bool index: (optional) Also write a FASTA index ("<dest>.fai")
+  :returns: Number of bytes written
+  :rtype: int
+  """
+  if dest is None:
+    dest = source[:-3] if source.endswith(".gz") else source + ".out"
+
+  written, fai = _write(_read([source]), dest, decompress=True, index=index)
+
+  if remove:
+    os.remove(source)
+
+  if fai is not None:
+    written += fai.save(dest)
+
+  return written
+
+
+def untar(source, target_dir, fasta=()):
+  """
+  Extracts a (compressed) tar archive into a directory.
+
+  .. versionadded:: 0.5.0
+
+  :param str source: Path to the archive
+  :param str target_dir: Directory to extract into
+  :param list fasta: (optional) Patterns of FASTA files to index while
+                     extracting, see :func:`matches`
+  :returns: Number of bytes written
+  :rtype: int
+  """
+  written = 0
+
+  with tarfile.open(source) as archive:
+    for member in archive:
+      if member.isfile() and matches(member.name, fasta):
+        written += _extract(archive.extractfile(member),
+                            os.path.join(target_dir, member.name))
+
+      else:
+        archive.extract(member, target_dir)
+
+        if member.isfile():
+          written += member.size
+
+  return written
+
+
+def unzip(source, target_dir, fasta=()):
+  """
+  Extracts a zip archive into a directory.
+
+  .. versionadded:: 0.5.0
+
+  :param str source: Path to the archive
+  :param str target_dir: Directory to extract into
+  :param list fasta: (optional) Patterns of FASTA files to index while
+                     extracting, see :func:`matches`
+  :returns: Number of bytes written
+  :rtype: int
+  """
+  archive = zipfile.ZipFile(source)
+  written = 0
+
+  try:
+    for info in archive.infolist():
+      if not info.filename.endswith("/") and matches(info.filename, fasta):
+        written += _extract(archive.open(info),
+                            os.path.join(target_dir, info.filename))
+
+      else:
+        archive.extract(info, target_dir)
+        written += info.file_size
+
+    return written
+
+  finally:
+    archive.close()
+
+
+def concatenate(sources, dest, index=False):
+  """
+  Concatenates files (like ``cat``) into a new file.
+
+  .. versionadded:: 0.5.0
+
+  :param list sources: Paths to the files, in order
+  :param str dest: Path to write the combined file to
+  :param bool index: (optional) Also write a FASTA index ("<dest>.fai")
+  :returns: Number of bytes written
+  :rtype: int
+  """
+  written, fai = _write(_read(sources), dest, index=index)
+
+  if fai is not None:
+    written += fai.save(dest)
+
+  return written
+
+
+def faidx(source):
+  """
+  Writes the FASTA index ("<source>.fai") of a file that's already on disk,
+  like ``samtools faidx`` does. Gzip files are decompressed on the fly but
+  only BGZF files can be read at the indexed offsets later on.
+
+  Files that cosmid writes itself are indexed as they're written; this is
+  for files that are kept the way they were downloaded.
+
+  .. versionadded:: 0.5.0
+
+  :param str source: Path to the FASTA file
+  :returns: Number of bytes written
+  :rtype: int
+  """
+  fai = FastaIndex()
+  reader = Gunzip(fai) if source.endswith(".gz") else fai
+
+  for chunk in _read([source]):
+    reader.write(chunk)
+
+  reader.close()
+
+  return fai.save(source)
+
+
+def tabix(source):
+  """
+  Writes the tabix index ("<source>.tbi") of a sorted, BGZF compressed VCF
+  file that's already on disk, like ``tabix -p vcf`` does.
+
+  Files that cosmid compresses itself are indexed as they're compressed;
+  this is for files that were BGZF compressed upstream.
+
+  .. versionadded:: 0.5.0
+
+  :param str source: Path to the VCF file
+  :returns: Number of bytes written
+  :rtype: int
+  """
+  tbi = TabixIndex()
+  reader = Gunzip(tbi)
+
+  for chunk in _read([source]):
+    reader.write(chunk)
+
+  reader.close()
+
+  return tbi.save(source + ".tbi", bgzfBlocks(source))
+
+
+def matches(path, patterns):
+  """
+  Checks a file name against patterns like "*.fa". A ".gz" extension is
+  ignored so the same patterns match files before and after they're
+  decompressed.
+
+  .. versionadded:: 0.5.0
+
+  :param str path: Path to the file
+  :param list patterns: Patterns to match the name against
+  :rtype: bool
+  """
+  name = os.path.basename(path)
+  if name.endswith(".gz"):
+    name = name[:-3]
+
+  return any(fnmatch(name, pattern) for pattern in patterns)
+
+
+def bgzip(source, threads=None, index=True, fasta=False, vcf=False):
+  """
+  Compresses a file as BGZF (like ``bgzip``) so it can be read at random
+  offsets, optionally with a ".gzi" index next to it. Gzip files are
+  decompressed and recompressed in one pass and replaced; other files are
+  compressed to "<source>.gz" and removed. Files that are already BGZF are
+  only indexed (unless the index is already there).
+
+  FASTA files are indexed in the same pass ("<dest>.fai"); an index of the
+  uncompressed source is replaced. So are VCF files ("<dest>.tbi").
+
+  .. code-block:: python
+
+    >>> bgzip("resources/decoy/hs37d5.fa.gz")
+    891947306
+
+  .. versionadded:: 0.5.0
+
+  :param str source: Path to the file
+  :param int threads: (optional) Number of threads to compress with;
+                      defaults to the number of cores
+  :param bool index: (optional) Also write a ".gzi" index
+  :param bool fasta: (optional) Also write a FASTA index
+  :param bool vcf: (optional) Also write a tabix index
+  :returns: Number of bytes written
+  :rtype: int
+  """
+  dest = source if source.endswith(".gz") else source + ".gz"
+
+  if source == dest and isBgzf(source):
+    written = 0
+
+    if index and not os.path.exists(dest + ".gzi"):
+      written += replace(dest + ".gzi", gzi(bgzfOffsets(source)))
+
+    if fasta and not os.path.exists(dest + ".fai"):
+      written += faidx(dest)
+
+    if vcf and not os.path.exists(dest + ".tbi"):
+      written += tabix(dest)
+
+    return written
+
+  fai = tbi = None
+
+  with atomic_write(dest, "wb") as output:
+    with open(source, "rb") as handle:
+      writer = Bgzf(output, threads=threads or cpu_count())
+      reader = writer
+
+      if fasta:
+        reader = fai = FastaIndex(reader)
+
+      if vcf:
+        reader = tbi = TabixIndex(reader)
+
+      # Gzip files are decompressed on their way to the compressor
+      if source == dest:
+        reader = Gunzip(reader)
+
+      for chunk in iter(lambda: handle.read(CHUNK_SIZE), ""):
+        reader.write(chunk)
+
+      reader.close()
+      if reader is not writer:
+        writer.close()
+
+      written = output.tell()
+
+  if source != dest:
+    os.remove(source)
+
+    if os.path.exists(source + ".fai"):
+      os.remove(source + ".fai")
+
+  if index:
+    written += replace(dest + ".gzi", writer.index())
+
+  if fai is not None:
+    written += fai.save(dest)
+
+  if tbi is not None:
+    written += tbi.save(dest + ".tbi", writer.blocks())
+
+  return written
+
+
+def isBgzf(source):
+  """
+  Checks whether a file starts with a BGZF block.
+
+  .. versionadded:: 0.5.0
+
+  :param str source: Path to the file
+  :rtype: bool
+  """
+  with open(source, "rb") as handle:
+    header = handle.read(16)
+
+  return (len(header) == 16 and header[:4] == "\x1f\x8b\x08\x04" and
+          header[12:16] == "BC\x02\x00")
+
+
+def bgzfOffsets(source):
+  """
+  Reads the offsets of the blocks of a BGZF file (all but the first) from
+  their headers and footers, without decompressing anything.
+
+  .. versionadded:: 0.5.0
+
+  :param str source: Path to the BGZF file
+  :returns: List of ``(compressed, uncompressed)`` offsets
+  :rtype: list
+  """
+  return [block for block in bgzfBlocks(source)[:-1] if block[0]]
+
+
+def bgzfBlocks(source):
+  """
+  Reads the offsets of the start of every block of a BGZF file that holds
+  data, followed by the end of the data. The same as
+  :meth:`cosmid.streams.Bgzf.blocks` returns while compressing.
+
+  .. versionadded:: 0.5.0
+
+  :param str source: Path to the BGZF file
+  :returns: List of ``(compressed, uncompressed)`` offsets
+  :rtype: list
+  """
+  blocks = []
+  end = (0, 0)
+  compressed = uncompressed = 0
+
+  with open(source, "rb") as handle:
+    while True:
+      header = handle.read(18)
+      if len(header) < 18:
+        break
+
+      block_size = struct.unpack("<H", header[16:18])[0] + 1
+
+      # The uncompressed size is the last field of the block
+      handle.seek(compressed + block_size - 4)
+      size = struct.unpack("<I", handle.read(4))[0]
+
+      if size:
+        blocks.append((compressed, uncompressed))
+
+      compressed += block_size
+      uncompressed += size
+
+      if size:
+        end = (compressed, uncompressed)
+
+  return blocks + [end]
+
+
+def verify(source, algorithm, checksum):
+  """
+  Checksums a file on disk and compares it with an expected checksum. Meant
+  for algorithms that are too slow to compute while downloading (see
+  :attr:`cosmid.streams.Checksum.slow`) so it can be run in a worker process.
+
+  .. versionadded:: 0.5.0
+
+  :param str source: Path to the file
+  :param str algorithm: Checksum algorithm
+  :param str checksum: The expected checksum
+  :returns: Whether the checksums match and the actual checksum
+  :rtype: tuple
+  """
+  digest = Checksum(algorithm=algorithm).sync(source,
+                                              os.path.getsize(source))
+
+  return digest.verify(checksum), digest.hexdigest()
+
+
+def decompress(paths, jobs=None, fasta=()):
+  """
+  Decompresses the ".gz" files among a list of paths in parallel, replacing
+  each with its decompressed version. Other files are left alone. FASTA
+  files are indexed while they're decompressed.
+
+  .. code-block:: python
+
+    >>> decompress(["chr1.fa.gz", "chr2.fa.gz", "README"])
+    1203428907
+
+  .. versionadded:: 0.5.0
+
+  :param list paths: Paths to downloaded files
+  :param int jobs: (optional) Max number of worker processes; defaults to
+                   the number of cores, see :meth:`WorkerPool.map`
+  :param list fasta: (optional) Patterns of FASTA files to index, see
+                     :func:`matches`
+  :returns: Number of bytes written
+  :rtype: int
+  """
+  tasks = [(path, matches(path, fasta)) for path in paths
+           if path.endswith(".gz")]
+
+  return sum(workers.map(_gunzip, tasks, jobs=jobs))
+
+
+def _gunzip(task):
+  """
+  Decompresses a ``(source, index)`` task of :func:`decompress`.
+  """
+  source, index = task
+
+  return gunzip(source, index=index)
+
+
+def _read(sources):
+  """
+  Yields the contents of files, in order, a chunk at a time.
+  """
+  for source in sources:
+    with open(source, "rb") as handle:
+      for chunk in iter(lambda: handle.read(CHUNK_SIZE), ""):
+        yield chunk
+
+
+def _write(chunks, dest, decompress=False, index=False):
+  """
+  Writes chunks of data to a file that's moved in place once complete,
+  decompressing and/or indexing them on the way. Returns the size of the
+  file and the :class:`cosmid.streams.FastaIndex` (if `index`).
+  """
+  fai = None
+
+  with atomic_write(dest, "wb") as output:
+    writer = output
+
+    if index:
+      writer = fai = FastaIndex(writer)
+
+    if decompress:
+      writer = Gunzip(writer)
+
+    for chunk in chunks:
+      writer.write(chunk)
+
+    if writer is not output:
+      writer.close()
+
+    written = output.tell()
+
+  return written, fai
+
+
+def _extract(handle, dest):
+  """
+  Extracts an archive member (file-like) and indexes it as FASTA. Returns
+  the number of bytes written.
+  """
+  folder = os.path.dirname(dest)
+  if folder and not os.path.isdir(folder):
+    os.makedirs(folder)
+
+  try:
+    chunks = iter(lambda: handle.read(CHUNK_SIZE), "")
+    written, fai = _write(chunks, dest, index=True)
+
+  finally:
+    handle.close()
+
+  return written + fai.save(dest)
+
+
+def cpu_count():
+  """
+  Returns the number of cores or 1 if it can't be determined.
+
+  .. versionadded:: 0.5.0
+
+  :rtype: int
+  """
+  try:
+    return multiprocessing.cpu_count()
+
+  except NotImplementedError:
+    return 1
@@ -9,13 +9,62 @@ Each resource is responsible for:
 - Returning link(s) for the files to download
 - Specify binary/gzip/concat options
 - Keeps track of what the resource is called locally
+- Looking up upstream checksums for the files
 """
+import os
+import posixpath
+import re
+from fnmatch import fnmatch
+
+from magicmethods import lazy_import
+from postprocess import bgzip, matches
+from streams import dict_path
+
+# Only needed once a resource talks to its server
+ftplib = lazy_import("ftplib")
+
+
+def karyotype(file_name):
+  """
+  Sort key for ordering files split by chromosome in karyotype order:
+  1-22, X, Y, MT followed by anything else.
+
+  .. code-block:: python
+
+    >>> sorted(["chr10.fa.gz", "chrX.fa.gz", "chr2.fa.gz"], key=karyotype)
+    ['chr2.fa.gz', 'chr10.fa.gz', 'chrX.fa.gz']
+
+  .. versionadded:: 0.5.0
+
+  :param str file_name: File name including a "chr<name>" part
+  :returns: Sort key
+  :rtype: tuple
+  """
+  match = re.search(r"chr([0-9]+|[A-Za-z]+)", file_name)
+
+  if match is None:
+    return (3, 0, file_name)
+
+  chrom = match.group(1)
+  if chrom.isdigit():
+    return (0, int(chrom), file_name)
+
+  elif chrom.upper() in ("X", "Y", "M", "MT"):
+    return (1, ("X", "Y", "M", "MT").index(chrom.upper()), file_name)
+
+  else:
+    return (2, 0, file_name)
 
 
 class BaseResource(object):
   """
   A Resource represents a local genomics resource that can be on the file
   system or destined to be downloaded.
+
+  Resources are plain metadata: setting one up must never touch the network
+  (servers connect on first use) so they're cheap to create, also offline.
+  Only :meth:`versions`, :meth:`latest`, :meth:`paths` and downloading
+  should talk to the server.
   """
   def __init__(self):
     super(BaseResource, self).__init__()
@@ -25,6 +74,29 @@ class BaseResource(object):
     # The keyword for the resource
     self.id = "resource"
 
+    # Number of connections to split each (large) file download over
+    self.segments = 1
+
+    # Can ".gz" files be decompressed while downloading instead of in
+    # `postClone`? Files are then handed to `postClone` without ".gz".
+    self.stream = False
+
+    # Name of a single file to concatenate all the files into while
+    # streaming. `postClone` is then handed only the combined file.
+    self.assembly = None
+
+    # Patterns of files (e.g. "*.vcf.gz") that can be kept BGZF compressed
+    # instead of being decompressed; see `recompress`
+    self.bgzf = []
+
+    # Patterns of FASTA files (e.g. "*.fa") to write a ".fai" index for
+    # while they're written. A ".gz" extension is ignored when matching.
+    self.fasta = []
+
+    # Patterns of VCF files to write a tabix (".tbi") index for once they're
+    # BGZF compressed; see `recompress`
+    self.vcf = []
+
   def versions(self):
     """
     <public> Returns a list of version tags for availble resource versions.
@@ -65,6 +137,151 @@ class BaseResource(object):
     """
     return []
 
+  def checksums(self, dl_paths):
+    """
+    <public> Returns upstream checksums for (some of) the files to download
+    that the downloads are verified against. Files without a checksum are
+    left out.
+
+    .. versionadded:: 0.5.0
+
+    :param list dl_paths: Full download paths returned by :meth:`paths`
+    :returns: ``{ dl_path: (algorithm, checksum) }``
+    :rtype: dict
+    """
+    return {}
+
+  def listedChecksums(self, dl_paths, file_name, algorithm="md5"):
+    """
+    <public> Looks up checksums in a listing file (like Ensembl's "CHECKSUMS"
+    or NCBI's "md5checksums.txt") in the same folder as each file. Each line
+    holds the checksum followed by the file name. Missing listings are
+    ignored.
+
+    .. versionadded:: 0.5.0
+
+    :param list dl_paths: Full download paths
+    :param str file_name: Name of the listing file
+    :param str algorithm: (optional) Algorithm used for the checksums
+    :returns: ``{ dl_path: (algorithm, checksum) }``
+    :rtype: dict
+    """
+    checksums = {}
+
+    for folder in set(posixpath.dirname(dl_path) for dl_path in dl_paths):
+      listing = {}
+
+      try:
+        with self.ftp.file(posixpath.join(folder, file_name),
+                           max_bytes=1024 * 1024) as handle:
+          for line in handle:
+            fields = line.split()
+
+            if len(fields) > 1:
+              # E.g. "<md5>  ./file.gz" or "<sum> <blocks> file.gz"
+              name = posixpath.basename(fields[-1])
+              listing[name] = " ".join(fields[:-1])
+
+      except ftplib.error_perm:
+        continue
+
+      for dl_path in dl_paths:
+        name = posixpath.basename(dl_path)
+        if posixpath.dirname(dl_path) == folder and name in listing:
+          checksums[dl_path] = (algorithm, listing[name])
+
+    return checksums
+
+  def siblingChecksums(self, dl_paths, suffix=".md5", algorithm="md5"):
+    """
+    <public> Looks up checksums stored next to each file, e.g.
+    "dbsnp_138.b37.vcf.gz.md5". Missing checksum files are ignored.
+
+    .. versionadded:: 0.5.0
+
+    :param list dl_paths: Full download paths
+    :param str suffix: (optional) Extension of the checksum files
+    :param str algorithm: (optional) Algorithm used for the checksums
+    :returns: ``{ dl_path: (algorithm, checksum) }``
+    :rtype: dict
+    """
+    checksums = {}
+
+    for dl_path in dl_paths:
+      try:
+        with self.ftp.file(dl_path + suffix, max_bytes=64 * 1024) as handle:
+          fields = handle.read().split()
+
+      except ftplib.error_perm:
+        continue
+
+      if fields:
+        checksums[dl_path] = (algorithm, fields[0])
+
+    return checksums
+
+  def recompress(self, cloned_files, threads=None):
+    """
+    <public> Compresses the downloaded files that match :attr:`bgzf` as BGZF
+    with a ".gzi" index (see :func:`cosmid.postprocess.bgzip`). Files that
+    were decompressed while downloading are matched as if they still ended
+    with ".gz". FASTA and VCF files (see :attr:`fasta` and :attr:`vcf`)
+    are indexed on the way. Called before :meth:`postClone` with
+    ``--format bgzf``.
+
+    .. versionadded:: 0.5.0
+
+    :param list cloned_files: List of paths to the downloaded resource files
+    :param int threads: (optional) Number of threads to compress with
+    :returns: The files left for :meth:`postClone` and the number of bytes
+              written: ``(cloned_files, processed)``
+    :rtype: tuple
+    """
+    remaining = []
+    processed = 0
+
+    for cloned_file in cloned_files:
+      name = os.path.basename(cloned_file)
+      if not name.endswith(".gz"):
+        name += ".gz"
+
+      if any(fnmatch(name, pattern) for pattern in self.bgzf):
+        processed += bgzip(cloned_file, threads=threads,
+                           fasta=matches(cloned_file, self.fasta),
+                           vcf=matches(cloned_file, self.vcf))
+
+      else:
+        remaining.append(cloned_file)
+
+    return remaining, processed
+
+  def indexes(self, target_dir):
+    """
+    <public> Lists the index files (".fai", ".gzi", ".tbi") and sequence
+    dictionaries (".dict") next to the resource's FASTA and VCF files (see
+    :attr:`fasta` and :attr:`vcf`), e.g. to record them in the history.
+
+    .. versionadded:: 0.5.0
+
+    :param str target_dir: Path to resource directory
+    :returns: Sorted list of file names
+    :rtype: list
+    """
+    if not os.path.isdir(target_dir):
+      return []
+
+    names = set(os.listdir(target_dir))
+
+    indexes = set()
+    for name in names:
+      if matches(name, self.fasta + self.vcf):
+        companions = [name + ".fai", name + ".gzi", name + ".tbi",
+                      dict_path(name)]
+
+        indexes.update(names.intersection(companions))
+
+    return sorted(indexes)
+
   def postClone(self, cloned_files, target_dir, version):
     """
     <public> This callback method will be called once the files in the resource
@@ -74,10 +291,16 @@ class BaseResource(object):
     This can be used as a way to rename, unzip, or concat files; generally
     post process them to prepare them for the user.
 
+    Use :mod:`cosmid.postprocess` to decompress many files at once.
+
     :param list cloned_files: List of paths to the downloaded resource files
     :param str target_dir: Path to resource directory
     :param object version: Version of the resource that was downloaded
+    :returns: Number of bytes written while processing
+    :rtype: int
 
     .. versionadded:: 0.3.0
+    .. versionchanged:: 0.5.0
+       Returns the number of bytes processed.
     """
     return 0
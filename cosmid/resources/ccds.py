@@ -23,15 +23,15 @@ class Resource(BaseResource):
             if dirName.startswith("Hs")]
 
   def latest(self):
-    # Load in info-file
-    f = self.ftp.file("{}/current_human/BuildInfo.current.txt"
-                      .format(self.baseUrl))
+    # Stream the info-file; we only need the first couple of lines
+    with self.ftp.file("{}/current_human/BuildInfo.current.txt"
+                       .format(self.baseUrl), max_bytes=64 * 1024) as f:
 
-    # Discard comment line
-    _ = f.readline()
+      # Discard comment line
+      _ = f.readline()
 
-    # Return formatted NCBI release number
-    return "Hs{}".format(f.readline().split("\t")[1])
+      # Return formatted NCBI release number
+      return "Hs{}".format(f.readline().split("\t")[1])
 
   def newer(self, current, challenger):
     currentFloat = float(current.replace("Hs", ""))
@@ -15,6 +15,9 @@ class Resource(iResource):
     self.parts = 1
     self.names = ["dbsnp.vcf.gz"]
 
+    # A single large file; download it over several connections
+    self.segments = 4
+
   def paths(self, version):
     bundle_id, assembly = self.defineVersion(version)
 
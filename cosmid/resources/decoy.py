@@ -3,6 +3,7 @@
 
 from ..resource import BaseResource
 from ..servers.thousandg import ThousandG
+from ..postprocess import bgzip, isBgzf
 
 
 class Resource(BaseResource):
@@ -19,6 +20,13 @@ class Resource(BaseResource):
     self.parts = 1
     self.names = ["hs37d5.fa.gz"]
 
+    # A single large file; download it over several connections
+    self.segments = 4
+
+    # Can be kept compressed for samtools faidx
+    self.bgzf = ["*.fa.gz"]
+    self.fasta = ["*.fa"]
+
   def versions(self):
     return [5]
 
@@ -31,3 +39,12 @@ class Resource(BaseResource):
   def paths(self, version):
     uri = "{base}/hs37d{v}.fa.gz".format(base=self.baseUrl, v=version)
     return [uri]
+
+  def postClone(self, cloned_files, target_dir, version):
+    """
+    Indexes the assembly which is BGZF compressed upstream already.
+
+    .. versionadded:: 0.5.0
+    """
+    return sum(bgzip(f, fasta=True) for f in cloned_files
+               if f.endswith(".gz") and isBgzf(f))
@@ -3,7 +3,7 @@
 
 from ..resource import BaseResource
 from ..servers.ensembl import Ensembl
-import sh
+from ..postprocess import decompress
 
 
 class Resource(BaseResource):
@@ -18,6 +18,18 @@ class Resource(BaseResource):
     self.parts = 1
     self.names = ["Ensembl.Homo_sapiens.fa.gz"]
 
+    # The files are gunzipped after download anyway
+    self.stream = True
+
+    # A single large file; download it over several connections
+    self.segments = 4
+
+    # Can be kept compressed for samtools faidx
+    self.bgzf = ["*.fa.gz"]
+
+    # Indexed while it's written
+    self.fasta = ["*.fa"]
+
   def versions(self):
     releases = [int(directory.replace("release-", ""))
                 for directory in self.ftp.listFiles("pub", "release-*")]
@@ -39,14 +51,15 @@ class Resource(BaseResource):
 
     return ["{base}/{file}".format(base=base, file=files[0])]
 
+  def checksums(self, dl_paths):
+    # Ensembl lists BSD sums for every file in the folder
+    return self.listedChecksums(dl_paths, "CHECKSUMS", algorithm="sum")
+
   def postClone(self, cloned_files, target_dir, version):
     """
     Extracts the downloaded assembly.
 
     .. versionadded:: 0.3.0
     """
-    # GZIP and TAR the file and save to the target directory
-    for f in cloned_files:
-      sh.gunzip(f)
-
-    return 0
+    # GunZIP the file unless already decompressed during download
+    return decompress(cloned_files, fasta=self.fasta)
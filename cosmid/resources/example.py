@@ -3,7 +3,7 @@
 
 from ..resource import BaseResource
 from ..servers.gatk import GATK
-import sh
+from ..postprocess import decompress
 
 
 class Resource(BaseResource):
@@ -16,10 +16,18 @@ class Resource(BaseResource):
     self.ftp = GATK()
     self.baseUrl = "bundle"
 
+    # The FASTA index is downloaded too rather than built locally
     self.parts = 4
     self.names = ["exampleBAM.bam", "exampleBAM.bam.bai.gz",
                   "exampleFASTA.fasta.fai.gz", "exampleFASTA.fasta.gz"]
 
+    # The files are gunzipped after download anyway
+    self.stream = True
+
+    # VCFs (dbsnp, hapmap, mills, 1000g...) can be kept compressed for tabix
+    self.bgzf = ["*.vcf.gz"]
+    self.vcf = ["*.vcf"]
+
   def versions(self):
     assemblies = ['b36', 'b37', 'hg18', 'hg19']
     versions = self.ftp.ls(self.baseUrl)
@@ -64,17 +72,15 @@ class Resource(BaseResource):
 
     return ["{base}/{file}".format(base=base, file=f) for f in self.names]
 
+  def checksums(self, dl_paths):
+    # Each file in the bundle has an MD5 sibling
+    return self.siblingChecksums(dl_paths, ".md5")
+
   def postClone(self, cloned_files, target_dir, version):
     """
     Extracts the compressed archives.
 
     .. versionadded:: 0.3.0
     """
-    # GZIP the files (and remove the archive)
-    for f in cloned_files:
-
-      # Only some of the files needs to be gzipped
-      if f.endswith(".gz"):
-        sh.gunzip(f)
-
-    return 0
+    # GZIP the files (and remove the archive), several at a time
+    return decompress(cloned_files)
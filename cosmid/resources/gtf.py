@@ -2,7 +2,7 @@
 """Human genes from Ensembl."""
 
 from ensembl_assembly import Resource as iResource
-import sh
+from ..postprocess import decompress
 
 
 class Resource(iResource):
@@ -27,9 +27,5 @@ class Resource(iResource):
 
     .. versionadded:: 0.3.0
     """
-    # GZIP the files (and remove the archive)
-    for f in cloned_files:
-
-      # Only some of the files needs to be gzipped
-      if f.endswith(".gz"):
-        sh.gunzip(f)
+    # GZIP the files (and remove the archive), several at a time
+    return decompress(cloned_files)
@@ -1,9 +1,9 @@
 #!/usr/bin/env python
 """NCBI Human genome assembly."""
 
-from ..resource import BaseResource
+from ..resource import BaseResource, karyotype
 from ..servers.ncbi import NCBI
-import sh
+from ..postprocess import concatenate, decompress
 
 
 class Resource(BaseResource):
@@ -20,6 +20,15 @@ class Resource(BaseResource):
     self.names = ["NCBI.Homo_sapiens.{chrom}.fa.gz".format(chrom=chrom)
                   for chrom in range(1, 23) + ["X", "Y", "MT"]]
 
+    # The files are gunzipped after download anyway
+    self.stream = True
+
+    # ...and then concatenated
+    self.assembly = "NCBI.Homo_sapiens.fa"
+
+    # Indexed while it's written
+    self.fasta = [self.assembly]
+
   def versions(self):
     # Basically the combination of assembly + path is a valid float
 
@@ -56,22 +65,31 @@ class Resource(BaseResource):
 
     files = self.ftp.listFiles(base, "hs_ref_*_chr*.fa.gz")
 
-    # Should only be one file that matches
+    # One file per chromosome in karyotype order (matching `names`)
+    files = sorted(files, key=karyotype)
+
     return ["{base}/{file}".format(base=base, file=f) for f in files]
 
+  def checksums(self, dl_paths):
+    return self.listedChecksums(dl_paths, "md5checksums.txt")
+
   def postClone(self, cloned_files, target_dir, version):
     """
     .. versionadded:: 0.3.0
     """
-    # Start by extracting all the files
-    for f in cloned_files:
-      # GunZIP the file (and remove the archive)
-      sh.gunzip(f)
+    # Path to the concatenated assembly
+    target_path = "{}/{}".format(target_dir, self.assembly)
+
+    if cloned_files == [target_path]:
+      # Already decompressed and concatenated while downloading
+      return 0
+
+    # Start by extracting all the files (unless already done), in parallel
+    processed = decompress(cloned_files)
 
     # Then let's concat them
-    target_path = "{}/NCBI.Homo_sapiens.fa".format(target_dir)
     # Remove ".gz" ending to point to extracted files
-    cat_args = [f[:-3] for f in cloned_files]
+    cat_args = [f[:-3] if f.endswith(".gz") else f for f in cloned_files]
 
-    # Execute the concatenation in the background and write to the target path
-    sh.cat(*cat_args, _out=target_path, _bg=True)
+    # Write the concatenation (and its index) to the target path
+    return processed + concatenate(cat_args, target_path, index=True)
@@ -2,9 +2,11 @@
 """UCSC Human genome assembly."""
 
 from __future__ import print_function
+import os
+
 from ..resource import BaseResource
 from ..servers.ucsc import UCSC
-import sh
+from ..postprocess import unzip, untar
 
 
 class Resource(BaseResource):
@@ -20,6 +22,9 @@ class Resource(BaseResource):
     self.parts = 1
     self.names = ["UCSC.Homo_sapiens.tar.gz"]
 
+    # One file per chromosome, indexed while it's extracted
+    self.fasta = ["*.fa"]
+
   def versions(self):
     # Only one release
     # Skip releases like "hg15june2000" (if)
@@ -44,6 +49,9 @@ class Resource(BaseResource):
     else:
       return ["{base}/chromFa.zip".format(base=base)]
 
+  def checksums(self, dl_paths):
+    return self.listedChecksums(dl_paths, "md5sum.txt")
+
   def postClone(self, cloned_files, target_dir, version):
     """
     Extracts the compressed archives.
@@ -54,11 +62,12 @@ class Resource(BaseResource):
 
     if self.newer("hg18", version):
       # GZIP and TAR the file and save to the target directory
-      sh.tar("-xzf", f, "-C", target_dir)
+      return untar(f, target_dir, fasta=self.fasta)
 
     else:
       # Rename to ".zip"
-      sh.mv(f, f.replace("tar.gz", "zip"))
+      archive = f.replace("tar.gz", "zip")
+      os.rename(f, archive)
 
-      # GunZIP the file (and remove the archive)
-      sh.gunzip(f)
+      # Extract the archive into the target directory
+      return unzip(archive, target_dir, fasta=self.fasta)
@@ -0,0 +1,161 @@
+#!/usr/bin/env python
+"""
+Fuzzy search over the available resources.
+
+Resource IDs and the words of their docstrings are indexed by trigrams. A
+query only has to be compared with the handful of terms that share
+trigrams with it rather than with every resource.
+"""
+import re
+from collections import defaultdict
+
+from magicmethods import lazy_import
+
+# Only needed once there's something to search for
+fuzz = lazy_import("fuzzywuzzy.fuzz")
+
+
+class SearchIndex(object):
+  """
+  Trigram index of terms that point back to a resource ID. Matches are
+  shortlisted by shared trigrams and then scored with
+  :func:`fuzzywuzzy.fuzz.WRatio` (0-100) like :mod:`fuzzywuzzy.process`
+  would; a match on a docstring word counts a little less than one on the
+  ID itself.
+
+  .. code-block:: python
+
+    >>> index = SearchIndex()
+    >>> index.add("ccds", "ccds", weight=1.0)
+    >>> index.search("cdds")
+    [('ccds', 75)]
+
+  .. versionadded:: 0.5.0
+
+  :param int shortlist: (optional) Max number of terms to score per query
+  """
+  # Weight of matches on docstring words relative to matches on IDs
+  doc_weight = 0.9
+
+  def __init__(self, shortlist=25):
+    super(SearchIndex, self).__init__()
+    self.shortlist = shortlist
+
+    # ``[term, key, weight]`` lists
+    self.terms = []
+
+    # Trigram -> indexes into ``terms``
+    self.grams = defaultdict(list)
+
+  @classmethod
+  def build(cls, items):
+    """
+    <public> Indexes resources from ``(resource_id, docstring)`` tuples like
+    the ones returned by :meth:`cosmid.core.Registry.ls`.
+
+    :param list items: ``(resource_id, docstring)`` tuples
+    :returns: A new index
+    :rtype: :class:`SearchIndex`
+    """
+    index = cls()
+
+    for resource_id, docstring in items:
+      index.add(resource_id, resource_id)
+
+      # Also match each part of IDs like "ensembl_assembly"
+      for part in resource_id.split("_"):
+        index.add(resource_id, part)
+
+      for word in set(re.findall(r"[a-z0-9]{3,}", (docstring or "").lower())):
+        index.add(resource_id, word, weight=cls.doc_weight)
+
+    return index
+
+  @classmethod
+  def load(cls, data):
+    """
+    <public> Restores an index from :meth:`dump`.
+
+    :param dict data: Dumped index
+    :returns: The restored index
+    :rtype: :class:`SearchIndex`
+    """
+    index = cls()
+    index.terms = data["terms"]
+    index.grams.update(data["grams"])
+
+    return index
+
+  def dump(self):
+    """
+    <public> Returns the index as JSON serializable data.
+
+    :rtype: dict
+    """
+    return {"terms": self.terms, "grams": self.grams}
+
+  def add(self, key, term, weight=1.0):
+    """
+    <public> Indexes a term that points to `key`.
+
+    :param str key: What a match on the term resolves to
+    :param str term: The text to match against
+    :param float weight: (optional) Relative importance of the term
+    """
+    term = str(term).lower()
+    position = len(self.terms)
+    self.terms.append([term, key, weight])
+
+    for gram in self.trigrams(term):
+      self.grams[gram].append(position)
+
+  def search(self, query, limit=5):
+    """
+    <public> Returns the best matching keys in order of score.
+
+    :param object query: What to look for
+    :param int limit: (optional) Max number of results
+    :returns: A list of tuples: ``(key, score)``
+    :rtype: list
+    """
+    query = str(query).lower()
+    grams = self.trigrams(query)
+
+    # Count the trigrams each term shares with the query
+    shared = defaultdict(int)
+    for gram in grams:
+      for position in self.grams.get(gram, ()):
+        shared[position] += 1
+
+    def overlap(position):
+      # Dice coefficient of the trigrams
+      term = self.terms[position][0]
+      return 2.0 * shared[position] / (len(grams) + len(self.trigrams(term)))
+
+    candidates = sorted(shared, key=overlap, reverse=True)[:self.shortlist]
+
+    # Score the shortlist properly; keep the best score per key
+    scores = {}
+    for position in candidates:
+      term, key, weight = self.terms[position]
+      score = int(round(fuzz.WRatio(query, term) * weight))
+
+      if score > scores.get(key, -1):
+        scores[key] = score
+
+    ranked = sorted(scores.items(), key=lambda item: (-item[1], item[0]))
+
+    return ranked[:limit]
+
+  @staticmethod
+  def trigrams(text):
+    """
+    <public> Returns the set of trigrams of a text, padded so that short
+    words and word boundaries count too.
+
+    :param str text: Text to split up
+    :rtype: set
+    """
+    padded = " {} ".format(text)
+
+    return set(padded[i:i + 3] for i in range(max(len(padded) - 2, 1)))
@@ -0,0 +1,174 @@
+#!/usr/bin/env python
+"""
+Content-addressed store of downloaded files.
+
+Every downloaded file with a trustworthy checksum is hardlinked into the
+store under its checksum. Identical files needed by other resources (or in
+other projects using the same store) are then linked into place instead of
+being downloaded again, and only take up disk space once.
+"""
+import binascii
+import errno
+import os
+import shutil
+
+from magicmethods import atomic_write
+from postprocess import gunzip
+
+
+class ObjectStore(object):
+  """
+  Files stored by checksum as "<root>/<algorithm>/<ab>/<cdef...>".
+
+  .. code-block:: python
+
+    >>> store = ObjectStore("resources/.objects")
+    >>> store.add("resources/dbsnp/dbsnp.vcf.gz", "md5", "9c4a...")
+    >>> stored = store.find("md5", "9c4a...")
+    >>> store.link(stored, "resources/dbsnpex/dbsnp.vcf.gz")
+
+  .. versionadded:: 0.5.0
+
+  :param str root: Path to the directory that holds the store
+  """
+  # BSD sums (like Ensembl's) are far too weak to identify files by
+  algorithms = ("md5", "sha1", "sha256", "sha512")
+
+  def __init__(self, root):
+    super(ObjectStore, self).__init__()
+    self.root = root
+
+  def path(self, algorithm, checksum):
+    """
+    <public> Returns where a file with a given checksum is (or would be)
+    stored. ``None`` for unsupported algorithms.
+
+    :param str algorithm: Checksum algorithm
+    :param str checksum: The checksum of the file
+    :returns: Path to the object
+    :rtype: str
+    """
+    checksum = checksum.strip().lower()
+
+    if algorithm not in self.algorithms or not checksum.isalnum():
+      return None
+
+    return os.path.join(self.root, algorithm, checksum[:2], checksum[2:])
+
+  def find(self, algorithm, checksum):
+    """
+    <public> Looks up a file by its checksum.
+
+    :param str algorithm: Checksum algorithm
+    :param str checksum: The checksum of the file
+    :returns: Path to the stored file or ``None`` if it isn't stored
+    :rtype: str
+    """
+    object_path = self.path(algorithm, checksum)
+
+    if object_path and os.path.isfile(object_path):
+      return object_path
+
+    return None
+
+  def add(self, source, algorithm, checksum):
+    """
+    <public> Adds a file to the store by hardlinking it. Nothing is stored
+    if the file can't be linked (e.g. the store is on another file system).
+
+    :param str source: Path to the file
+    :param str algorithm: Checksum algorithm
+    :param str checksum: The checksum of the file
+    :returns: Path to the stored file or ``None`` if it couldn't be stored
+    :rtype: str
+    """
+    object_path = self.path(algorithm, checksum)
+
+    if object_path is None:
+      return None
+
+    if os.path.isfile(object_path):
+      return object_path
+
+    try:
+      self._makedirs(os.path.dirname(object_path))
+      os.link(source, object_path)
+
+    except OSError as error:
+      if error.errno == errno.EEXIST:
+        # Another download got there first
+        return object_path
+
+      return None
+
+    return object_path
+
+  def link(self, object_path, dest):
+    """
+    <public> Puts a stored file in place, as a hardlink when possible and
+    otherwise as a copy. Whatever was at `dest` is replaced atomically.
+
+    :param str object_path: Path to the stored file
+    :param str dest: Path to put the file at
+    :returns: `dest`
+    :rtype: str
+    """
+    try:
+      temp_path = self._hardlink(object_path, dest)
+
+    except OSError:
+      with atomic_write(dest, "wb") as output:
+        with open(object_path, "rb") as handle:
+          shutil.copyfileobj(handle, output)
+
+      return dest
+
+    os.rename(temp_path, dest)
+
+    return dest
+
+  def _hardlink(self, object_path, dest):
+    """
+    <private> Hardlinks a stored file to a temporary name of its own next
+    to `dest` (never "<dest>.part", which may be a download to resume) and
+    returns the name.
+    """
+    while True:
+      temp_path = "{}.{}.tmp".format(dest, binascii.hexlify(os.urandom(6)))
+
+      try:
+        os.link(object_path, temp_path)
+
+      except OSError as error:
+        if error.errno == errno.EEXIST:
+          # Taken by another writer; try another name
+          continue
+
+        raise
+
+      return temp_path
+
+  def inflate(self, object_path, dest, index=False):
+    """
+    <public> Decompresses a stored gzip file to `dest` instead of linking it.
+
+    :param str object_path: Path to the stored (gzipped) file
+    :param str dest: Path to write the decompressed file to
+    :param bool index: (optional) Also write a FASTA index ("<dest>.fai")
+    :returns: `dest`
+    :rtype: str
+    """
+    gunzip(object_path, dest, remove=False, index=index)
+
+    return dest
+
+  def _makedirs(self, folder):
+    """
+    <private> Creates a folder and its parents unless it already exists.
+    """
+    try:
+      os.makedirs(folder)
+
+    except OSError as error:
+      if error.errno != errno.EEXIST:
+        raise
@@ -0,0 +1,976 @@
+#!/usr/bin/env python
+"""
+File-like writers that process data on the fly as it's being downloaded.
+
+Each writer wraps another file-like object (``handle``) and exposes
+``write`` and ``close`` which makes it possible to pass ``writer.write``
+straight to :meth:`ftplib.FTP.retrbinary` as the callback.
+"""
+import bisect
+import collections
+import copy
+import hashlib
+import os
+import string
+import struct
+import zlib
+from StringIO import StringIO
+
+from magicmethods import atomic_write, lazy_import
+
+# Only needed to compress over several threads
+ThreadPool = lazy_import("multiprocessing.pool", "ThreadPool")
+
+# Empty block that marks the end of a BGZF file
+BGZF_EOF = ("\x1f\x8b\x08\x04\x00\x00\x00\x00\x00\xff\x06\x00\x42\x43"
+            "\x02\x00\x1b\x00\x03\x00\x00\x00\x00\x00\x00\x00\x00\x00")
+
+# Sequence dictionary checksums are of the uppercase bases without line
+# breaks or other whitespace
+UPPERCASE = string.maketrans(string.ascii_lowercase, string.ascii_uppercase)
+WHITESPACE = " \t\r\n\x0b\x0c"
+
+
+class Gunzip(object):
+  """
+  Decompresses gzip data on the fly and writes the result to ``handle``.
+  Handles files made up of several gzip members (like BGZF files) too.
+
+  .. code-block:: python
+
+    >>> with open("hs37d5.fa", "wb") as handle:
+    ...   writer = Gunzip(handle)
+    ...   ftp.retrbinary("RETR hs37d5.fa.gz", writer.write)
+    ...   writer.close()
+
+  .. versionadded:: 0.5.0
+
+  :param file handle: File-like object to write decompressed data to
+  """
+  def __init__(self, handle):
+    super(Gunzip, self).__init__()
+    self.handle = handle
+
+    # Number of compressed bytes that have passed through
+    self.consumed = 0
+
+    self.decompressor = self._decompressor()
+
+  def write(self, chunk):
+    """
+    <public> Decompresses a chunk of gzip data and writes the result.
+
+    :param str chunk: Compressed data
+    """
+    self.consumed += len(chunk)
+
+    while chunk:
+      self.handle.write(self.decompressor.decompress(chunk))
+
+      # Anything left over belongs to the next gzip member
+      chunk = self.decompressor.unused_data
+      if chunk:
+        self.decompressor = self._decompressor()
+
+  def close(self):
+    """
+    <public> Writes any remaining buffered data. Doesn't close ``handle``.
+    """
+    self.handle.write(self.decompressor.flush())
+
+  def _decompressor(self):
+    """
+    <private> Sets up a decompressor that expects a gzip header.
+    """
+    return zlib.decompressobj(16 + zlib.MAX_WBITS)
+
+
+class BSDSum(object):
+  """
+  The BSD ``sum`` checksum (a 16-bit rotating checksum) with a
+  :mod:`hashlib` like interface. Ensembl publishes these in its "CHECKSUMS"
+  files. It's computed in pure Python so it's a lot slower than MD5.
+
+  .. versionadded:: 0.5.0
+  """
+  def __init__(self):
+    super(BSDSum, self).__init__()
+    self.checksum = 0
+    self.size = 0
+
+  def update(self, data):
+    """
+    <public> Adds a chunk of data to the checksum.
+
+    :param str data: The data to add
+    """
+    checksum = self.checksum
+    for byte in bytearray(data):
+      checksum = ((checksum >> 1) + ((checksum & 1) << 15) + byte) & 0xffff
+
+    self.checksum = checksum
+    self.size += len(data)
+
+  def hexdigest(self):
+    """
+    <public> Returns the checksum like ``sum`` prints it: the checksum and the
+    number of 1K blocks (e.g. "02372 2").
+
+    :rtype: str
+    """
+    return "{:05d} {}".format(self.checksum, (self.size + 1023) // 1024)
+
+
+class Checksum(object):
+  """
+  Computes a checksum of data on the fly, either passing the data on to
+  ``handle`` (:meth:`write`) or just keeping count (:meth:`update`).
+
+  .. code-block:: python
+
+    >>> checksum = Checksum(handle, "md5")
+    >>> ftp.retrbinary("RETR dbsnp_138.b37.vcf.gz", checksum.write)
+    >>> checksum.verify("e2f1f0ea6b0dc2c3e3b1a7d0e05d1b5e")
+    True
+
+  .. versionadded:: 0.5.0
+
+  :param file handle: (optional) File-like object to pass data on to
+  :param str algorithm: (optional) "md5", "sha256" (any :mod:`hashlib`
+                        algorithm) or "sum" (BSD sum)
+  """
+  # Too slow to keep up with a download; check these on disk afterwards
+  slow = ("sum",)
+
+  def __init__(self, handle=None, algorithm="md5"):
+    super(Checksum, self).__init__()
+    self.handle = handle
+    self.algorithm = algorithm
+    self.reset()
+
+  def reset(self):
+    """
+    <public> Starts over from scratch.
+
+    :returns: self
+    """
+    if self.algorithm == "sum":
+      self.hash = BSDSum()
+    else:
+      self.hash = hashlib.new(self.algorithm)
+
+    # Number of bytes that have been checksummed
+    self.size = 0
+
+    return self
+
+  def update(self, chunk):
+    """
+    <public> Adds a chunk of data to the checksum.
+
+    :param str chunk: The data to add
+    """
+    self.hash.update(chunk)
+    self.size += len(chunk)
+
+  def write(self, chunk):
+    """
+    <public> Adds a chunk of data to the checksum and passes it on.
+
+    :param str chunk: The data to add
+    """
+    self.update(chunk)
+    self.handle.write(chunk)
+
+  def close(self):
+    """
+    <public> Closes the wrapped writer.
+    """
+    if self.handle is not None:
+      self.handle.close()
+
+  def sync(self, source, offset):
+    """
+    <public> Catches up with data already on disk, e.g. from an earlier
+    partial download, by checksumming the first `offset` bytes of a file.
+    Nothing is read if the checksum already covers exactly that much.
+
+    :param str source: Path to the file
+    :param int offset: Number of bytes that the checksum should cover
+    :returns: self
+    """
+    if self.size == offset:
+      return self
+
+    self.reset()
+    if not offset:
+      return self
+
+    with open(source, "rb") as handle:
+      while self.size < offset:
+        chunk = handle.read(min(1024 * 1024, offset - self.size))
+        if not chunk:
+          break
+
+        self.update(chunk)
+
+    return self
+
+  def hexdigest(self):
+    """
+    <public> Returns the checksum as a string.
+
+    :rtype: str
+    """
+    return self.hash.hexdigest()
+
+  def verify(self, expected):
+    """
+    <public> Compares the checksum with an expected value, ignoring case and
+    (for BSD sums) zero padding.
+
+    :param str expected: The expected checksum
+    :returns: ANS: The checksums match
+    :rtype: bool
+    """
+    actual = self.hexdigest()
+
+    if self.algorithm == "sum":
+      return ([int(part) for part in actual.split()] ==
+              [int(part) for part in expected.split()])
+
+    return actual.lower() == expected.strip().lower()
+
+
+def bgzf_block(data, level=6):
+  """
+  Compresses data (at most :attr:`Bgzf.block_size` bytes) into a single BGZF
+  block: a gzip member with its compressed size in a "BC" extra field.
+
+  .. versionadded:: 0.5.0
+
+  :param str data: Uncompressed data
+  :param int level: (optional) zlib compression level
+  :returns: The block
+  :rtype: str
+  """
+  compressor = zlib.compressobj(level, zlib.DEFLATED, -zlib.MAX_WBITS)
+  deflated = compressor.compress(data) + compressor.flush()
+
+  # 18 bytes of header and 8 of footer; BSIZE is the block size minus 1
+  header = struct.pack("<4BI2BH2BHH", 0x1f, 0x8b, 8, 4, 0, 0, 0xff, 6,
+                       ord("B"), ord("C"), 2, len(deflated) + 25)
+  footer = struct.pack("<2I", zlib.crc32(data) & 0xffffffff, len(data))
+
+  return header + deflated + footer
+
+
+class Bgzf(object):
+  """
+  Compresses data into BGZF (blocked gzip) and writes it to ``handle``.
+  BGZF files are valid gzip files that tools like samtools and tabix can
+  also read at random offsets. Blocks are compressed over `threads` threads
+  but written in order.
+
+  The start of each block is recorded so that a ".gzi" index can be written
+  with :meth:`index` once the writer is closed.
+
+  .. code-block:: python
+
+    >>> with open("hs37d5.fa.gz", "wb") as handle:
+    ...   writer = Bgzf(handle, threads=4)
+    ...   ftp.retrbinary("RETR hs37d5.fa", writer.write)
+    ...   writer.close()
+
+  .. versionadded:: 0.5.0
+
+  :param file handle: File-like object to write compressed data to
+  :param int threads: (optional) Number of threads to compress with
+  :param int level: (optional) zlib compression level
+  """
+  # Max number of uncompressed bytes per block (like bgzip)
+  block_size = 0xff00
+
+  def __init__(self, handle, threads=1, level=6):
+    super(Bgzf, self).__init__()
+    self.handle = handle
+    self.threads = threads
+    self.level = level
+
+    self.buffer = ""
+    self.pool = ThreadPool(threads) if threads > 1 else None
+
+    # Blocks being compressed, in order: ``(result, uncompressed size)``
+    self.pending = collections.deque()
+
+    # Compressed and uncompressed offsets of the start of each block but
+    # the first
+    self.offsets = []
+    self.compressed = 0
+    self.uncompressed = 0
+
+  def write(self, chunk):
+    """
+    <public> Compresses a chunk of data, a block at a time.
+
+    :param str chunk: Uncompressed data
+    """
+    self.buffer += chunk
+
+    if len(self.buffer) >= self.block_size:
+      blocks = len(self.buffer) // self.block_size * self.block_size
+
+      for start in range(0, blocks, self.block_size):
+        self._submit(self.buffer[start:start + self.block_size])
+
+      self.buffer = self.buffer[blocks:]
+
+  def close(self):
+    """
+    <public> Writes the remaining data and the end-of-file marker. Doesn't
+    close ``handle``.
+    """
+    if self.buffer:
+      self._submit(self.buffer)
+      self.buffer = ""
+
+    while self.pending:
+      self._emit()
+
+    if self.pool is not None:
+      self.pool.close()
+      self.pool.join()
+      self.pool = None
+
+    self.handle.write(BGZF_EOF)
+
+  def index(self):
+    """
+    <public> Returns the ".gzi" index of the blocks written so far (as
+    written by ``bgzip -i``).
+
+    :rtype: str
+    """
+    return gzi(self.offsets)
+
+  def blocks(self):
+    """
+    <public> Returns the compressed and uncompressed offsets of the start of
+    every block written so far followed by the end of the data, e.g. for
+    :meth:`TabixIndex.save`.
+
+    :returns: List of ``(compressed, uncompressed)`` offsets
+    :rtype: list
+    """
+    return [(0, 0)] + self.offsets + [(self.compressed, self.uncompressed)]
+
+  def _submit(self, data):
+    """
+    <private> Queues a block for compression, keeping a few per thread in
+    flight at most.
+    """
+    if self.pool is None:
+      self.pending.append((bgzf_block(data, self.level), len(data)))
+
+    else:
+      result = self.pool.apply_async(bgzf_block, (data, self.level))
+      self.pending.append((result, len(data)))
+
+    while len(self.pending) > self.threads * 4:
+      self._emit()
+
+  def _emit(self):
+    """
+    <private> Writes the oldest queued block once it's compressed.
+    """
+    block, size = self.pending.popleft()
+
+    if not isinstance(block, str):
+      block = block.get()
+
+    if self.compressed:
+      self.offsets.append((self.compressed, self.uncompressed))
+
+    self.handle.write(block)
+    self.compressed += len(block)
+    self.uncompressed += size
+
+
+class TabixIndex(object):
+  """
+  Builds the tabix index (".tbi") of a sorted VCF file on the fly, like
+  ``tabix -p vcf``, either passing the data on to ``handle`` (:meth:`write`)
+  or just keeping count (:meth:`update`). Records are indexed by their
+  offsets in the uncompressed data which are turned into BGZF virtual
+  offsets once the blocks are known (:meth:`save`).
+
+  .. code-block:: python
+
+    >>> with open("dbsnp.vcf.gz", "wb") as handle:
+    ...   writer = Bgzf(handle)
+    ...   index = TabixIndex(writer)
+    ...   ftp.retrbinary("RETR dbsnp.vcf.gz", Gunzip(index).write)
+    ...   writer.close()
+    ...   index.save("dbsnp.vcf.gz.tbi", writer.blocks())
+
+  .. versionadded:: 0.5.0
+
+  :param file handle: (optional) File-like object to pass data on to
+  """
+  # Size (as a power of 2) of the windows of the linear index
+  min_shift = 14
+
+  # Pseudo-bin that holds the span and record count of a sequence
+  meta_bin = 37450
+
+  def __init__(self, handle=None):
+    super(TabixIndex, self).__init__()
+    self.handle = handle
+
+    # Number of bytes that have passed through and the start of a line that
+    # is split over several chunks
+    self.position = 0
+    self.rest = ""
+
+    # Sequences in order: ``{ "name", "bins", "linear", "start", "end",
+    # "records" }``; bins map to lists of ``[start, end]`` chunks
+    self.sequences = []
+    self.names = set()
+    self.sequence = None
+    self.last = 0
+
+  def update(self, chunk):
+    """
+    <public> Reads a chunk of VCF data.
+
+    :param str chunk: The data to index
+    :raises ValueError: If the records aren't sorted
+    """
+    data = self.rest + chunk
+    start = self.position - len(self.rest)
+    self.position += len(chunk)
+
+    lines = data.split("\n")
+    self.rest = lines.pop()
+
+    for line in lines:
+      end = start + len(line) + 1
+
+      if line and line[0] != "#":
+        self._record(line, start, end)
+
+      start = end
+
+  def write(self, chunk):
+    """
+    <public> Reads a chunk of VCF data and passes it on (if there's a
+    ``handle``).
+
+    :param str chunk: The data to index
+    """
+    self.update(chunk)
+
+    if self.handle is not None:
+      self.handle.write(chunk)
+
+  def close(self):
+    """
+    <public> Indexes the last record if it lacks a line break. Doesn't close
+    ``handle``.
+    """
+    if self.rest and self.rest[0] != "#":
+      self._record(self.rest, self.position - len(self.rest), self.position)
+
+    self.rest = ""
+
+  def dump(self, blocks):
+    """
+    <public> Returns the index (BGZF compressed like tabix writes it).
+
+    :param list blocks: ``(compressed, uncompressed)`` offsets of the start
+                        of every BGZF block followed by the end of the data,
+                        see :meth:`Bgzf.blocks`
+    :rtype: str
+    """
+    self.close()
+
+    starts = [uncompressed for _, uncompressed in blocks]
+
+    def virtual(position):
+      block = bisect.bisect_right(starts, position) - 1
+      return (blocks[block][0] << 16) | (position - starts[block])
+
+    names = "".join(sequence["name"] + "\0" for sequence in self.sequences)
+
+    # Number of sequences and the VCF preset: format, sequence, start and
+    # end columns, comment character and lines to skip
+    parts = ["TBI\1", struct.pack("<7i", len(self.sequences), 2, 1, 2, 0,
+                                  ord("#"), 0),
+             struct.pack("<i", len(names)), names]
+
+    for sequence in self.sequences:
+      bins = sequence["bins"]
+      parts.append(struct.pack("<i", len(bins) + 1))
+
+      for number in sorted(bins):
+        parts.append(struct.pack("<Ii", number, len(bins[number])))
+        parts.extend(struct.pack("<2Q", virtual(start), virtual(end))
+                     for start, end in bins[number])
+
+      parts.append(struct.pack("<Ii4Q", self.meta_bin, 2,
+                               virtual(sequence["start"]),
+                               virtual(sequence["end"]),
+                               sequence["records"], 0))
+
+      # Windows without records point to where the previous one does
+      linear = []
+      offset = 0
+      for start in sequence["linear"]:
+        if start is not None:
+          offset = virtual(start)
+
+        linear.append(offset)
+
+      parts.append(struct.pack("<i{}Q".format(len(linear)), len(linear),
+                               *linear))
+
+    # Number of records without coordinates
+    parts.append(struct.pack("<Q", 0))
+
+    output = StringIO()
+    writer = Bgzf(output)
+    writer.write("".join(parts))
+    writer.close()
+
+    return output.getvalue()
+
+  def save(self, dest, blocks):
+    """
+    <public> Writes the index to a file, replacing it atomically.
+
+    :param str dest: Path to the index, usually "<vcf.gz>.tbi"
+    :param list blocks: Block offsets, see :meth:`dump`
+    :returns: Number of bytes written
+    :rtype: int
+    """
+    return replace(dest, self.dump(blocks))
+
+  def _record(self, line, start, end):
+    """
+    <private> Adds a record (a line from `start` to `end`) to the index.
+    """
+    # Only the first columns are needed; INFO only for "END="
+    fields = line.split("\t", 4)
+    if len(fields) < 5:
+      raise ValueError("Not a VCF record: '{}'".format(line[:80]))
+
+    name = fields[0]
+    begin = int(fields[1]) - 1
+    stop = begin + max(len(fields[3]), 1)
+
+    if "END=" in line:
+      # Symbolic alleles (e.g. deletions) span up to INFO/END
+      fields = line.split("\t", 8)
+
+      for item in (fields[7] if len(fields) > 7 else "").split(";"):
+        if item.startswith("END=") and int(item[4:]) > begin:
+          stop = int(item[4:])
+
+    sequence = self.sequence
+    if sequence is None or sequence["name"] != name:
+      if name in self.names:
+        raise ValueError("Records of '{}' aren't sorted together"
+                         .format(name))
+
+      sequence = self.sequence = {"name": name, "bins": {}, "linear": [],
+                                  "start": start, "end": end, "records": 0}
+      self.sequences.append(sequence)
+      self.names.add(name)
+
+    elif begin < self.last:
+      raise ValueError("Records of '{}' aren't sorted by position"
+                       .format(name))
+
+    self.last = begin
+
+    chunks = sequence["bins"].setdefault(reg2bin(begin, stop), [])
+    if chunks and chunks[-1][1] == start:
+      # Follows on from the previous record in the same bin
+      chunks[-1][1] = end
+    else:
+      chunks.append([start, end])
+
+    first, last = begin >> self.min_shift, (stop - 1) >> self.min_shift
+    linear = sequence["linear"]
+
+    if len(linear) <= last:
+      linear.extend([None] * (last + 1 - len(linear)))
+
+    if linear[first] is None or first != last:
+      for window in range(first, last + 1):
+        if linear[window] is None:
+          linear[window] = start
+
+    sequence["end"] = end
+    sequence["records"] += 1
+
+
+def reg2bin(begin, end):
+  """
+  Works out the smallest bin of the UCSC binning scheme (as used by tabix
+  and BAM indexes) that holds a 0-based, half-open region.
+
+  .. versionadded:: 0.5.0
+
+  :param int begin: Start of the region
+  :param int end: End of the region (exclusive)
+  :rtype: int
+  """
+  end -= 1
+
+  if begin >> 14 == end >> 14:
+    # Most records fit in the smallest bins
+    return 4681 + (begin >> 14)
+
+  for shift, offset in ((17, 585), (20, 73), (23, 9), (26, 1)):
+    if begin >> shift == end >> shift:
+      return offset + (begin >> shift)
+
+  return 0
+
+
+def gzi(offsets):
+  """
+  Serializes ``(compressed, uncompressed)`` offsets of BGZF blocks (all but
+  the first) as a ".gzi" index.
+
+  .. versionadded:: 0.5.0
+
+  :param list offsets: Block offsets
+  :returns: The index
+  :rtype: str
+  """
+  return struct.pack("<Q", len(offsets)) + "".join(
+    struct.pack("<2Q", compressed, uncompressed)
+    for compressed, uncompressed in offsets)
+
+
+class FastaIndex(object):
+  """
+  Builds the ".fai" index of a FASTA file (like ``samtools faidx``) and its
+  sequence dictionary (like Picard's ``CreateSequenceDictionary``) on the
+  fly, either passing the data on to ``handle`` (:meth:`write`) or just
+  keeping count (:meth:`update`). Offsets are counted in the (uncompressed)
+  data that passes through so the index also fits the file once it's BGZF
+  compressed.
+
+  .. code-block:: python
+
+    >>> with open("hs37d5.fa", "wb") as handle:
+    ...   index = FastaIndex(handle)
+    ...   ftp.retrbinary("RETR hs37d5.fa.gz", Gunzip(index).write)
+    ...   index.save("hs37d5.fa")
+
+  .. versionadded:: 0.5.0
+
+  :param file handle: (optional) File-like object to pass data on to
+  """
+  def __init__(self, handle=None):
+    super(FastaIndex, self).__init__()
+    self.handle = handle
+    self.reset()
+
+  def reset(self):
+    """
+    <public> Starts over from scratch.
+
+    :returns: self
+    """
+    # Finished sequences: ``(name, length, offset, line bases, line width)``
+    # and the MD5 of each
+    self.records = []
+    self.checksums = []
+
+    # Number of bytes that have passed through
+    self.position = 0
+
+    # Fragments of a header line that's split over several chunks
+    self.header = None
+
+    # Number of bytes of the current line seen so far and the last of them
+    self.column = 0
+    self.last = ""
+
+    # The sequence being read
+    self.name = None
+    self.length = 0
+    self.offset = 0
+    self.width = None
+    self.cr = 0
+    self.short = False
+    self.digest = None
+
+    self.closed = False
+
+    return self
+
+  def __deepcopy__(self, memo):
+    """
+    <private> Copies the state, e.g. to restart from a checkpoint. MD5
+    objects can't be deep copied but know how to copy themselves.
+    """
+    clone = FastaIndex.__new__(FastaIndex)
+    clone.__dict__ = copy.deepcopy(
+      {key: value for key, value in self.__dict__.items() if key != "digest"},
+      memo)
+    clone.digest = self.digest.copy() if self.digest is not None else None
+
+    return clone
+
+  def update(self, chunk):
+    """
+    <public> Reads a chunk of FASTA data.
+
+    :param str chunk: The data to index
+    :raises ValueError: If the lines of a sequence differ in length
+    """
+    start = 0
+    size = len(chunk)
+
+    while start < size:
+      if self.header is not None:
+        end = chunk.find("\n", start)
+
+        if end < 0:
+          self.header.append(chunk[start:])
+          break
+
+        self.header.append(chunk[start:end])
+        self._begin("".join(self.header), self.position + end + 1)
+        start = end + 1
+
+      elif self.column == 0 and chunk[start] == ">":
+        self._end()
+        self.header = []
+        start += 1
+
+      else:
+        # Everything up to the next header belongs to the same sequence
+        end = chunk.find("\n>", start)
+        end = size if end < 0 else end + 1
+
+        self._sequence(chunk[start:end])
+        start = end
+
+    self.position += size
+
+  def write(self, chunk):
+    """
+    <public> Reads a chunk of FASTA data and passes it on (if there's a
+    ``handle``).
+
+    :param str chunk: The data to index
+    """
+    self.update(chunk)
+
+    if self.handle is not None:
+      self.handle.write(chunk)
+
+  def close(self):
+    """
+    <public> Finishes the last sequence. Doesn't close ``handle``.
+    """
+    if self.closed:
+      return
+
+    if self.header is not None:
+      # A header without a line break or sequence at the end of the file
+      self._begin("".join(self.header), self.position)
+
+    if self.column and self.name is not None:
+      # The last line lacks a line break; count it like the others
+      cr = int(self.last == "\r")
+      if self.width is None:
+        self.cr = cr
+
+      self._lines([self.column + self.cr - cr])
+
+    self._end()
+    self.closed = True
+
+  def dump(self):
+    """
+    <public> Returns the index (as written by ``samtools faidx``).
+
+    :rtype: str
+    """
+    self.close()
+
+    return "".join("{}\t{}\t{}\t{}\t{}\n".format(*record)
+                   for record in self.records)
+
+  def dictionary(self, uri=None):
+    """
+    <public> Returns the sequence dictionary: a SAM header with the name
+    (SN), length (LN) and MD5 (M5) of each sequence.
+
+    :param str uri: (optional) Location of the FASTA file (UR)
+    :rtype: str
+    """
+    self.close()
+
+    lines = ["@HD\tVN:1.6\n"]
+    for record, checksum in zip(self.records, self.checksums):
+      line = "@SQ\tSN:{}\tLN:{}\tM5:{}".format(record[0], record[1], checksum)
+
+      if uri:
+        line += "\tUR:{}".format(uri)
+
+      lines.append(line + "\n")
+
+    return "".join(lines)
+
+  def save(self, fasta):
+    """
+    <public> Writes the index ("<fasta>.fai") and the sequence dictionary
+    (see :func:`dict_path`) next to a FASTA file, replacing them atomically.
+
+    :param str fasta: Path to the FASTA file
+    :returns: Number of bytes written
+    :rtype: int
+    """
+    uri = "file:" + os.path.abspath(fasta)
+
+    return (replace(fasta + ".fai", self.dump()) +
+            replace(dict_path(fasta), self.dictionary(uri)))
+
+  def _begin(self, header, offset):
+    """
+    <private> Starts a new sequence once its header line is complete. Like
+    samtools, the name is the header up to the first whitespace.
+    """
+    fields = header.split()
+
+    self.header = None
+    self.name = fields[0] if fields else ""
+    self.length = 0
+    self.offset = offset
+    self.width = None
+    self.cr = 0
+    self.short = False
+    self.column = 0
+    self.digest = hashlib.md5()
+
+  def _sequence(self, data):
+    """
+    <private> Counts (and checksums) the bases of a stretch of sequence
+    lines.
+    """
+    if self.digest is not None:
+      # All at once rather than line by line
+      self.digest.update(data.translate(UPPERCASE, WHITESPACE))
+
+    lines = data.split("\n")
+
+    if len(lines) == 1:
+      self.column += len(data)
+
+    else:
+      lengths = map(len, lines[:-1])
+      lengths[0] += self.column
+
+      if self.name is not None and self.width is None:
+        # Windows line breaks; the "\r" isn't a base
+        tail = lines[0] or (self.last if self.column else "")
+        self.cr = int(tail.endswith("\r"))
+
+      self.column = len(lines[-1])
+
+      if self.name is not None:
+        self._lines(lengths)
+
+    self.last = data[-1:]
+
+  def _lines(self, lengths):
+    """
+    <private> Checks the lengths of complete lines (without the "\\n") of
+    the current sequence. All but the last line have to be equally long.
+    """
+    if self.width is None:
+      self.width = lengths[0]
+
+    if not self.short and lengths.count(self.width) == len(lengths):
+      # The usual case: only full lines
+      self.length += (self.width - self.cr) * len(lengths)
+      return
+
+    for length in lengths:
+      if self.short and length > self.cr:
+        raise ValueError("Different line length in sequence "
+                         "'{}'".format(self.name))
+
+      elif self.short:
+        # Blank lines at the end are fine
+        continue
+
+      elif length > self.width:
+        raise ValueError("Different line length in sequence "
+                         "'{}'".format(self.name))
+
+      if length < self.width:
+        self.short = True
+
+      self.length += max(length - self.cr, 0)
+
+  def _end(self):
+    """
+    <private> Records the sequence that's been read, if any.
+    """
+    if self.name is None:
+      return
+
+    if self.width is None:
+      line_bases = line_width = 0
+    else:
+      line_bases = self.width - self.cr
+      line_width = self.width + 1
+
+    self.records.append((self.name, self.length, self.offset, line_bases,
+                         line_width))
+    self.checksums.append(self.digest.hexdigest())
+    self.name = None
+    self.digest = None
+
+
+def dict_path(fasta):
+  """
+  Returns where the sequence dictionary of a FASTA file goes: next to it,
+  with ".dict" in place of ".fa", ".fasta" etc. (and ".gz"), which is where
+  GATK and Picard look for it.
+
+  .. versionadded:: 0.5.0
+
+  :param str fasta: Path to the FASTA file
+  :rtype: str
+  """
+  if fasta.endswith(".gz"):
+    fasta = fasta[:-3]
+
+  return os.path.splitext(fasta)[0] + ".dict"
+
+
+def replace(dest, data):
+  """
+  Writes data to a file, replacing it atomically.
+
+  .. versionadded:: 0.5.0
+
+  :param str dest: Path to the file
+  :param str data: What to write
+  :returns: Number of bytes written
+  :rtype: int
+  """
+  with atomic_write(dest, "wb") as handle:
+    handle.write(data)
+
+  return len(data)
@@ -0,0 +1,620 @@
+#!/usr/bin/env python
+"""
+Concurrent transfer of resource files.
+
+Files are downloaded on a bounded pool of worker threads. A resource is only
+reported as finished once *every* one of its files has been transferred (or
+failed) which makes it safe to run post-processing and update the history
+file from the main thread.
+"""
+from __future__ import print_function
+
+import copy
+import ftplib
+import os
+import Queue
+import tempfile
+import threading
+from multiprocessing.pool import ThreadPool
+
+from postprocess import CHUNK_SIZE, matches, verify, workers
+from streams import Checksum, FastaIndex, Gunzip
+
+
+class Batch(object):
+  """
+  All the files belonging to a single resource that are queued for download.
+
+  :param object resource: The resource instance that the files belong to
+  :param list dl_paths: List of remote paths to download
+  :param list save_paths: List of local paths to save the files to
+  :param object payload: (optional) Anything the caller wants to keep track of
+  :param bool stream: (optional) Decompress ".gz" files while downloading
+  :param dict checksums: (optional) Upstream checksums to verify against:
+                         ``{ dl_path: (algorithm, checksum) }``
+  :param dict unchanged: (optional) Files that are already up-to-date locally
+                         and don't need to be downloaded:
+                         ``{ dl_path: local_path }``
+  """
+  def __init__(self, resource, dl_paths, save_paths, payload=None,
+               stream=False, checksums=None, unchanged=None):
+    super(Batch, self).__init__()
+    self.resource = resource
+    self.payload = payload
+    self.checksums = checksums or {}
+    self.unchanged = unchanged or {}
+
+    # Checksums of the downloaded files: ``{ dl_path: "<algorithm>:<sum>" }``
+    self.digests = {}
+
+    # Local paths of files that are decompressed while downloading
+    self.decompress = set()
+    if stream:
+      # Slow checksums are checked against the compressed file on disk
+      slow = set(save_path for dl_path, save_path in zip(dl_paths, save_paths)
+                 if self.checksums.get(dl_path, (None,))[0] in Checksum.slow)
+
+      self.decompress = set(save_path[:-3] for save_path in save_paths
+                            if save_path.endswith(".gz") and
+                            save_path not in slow)
+      save_paths = [save_path[:-3] if save_path[:-3] in self.decompress
+                    else save_path for save_path in save_paths]
+
+    # Decompressed FASTA files to index while downloading
+    self.fasta = set(save_path for save_path in self.decompress
+                     if matches(save_path, getattr(resource, "fasta", [])))
+
+    self.files = zip(dl_paths, save_paths)
+
+    # The files that actually need to be downloaded
+    self.pending = [(dl_path, save_path) for dl_path, save_path in self.files
+                    if dl_path not in self.unchanged]
+
+    # Concatenates all the parts into one file when set
+    self.assembler = None
+
+    # Failed downloads: ``{ dl_path: exception }``
+    self.errors = {}
+
+    self.remaining = len(self.pending)
+    self.lock = threading.Lock()
+
+  def finish(self, dl_path, error=None):
+    """
+    <public> Marks a single file as done. Returns ``True`` when it was the
+    last file of the batch to finish.
+
+    :param str dl_path: The remote path of the file that finished
+    :param Exception error: (optional) Reason why the download failed
+    :returns: ANS: All the files in the batch are done
+    :rtype: bool
+    """
+    with self.lock:
+      if error is not None:
+        self.errors[dl_path] = error
+
+      self.remaining -= 1
+
+      return self.remaining == 0
+
+  @property
+  def ok(self):
+    """
+    <public> ``True`` if all files in the batch were downloaded successfully.
+    """
+    return not self.errors
+
+  @property
+  def cloned(self):
+    """
+    <public> List of the local files that the batch results in, including
+    the unchanged files that were left alone.
+    """
+    if self.assembler is not None:
+      return [self.assembler.dest]
+
+    cloned = []
+    for dl_path, save_path in self.files:
+      local_path = self.unchanged.get(dl_path, save_path)
+
+      # Unchanged parts of a combined assembly share the same file
+      if local_path not in cloned:
+        cloned.append(local_path)
+
+    return cloned
+
+
+class Part(object):
+  """
+  A single part of an :class:`Assembler`. Data is written straight to the
+  combined file when it's the part's turn and held in a spill file (in
+  memory up to a limit, then on disk) until then.
+
+  :param Assembler assembler: The assembler the part belongs to
+  :param int index: Position of the part in the combined file
+  """
+  def __init__(self, assembler, index):
+    super(Part, self).__init__()
+    self.assembler = assembler
+    self.index = index
+
+    # Offset in the combined file where the part starts (once known) and
+    # the state of the index at that point
+    self.start = None
+    self.checkpoint = None
+    self.spill = None
+    self.done = False
+
+  def restart(self):
+    """
+    <public> Throws away everything written so far, e.g. before a retry.
+
+    :returns: self
+    """
+    with self.assembler.lock:
+      if self.start is not None:
+        self.assembler.handle.seek(self.start)
+        self.assembler.handle.truncate()
+        self.assembler.index = copy.deepcopy(self.checkpoint)
+
+      if self.spill is not None:
+        self.spill.close()
+        self.spill = None
+
+    return self
+
+  def write(self, chunk):
+    """
+    <public> Writes a chunk of (decompressed) data.
+
+    :param str chunk: Data to add to the part
+    """
+    with self.assembler.lock:
+      if self.assembler.current == self.index:
+        self.flush()
+        self.assembler.write(chunk)
+
+      else:
+        if self.spill is None:
+          self.spill = tempfile.SpooledTemporaryFile(
+            max_size=self.assembler.buffer,
+            dir=os.path.dirname(self.assembler.dest) or None)
+
+        self.spill.write(chunk)
+
+  def flush(self):
+    """
+    <public> Moves any spilled data into the combined file. Must only be
+    called (with the lock held) when it's the part's turn.
+    """
+    if self.start is None:
+      self.start = self.assembler.handle.tell()
+      self.checkpoint = copy.deepcopy(self.assembler.index)
+
+    if self.spill is not None:
+      self.spill.seek(0)
+
+      for chunk in iter(lambda: self.spill.read(CHUNK_SIZE), ""):
+        self.assembler.write(chunk)
+
+      self.spill.close()
+      self.spill = None
+
+  def close(self):
+    """
+    <public> Kept for the writer interface; use :meth:`finish` once the whole
+    part is written.
+    """
+    pass
+
+  def finish(self):
+    """
+    <public> Marks the part as complete and lets the next parts catch up.
+    """
+    with self.assembler.lock:
+      self.done = True
+      self.assembler.advance()
+
+
+class Assembler(object):
+  """
+  Decompresses and concatenates the gzipped parts of a resource (e.g. one
+  file per chromosome), in order, into a single file in one pass while the
+  parts are downloaded in parallel. No per-part files are left behind. The
+  combined file can be indexed as FASTA on the way ("<dest>.fai").
+
+  .. code-block:: python
+
+    >>> assembler = Assembler("NCBI.Homo_sapiens.fa", parts=25)
+    >>> assembler.fetch(ftp, "hs_ref_GRCh37.p5_chr1.fa.gz", 0)
+    >>> ...
+    >>> assembler.close()
+
+  .. versionadded:: 0.5.0
+
+  :param str dest: Path to the combined file
+  :param int parts: Number of parts to combine
+  :param int buffer: (optional) Bytes to keep in memory per waiting part
+                     before spilling to disk
+  :param bool index: (optional) Write a FASTA index of the combined file
+  """
+  def __init__(self, dest, parts, buffer=64 * 1024 * 1024, index=False):
+    super(Assembler, self).__init__()
+    self.dest = dest
+    self.partial = dest + ".part"
+    self.buffer = buffer
+    self.index = FastaIndex() if index else None
+
+    self.handle = open(self.partial, "wb")
+    self.parts = [Part(self, index) for index in range(parts)]
+
+    # Index of the part that currently writes to the combined file
+    self.current = 0
+    self.lock = threading.RLock()
+
+  def fetch(self, ftp, dl_path, index, retries=3, algorithm=None,
+            checksum=None):
+    """
+    <public> Downloads and decompresses one part into place. With an
+    `algorithm` the compressed data is checksummed on the way and a part
+    that doesn't match `checksum` is fetched once more before giving up.
+
+    :param FTP ftp: The server to download from
+    :param str dl_path: Remote path to the gzipped part
+    :param int index: Position of the part in the combined file
+    :param int retries: (optional) Times to restart after a dropped connection
+    :param str algorithm: (optional) Checksum algorithm
+    :param str checksum: (optional) Expected checksum of the gzipped part
+    :returns: The checksum of the part if `algorithm` is set, otherwise 0
+    """
+    part = self.parts[index]
+
+    try:
+      expected = ftp.byteSize(dl_path)
+    except ftplib.error_perm:
+      expected = None
+
+    def opener():
+      if digest is None:
+        return Gunzip(part.restart())
+
+      digest.reset().handle = Gunzip(part.restart())
+      return digest
+
+    for attempt in range(2):
+      digest = Checksum(algorithm=algorithm) if algorithm else None
+      ftp.feed(dl_path, opener, retries=retries, expected=expected)
+
+      if digest is None or checksum is None or digest.verify(checksum):
+        break
+
+    else:
+      raise IOError("Checksum mismatch for '{path}': {actual} instead of "
+                    "{expected}".format(path=dl_path,
+                                        actual=digest.hexdigest(),
+                                        expected=checksum))
+
+    part.finish()
+
+    return digest.hexdigest() if digest else 0
+
+  def write(self, chunk):
+    """
+    <public> Appends a chunk to the combined file (and the index). Must be
+    called with the lock held.
+
+    :param str chunk: Data to append
+    """
+    self.handle.write(chunk)
+
+    if self.index is not None:
+      self.index.update(chunk)
+
+  def advance(self):
+    """
+    <public> Moves on past all finished parts, copying their spilled data to
+    the combined file. Must be called with the lock held.
+    """
+    while self.current < len(self.parts):
+      part = self.parts[self.current]
+      part.flush()
+
+      if not part.done:
+        break
+
+      self.current += 1
+
+  def close(self):
+    """
+    <public> Finishes the combined file once all parts are done.
+    """
+    self.handle.close()
+    os.rename(self.partial, self.dest)
+
+    if self.index is not None:
+      self.index.save(self.dest)
+
+  def abort(self):
+    """
+    <public> Throws away the combined file and any spilled data.
+    """
+    self.handle.close()
+
+    for part in self.parts:
+      if part.spill is not None:
+        part.spill.close()
+
+    if os.path.exists(self.partial):
+      os.remove(self.partial)
+
+
+class Dispatcher(object):
+  """
+  Downloads files from one or more resources concurrently on a bounded pool
+  of worker threads. Each download leases its own connection from
+  :data:`cosmid.core.pool` which also caps the connections per host.
+
+  Lookups needed before downloading (matching versions, listing files etc.)
+  can be run on a second pool with :meth:`prepare`. That way round trips to
+  different servers overlap with each other and with downloads that are
+  already under way.
+
+  .. code-block:: python
+
+    >>> dispatcher = Dispatcher(jobs=4)
+    >>> dispatcher.prepare(registry.grab, "ccds", "latest")
+    >>> for args, (resource, dl_paths, save_paths, version), error \
+    ...     in dispatcher.prepared():
+    ...   dispatcher.add(resource, dl_paths, save_paths)
+    >>> for batch in dispatcher.results():
+    ...   print(batch.resource.id, batch.ok)
+
+  .. versionadded:: 0.5.0
+
+  :param int jobs: (optional) Max number of simultaneous downloads
+  :param int segments: (optional) Split each file over this many connections
+                       instead of following each resource's own setting
+  :param bool stream: (optional) Decompress ".gz" files while downloading for
+                      resources that support it
+  :param str algorithm: (optional) Checksum to compute for files without an
+                        upstream checksum, or one that's too slow to compute
+                        while downloading (``None`` to skip)
+  :param ObjectStore store: (optional) Reuse and keep downloaded files in a
+                            :class:`cosmid.store.ObjectStore`
+  """
+  def __init__(self, jobs=1, segments=None, stream=False, algorithm="md5",
+               store=None):
+    super(Dispatcher, self).__init__()
+    self.jobs = max(int(jobs), 1)
+    self.segments = segments and int(segments)
+    self.stream = stream
+    self.algorithm = algorithm
+    self.store = store
+    self.pool = ThreadPool(self.jobs)
+
+    # Finished batches are handed back to the main thread through the queue
+    self.done = Queue.Queue()
+    self.batches = []
+
+    # Lookups run on their own pool so they don't queue up behind downloads
+    self.resolvers = ThreadPool(self.jobs)
+    self.ready = Queue.Queue()
+    self.preparing = 0
+
+  def prepare(self, func, *args):
+    """
+    <public> Runs a (slow) lookup like resolving the files to download for a
+    resource in the background. The outcome is handed back by
+    :meth:`prepared`.
+
+    :param function func: The lookup to run
+    :param args: Arguments to call ``func`` with
+    """
+    self.preparing += 1
+    self.resolvers.apply_async(self._prepare, (func, args))
+
+  def prepared(self):
+    """
+    <public> Yields the outcome of each lookup in the order they finish as
+    ``(args, result, error)`` tuples. ``error`` is ``None`` unless the lookup
+    raised an exception (``result`` is then ``None``).
+
+    :returns: A generator of tuples
+    """
+    for _ in range(self.preparing):
+      yield self.ready.get()
+
+    self.preparing = 0
+    self.resolvers.close()
+    self.resolvers.join()
+
+  def add(self, resource, dl_paths, save_paths, payload=None, checksums=None,
+          unchanged=None):
+    """
+    <public> Queues all the files of a resource for download. When streaming,
+    the ".gz" extension is dropped from the local paths of the batch.
+
+    Unchanged files are skipped, except when streaming into a combined
+    assembly which has to be rebuilt from all of its parts.
+
+    :param object resource: The resource instance that the files belong to
+    :param list dl_paths: List of remote paths to download
+    :param list save_paths: List of local paths to save the files to
+    :param object payload: (optional) Returned with the finished batch
+    :param dict checksums: (optional) Upstream checksums to verify against:
+                           ``{ dl_path: (algorithm, checksum) }``
+    :param dict unchanged: (optional) Files to skip:
+                           ``{ dl_path: local_path }``
+    :returns: The queued batch
+    :rtype: :class:`Batch`
+    """
+    stream = self.stream and getattr(resource, "stream", False)
+    assembly = stream and getattr(resource, "assembly", None)
+
+    if assembly and len(unchanged or {}) < len(dl_paths):
+      unchanged = None
+
+    batch = Batch(resource, dl_paths, save_paths, payload=payload,
+                  stream=stream, checksums=checksums, unchanged=unchanged)
+    self.batches.append(batch)
+
+    if assembly and batch.pending:
+      # Download, decompress and concatenate the parts in one pass
+      folder = os.path.dirname(batch.files[0][1])
+      fasta = getattr(resource, "fasta", [])
+      batch.assembler = Assembler(os.path.join(folder, assembly),
+                                  len(batch.files),
+                                  index=matches(assembly, fasta))
+
+    if not batch.pending:
+      # Nothing to download, the batch is done already
+      self.done.put(batch)
+
+    for index, (dl_path, save_path) in enumerate(batch.files):
+      if dl_path not in batch.unchanged:
+        self.pool.apply_async(self._fetch,
+                              (batch, index, dl_path, save_path))
+
+    return batch
+
+  def results(self):
+    """
+    <public> Yields batches in the order that they finish. Blocks until all
+    queued batches are done and then shuts down the worker pool.
+
+    :returns: A generator of :class:`Batch` objects
+    """
+    for _ in range(len(self.batches)):
+      yield self.done.get()
+
+    self.pool.close()
+    self.pool.join()
+
+  def _prepare(self, func, args):
+    """
+    <private> Runs a lookup. Runs in a worker thread.
+    """
+    try:
+      self.ready.put((args, func(*args), None))
+
+    except Exception as error:
+      self.ready.put((args, None, error))
+
+  def _fetch(self, batch, index, dl_path, save_path):
+    """
+    <private> Downloads a single file. Runs in a worker thread. Errors are
+    recorded on the batch rather than raised so one failing file doesn't
+    bring down the rest of the downloads.
+    """
+    error = None
+    algorithm, checksum = batch.checksums.get(dl_path, (self.algorithm, None))
+    slow = None
+
+    if algorithm in Checksum.slow:
+      # Checked once the file is on disk rather than holding up the download.
+      # Parts of an assembly aren't kept around to check.
+      if batch.assembler is None:
+        slow = (algorithm, checksum)
+
+      algorithm, checksum = self.algorithm, None
+
+    try:
+      if batch.assembler is not None:
+        digest = batch.assembler.fetch(batch.resource.ftp, dl_path, index,
+                                       algorithm=algorithm, checksum=checksum)
+
+      else:
+        digest = self._commit(batch, dl_path, save_path, algorithm, checksum,
+                              slow=slow)
+
+      if algorithm:
+        batch.digests[dl_path] = "{}:{}".format(algorithm, digest)
+
+    except Exception as exception:
+      error = exception
+
+    if batch.finish(dl_path, error):
+      if batch.assembler is not None:
+        self._assemble(batch)
+
+      self.done.put(batch)
+
+  def _commit(self, batch, dl_path, save_path, algorithm, checksum,
+              slow=None):
+    """
+    <private> Downloads a single file unless an identical one is already in
+    the object store. New downloads are added to the store once they've
+    passed the `slow` ``(algorithm, checksum)`` check, if any. A file that
+    fails it is fetched once more before giving up.
+
+    :returns: The checksum of the file
+    """
+    decompress = save_path in batch.decompress
+    index = save_path in batch.fasta
+    stored = None
+
+    if self.store is not None and checksum is not None:
+      stored = self.store.find(algorithm, checksum)
+
+    if stored is not None:
+      if decompress:
+        self.store.inflate(stored, save_path, index=index)
+      else:
+        self.store.link(stored, save_path)
+
+      return checksum
+
+    segments = self.segments or getattr(batch.resource, "segments", 1)
+
+    for attempt in range(2):
+      digest = batch.resource.ftp.commit(
+        dl_path, save_path, segments=segments, decompress=decompress,
+        algorithm=algorithm, checksum=checksum, index=index)
+
+      if slow is None:
+        break
+
+      ok, actual = self._verify(save_path, *slow)
+      if ok:
+        break
+
+      # Corrupt download; fetch it once more like a fast checksum would be
+      os.remove(save_path)
+
+    else:
+      raise IOError("Checksum mismatch for '{path}': {actual} instead of "
+                    "{expected}".format(path=dl_path, actual=actual,
+                                        expected=slow[1]))
+
+    if self.store is not None and algorithm and not decompress:
+      self.store.add(save_path, algorithm, digest)
+
+    return digest
+
+  def _verify(self, save_path, algorithm, checksum):
+    """
+    <private> Checks a downloaded file against a checksum that's too slow to
+    compute while downloading. Runs in a worker process when the pool of
+    :data:`cosmid.postprocess.workers` is started.
+
+    :returns: Whether the file matches and its actual checksum
+    :rtype: tuple
+    """
+    if checksum is None:
+      return True, None
+
+    return workers.apply(verify, save_path, algorithm, checksum)
+
+  def _assemble(self, batch):
+    """
+    <private> Finishes (or throws away) the combined file of a batch once all
+    its parts are done.
+    """
+    try:
+      if batch.ok:
+        batch.assembler.close()
+      else:
+        batch.assembler.abort()
+
+    except Exception as error:
+      batch.errors[batch.assembler.dest] = error
@@ -1,7 +1,52 @@
 #!/usr/bin/env python
+from cache import parsed
+from journal import Journal
+from magicmethods import atomic_write, lazy_import
 
-import yaml
-from path import path
+# Imported on first use to keep the CLI quick to start
+yaml = lazy_import("yaml")
+path = lazy_import("path", "path")
+
+
+def safe_load(handle):
+  """
+  Parses YAML with the fast libyaml based loader when PyYAML is built with
+  it. Only simple types are constructed (like :func:`yaml.safe_load`).
+
+  .. versionadded:: 0.5.0
+
+  :param file handle: YAML string or open file
+  :returns: The parsed data
+  """
+  return yaml.load(handle, Loader=getattr(yaml, "CSafeLoader",
+                                          yaml.SafeLoader))
+
+
+def safe_dump(data):
+  """
+  Serializes data to block style YAML, with libyaml when available.
+
+  .. versionadded:: 0.5.0
+
+  :param object data: Simple types to serialize
+  :returns: YAML formatted string
+  :rtype: str
+  """
+  return yaml.dump(data, Dumper=getattr(yaml, "CSafeDumper", yaml.SafeDumper),
+                   default_flow_style=False)
+
+
+def parse(yaml_path):
+  """
+  Parses a YAML file.
+
+  .. versionadded:: 0.5.0
+
+  :param str yaml_path: Path to the YAML file
+  :returns: The parsed data
+  """
+  with open(yaml_path, "r") as handle:
+    return safe_load(handle)
 
 
 class DefaultReader(object):
@@ -43,10 +88,10 @@ class DefaultReader(object):
       self.source = path(yaml_path)
 
     if self.source.isfile():
-      with open(self.source, "r") as handle:
-        # Use safe load to protect from accidentally running malicious
-        # functions defined in the YAML file. Limit to simple str/int values.
-        self.items = yaml.safe_load(handle.read())
+      # Use safe load to protect from accidentally running malicious
+      # functions defined in the YAML file. Limit to simple str/int values.
+      # Files that haven't changed since they were last parsed aren't parsed.
+      self.items = parsed.fetch(self.source, parse)
 
     else:
       # Initialize empty
@@ -75,12 +120,16 @@ class DefaultReader(object):
   def save(self):
     """
     <public> Overwrites the file currently pointed to by the ``path``
-    attribute with valid YAML formatting.
+    attribute with valid YAML formatting. The file is replaced atomically so
+    a crash never leaves it half written.
 
     :returns: self
     """
-    with open(self.source, "w") as handle:
-      handle.write(yaml.safe_dump(self.items, default_flow_style=False))
+    with atomic_write(self.source, sync=True) as handle:
+      handle.write(safe_dump(self.items))
+
+    # No need to parse what was just written
+    parsed.save(self.source, self.items)
 
     return self
 
@@ -110,11 +159,78 @@ class HistoryReader(DefaultReader):
   A specialized YAML reader for dealing with Cosmid History files. Inherits
   from ``DefaultReader``.
 
+  With a `journal_path` the history is kept in an append-only
+  :class:`cosmid.journal.Journal` instead: every :meth:`add` is committed
+  to disk on its own and the YAML file becomes an export written by
+  :meth:`save`. An existing YAML history is carried over the first time.
+
   :param str yaml_path: Path to the cosmid history file (.cosmid.yaml)
+  :param str journal_path: (optional) Path to the journal (.cosmid.journal)
   """
-  def __init__(self, yaml_path):
+  def __init__(self, yaml_path, journal_path=None):
+    self.journal = Journal(journal_path) if journal_path else None
+
+    # Changes not yet exported to the YAML file
+    self.changed = False
+
     super(HistoryReader, self).__init__(yaml_path)
 
+  def load(self, yaml_path=None):
+    """
+    <public> Loads the history from the journal, or from the YAML file if
+    there's no journal yet.
+
+    :param str yaml_path: (optional) A path to the YAML history file
+    :returns: self
+    """
+    if self.journal is not None and self.journal.exists():
+      if yaml_path:
+        self.source = path(yaml_path)
+
+      self.items = self.journal.load()
+
+    else:
+      super(HistoryReader, self).load(yaml_path)
+
+      if self.journal is not None and self.items:
+        # Start the journal off from the old YAML history
+        self.journal.replace(self.items)
+
+    self.changed = False
+
+    return self
+
+  def add(self, key, item):
+    """
+    <public> Adds (or replaces) the record of a resource. It's committed to
+    the journal straight away if there is one.
+
+    :param str key: Resource ID
+    :param dict item: Record of the downloaded resource
+    :returns: self
+    """
+    super(HistoryReader, self).add(key, item)
+
+    if self.journal is not None:
+      self.journal.append(key, item)
+
+    self.changed = True
+
+    return self
+
+  def save(self):
+    """
+    <public> Writes the history to the YAML file. With a journal that's
+    only an export so it's skipped unless something has changed.
+
+    :returns: self
+    """
+    if self.journal is None or self.changed:
+      super(HistoryReader, self).save()
+      self.changed = False
+
+    return self
+
   def updateable(self, force=False):
     """
     <public> Returns all resources that could be updated.
@@ -133,8 +249,9 @@ class HistoryReader(DefaultReader):
 
       # Exclude perfect target<->version matches
       # Always include resources with target=latest
+      # Include resources with files that can be checked for changes
       # If force is selected we include all resources
-      if item['target'] != item['version'] or force:
+      if item['target'] != item['version'] or "files" in item or force:
         resources[key] = item['target']
 
     return resources
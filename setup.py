@@ -44,8 +44,7 @@ setup(
     "path.py",
     "pyyaml",
     "fuzzywuzzy",
-    "termcolor",
-    "sh"
+    "termcolor"
   ],
 
   # Packages required for testing
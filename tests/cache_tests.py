@@ -0,0 +1,182 @@
+import datetime
+import os
+import shutil
+import tempfile
+import threading
+
+from nose.tools import *  # PEP8 asserts
+from cosmid.cache import fingerprint, ListingCache, PackageCache, ParseCache
+
+
+class TestListingCache:
+  """Testing the persistent cache of server listings."""
+
+  def setUp(self):
+    self.folder = tempfile.mkdtemp()
+    self.source = os.path.join(self.folder, ".cosmid.listings")
+    self.cache = ListingCache(ttl=60, limit=2).load(self.source)
+    self.calls = []
+
+  def tearDown(self):
+    shutil.rmtree(self.folder)
+
+  def lister(self, items):
+    def fetch():
+      self.calls.append(items)
+      return items
+    return fetch
+
+  def test_fetch(self):
+    # Test that a listing is only fetched once within the TTL
+    self.cache.fetch("ftp.ensembl.org", "pub", self.lister(["release-75"]))
+    items = self.cache.fetch("ftp.ensembl.org", "pub", self.lister([]))
+
+    assert_equal(items, ["release-75"])
+    assert_equal(len(self.calls), 1)
+
+  def test_refresh(self):
+    # Test ignoring cached listings
+    self.cache.fetch("ftp.ensembl.org", "pub", self.lister(["release-75"]))
+    self.cache.refresh = True
+    items = self.cache.fetch("ftp.ensembl.org", "pub", self.lister(["r76"]))
+
+    assert_equal(items, ["r76"])
+
+    # ...but only once
+    self.cache.fetch("ftp.ensembl.org", "pub", self.lister(["r77"]))
+    assert_equal(len(self.calls), 2)
+
+  def test_concurrent(self):
+    # Test that a directory being listed isn't listed again at the same time
+    started = threading.Event()
+    release = threading.Event()
+
+    def slow():
+      started.set()
+      release.wait()
+      return self.lister(["release-75"])()
+
+    worker = threading.Thread(target=self.cache.fetch,
+                              args=("ftp.ensembl.org", "pub", slow))
+    worker.start()
+    started.wait()
+
+    results = []
+    waiter = threading.Thread(target=lambda: results.append(
+      self.cache.fetch("ftp.ensembl.org", "pub", self.lister([]))))
+    waiter.start()
+
+    release.set()
+    worker.join()
+    waiter.join()
+
+    assert_equal(results, [["release-75"]])
+    assert_equal(len(self.calls), 1)
+
+  def test_evict(self):
+    # Test that the least recently used listing is dropped
+    for used, dir_path in enumerate(("a", "b")):
+      self.cache.fetch("host", dir_path, self.lister([dir_path]))
+      self.cache.entries["host/" + dir_path]["used"] = used
+
+    self.cache.fetch("host", "c", self.lister(["c"]))
+
+    assert_equal(sorted(self.cache.entries), ["host/b", "host/c"])
+
+  def test_save(self):
+    # Test persisting listings between runs
+    self.cache.fetch("host", "pub", self.lister(["x"]))
+    self.cache.save()
+
+    cache = ListingCache().load(self.source)
+    assert_equal(cache.fetch("host", "pub", self.lister([])), ["x"])
+
+
+class TestPackageCache:
+  """Testing caching data derived from the package."""
+
+  def setUp(self):
+    self.folder = tempfile.mkdtemp()
+    self.cache = PackageCache("test")
+    self.cache.folders = [self.folder]
+
+  def tearDown(self):
+    shutil.rmtree(self.folder)
+
+  def test_fingerprint(self):
+    # Test that the cache is only valid for the same fingerprint
+    with open(os.path.join(self.folder, "ccds.py"), "w") as handle:
+      handle.write("# CCDS\n")
+
+    signature = fingerprint(self.folder)
+    self.cache.save(signature, {"ccds": "CCDS"})
+    assert_equal(self.cache.load(signature), {"ccds": "CCDS"})
+
+    with open(os.path.join(self.folder, "gtf.py"), "w") as handle:
+      handle.write("# GTF\n")
+
+    assert_equal(self.cache.load(fingerprint(self.folder)), None)
+
+
+class TestParseCache:
+  """Testing caching parsed files."""
+
+  def setUp(self):
+    self.folder = tempfile.mkdtemp()
+    self.source = os.path.join(self.folder, "cosmid.yaml")
+    self.cache = ParseCache(os.path.join(self.folder, "parsed"))
+    self.calls = []
+
+    with open(self.source, "w") as handle:
+      handle.write("directory: resources\n")
+
+  def tearDown(self):
+    shutil.rmtree(self.folder)
+
+  def parse(self, file_path):
+    self.calls.append(file_path)
+    with open(file_path, "r") as handle:
+      return {"text": handle.read()}
+
+  def test_fetch(self):
+    # Test that unchanged files are only parsed once, also across processes
+    items = self.cache.fetch(self.source, self.parse)
+    items["text"] = "modified"
+
+    assert_equal(self.cache.fetch(self.source, self.parse),
+                 {"text": "directory: resources\n"})
+
+    cache = ParseCache(self.cache.folder)
+    cache.fetch(self.source, self.parse)
+
+    assert_equal(len(self.calls), 1)
+
+  def test_changed(self):
+    # Test that a changed file is parsed again
+    self.cache.fetch(self.source, self.parse)
+
+    with open(self.source, "a") as handle:
+      handle.write("jobs: 4\n")
+
+    items = self.cache.fetch(self.source, self.parse)
+
+    assert_equal(len(self.calls), 2)
+    assert_true("jobs" in items["text"])
+
+  def test_untrusted(self):
+    # Test that copies others could have written are ignored
+    self.cache.fetch(self.source, self.parse)
+
+    for name in os.listdir(self.cache.folder):
+      os.chmod(os.path.join(self.cache.folder, name), 0o666)
+
+    ParseCache(self.cache.folder).fetch(self.source, self.parse)
+
+    assert_equal(len(self.calls), 2)
+
+  def test_unmarshallable(self):
+    # Test that data marshal can't store is returned but not cached
+    dated = {"released": datetime.date(2014, 1, 1)}
+
+    assert_equal(self.cache.fetch(self.source, lambda path: dated), dated)
+    assert_false(os.path.exists(self.cache.folder))
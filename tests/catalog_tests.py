@@ -0,0 +1,75 @@
+import os
+import shutil
+import tempfile
+
+from nose.tools import *  # PEP8 asserts
+from cosmid.catalog import Catalog
+
+SERVER = '''
+class GATK(FTP):
+  def __init__(self):
+    super(GATK, self).__init__("ftp.broadinstitute.org", "anonymous", "")
+'''
+
+EXAMPLE = '''"""Example files from GATK."""
+import missing_dependency
+from ..servers.gatk import GATK
+
+class Resource(BaseResource):
+  def __init__(self):
+    self.id = "example"
+    self.ftp = GATK()
+    self.parts = 2
+    self.names = ["chr{}.fa".format(chrom) for chrom in range(1, 3)]
+'''
+
+HAPMAP = '''"""Hapmap 3.3 from GATK."""
+from example import Resource as iResource
+
+class Resource(iResource):
+  def __init__(self):
+    self.id = "hapmap"
+    self.parts = 1
+    self.names = ["hapmap_3.3.vcf.gz"]
+'''
+
+
+class TestCatalog:
+  """Testing describing resources without importing them."""
+
+  def setUp(self):
+    self.folder = tempfile.mkdtemp()
+    resources = os.path.join(self.folder, "resources")
+    servers = os.path.join(self.folder, "servers")
+    os.mkdir(resources)
+    os.mkdir(servers)
+
+    for folder, name, code in [(servers, "gatk", SERVER),
+                               (resources, "example", EXAMPLE),
+                               (resources, "hapmap", HAPMAP),
+                               (resources, "__init__", "")]:
+      with open(os.path.join(folder, name + ".py"), "w") as handle:
+        handle.write(code)
+
+    self.catalog = Catalog(resources, servers).describe()
+
+  def tearDown(self):
+    shutil.rmtree(self.folder)
+
+  def test_describe(self):
+    # Test reading attributes (even computed file names) from the source
+    example = self.catalog["example"]
+
+    assert_equal(sorted(self.catalog.keys()), ["example", "hapmap"])
+    assert_equal(example["doc"], "Example files from GATK.")
+    assert_equal(example["names"], ["chr1.fa", "chr2.fa"])
+    assert_equal(example["host"], "ftp.broadinstitute.org")
+
+  def test_inherit(self):
+    # Test that the server is inherited from the base resource
+    hapmap = self.catalog["hapmap"]
+
+    assert_equal(hapmap["id"], "hapmap")
+    assert_equal(hapmap["parts"], 1)
+    assert_equal(hapmap["server"], "GATK")
+    assert_equal(hapmap["host"], "ftp.broadinstitute.org")
@@ -0,0 +1,759 @@
+import ftplib
+import gzip
+import hashlib
+import json
+import os
+import shutil
+import tempfile
+import threading
+from StringIO import StringIO
+
+from nose.tools import *  # PEP8 asserts
+from cosmid import core
+from cosmid.core import ConnectionPool, FTP, Registry, Scheduler
+from cosmid.yml import HistoryReader
+
+HOST = "ftp.example.org"
+ORIGINAL_FTP = ftplib.FTP
+
+
+class FakeServer(object):
+  """Files served to :class:`FakeFTP` connections."""
+
+  def __init__(self, files, rest=True):
+    self.files = files
+    self.rest = rest
+
+    # Cut the next transfer of a file short after this many bytes
+    self.drops = {}
+
+    self.connections = []
+    self.transfers = []
+    self.lock = threading.Lock()
+
+
+class FakeData(object):
+  """Data connection of a :class:`FakeFTP` transfer."""
+
+  def __init__(self, data):
+    self.buffer = StringIO(data)
+
+  def recv(self, size):
+    return self.buffer.read(size)
+
+  def makefile(self, mode):
+    return self.buffer
+
+  def close(self):
+    pass
+
+
+class FakeFTP(object):
+  """Stand-in for :class:`ftplib.FTP` connected to ``FakeFTP.server``."""
+
+  server = None
+
+  def __init__(self, host, user, passwd):
+    self.host = host
+    self.user = user
+    self.commands = []
+    self.stale = False
+    self.closed = False
+
+    # Replies the client hasn't read yet, e.g. the end of a transfer
+    self.replies = []
+
+    with self.server.lock:
+      self.server.connections.append(self)
+
+  def voidcmd(self, cmd):
+    if self.stale:
+      raise EOFError("Connection timed out")
+
+    return self.sendcmd(cmd)
+
+  def sendcmd(self, cmd):
+    self._synced()
+    self.commands.append(cmd)
+
+    if cmd.startswith("MDTM "):
+      return "213 20140101000000"
+
+    return "200 OK"
+
+  def size(self, path):
+    self._synced()
+    return len(self.server.files[path])
+
+  def transfercmd(self, cmd, rest=None):
+    self._synced()
+    path = cmd.split(" ", 1)[1]
+
+    if path not in self.server.files:
+      raise ftplib.error_perm("550 No such file")
+
+    if rest and not self.server.rest:
+      raise ftplib.error_perm("502 REST not implemented")
+
+    self.commands.append(cmd)
+
+    with self.server.lock:
+      self.server.transfers.append((path, rest or 0))
+      drop = self.server.drops.pop(path, None)
+
+    data = self.server.files[path][rest or 0:]
+    if drop is not None:
+      data = data[:drop]
+      self.replies.append("426 Connection closed; transfer aborted")
+    else:
+      self.replies.append("226 Transfer complete")
+
+    return FakeData(data)
+
+  def retrbinary(self, cmd, callback, blocksize=8192, rest=None):
+    data = self.transfercmd(cmd, rest)
+
+    for chunk in iter(lambda: data.recv(blocksize), ""):
+      callback(chunk)
+
+    data.close()
+    return self.voidresp()
+
+  def voidresp(self):
+    reply = self.replies.pop(0)
+    if reply.startswith("426"):
+      raise ftplib.error_temp(reply)
+
+    return reply
+
+  def abort(self):
+    # Like a real server: "426" for the transfer, then "226" for the ABOR.
+    # ``ftplib`` only reads the first of the two.
+    self.commands.append("ABOR")
+    if not self.replies:
+      return "225 No transfer to abort"
+
+    self.replies = ["226 Abort successful"]
+    return "426 Transfer aborted"
+
+  def _synced(self):
+    # The next reply read would be a leftover of an earlier command
+    if self.replies:
+      raise ftplib.error_reply("{} (out of sync)".format(self.replies[0]))
+
+  def quit(self):
+    self.commands.append("QUIT")
+    self.closed = True
+
+  def close(self):
+    self.closed = True
+
+
+def serve(files, **kwargs):
+  """Points :class:`ftplib.FTP` at a new :class:`FakeServer`."""
+  FakeFTP.server = FakeServer(files, **kwargs)
+  ftplib.FTP = FakeFTP
+
+  return FakeFTP.server
+
+
+class TestConnectionPool:
+  """Testing sharing FTP connections between calls."""
+
+  def setUp(self):
+    self.server = serve({})
+    self.pool = ConnectionPool(limit=2)
+
+  def tearDown(self):
+    ftplib.FTP = ORIGINAL_FTP
+
+  def test_reuse(self):
+    # Test that a session is handed out again once it's back in the pool
+    with self.pool.session(HOST, "anonymous", "") as first:
+      pass
+
+    with self.pool.session(HOST, "anonymous", "") as second:
+      pass
+
+    assert_true(first is second)
+    assert_equal(second.commands, ["NOOP"])
+    assert_equal(len(self.server.connections), 1)
+    assert_equal(self.pool.open, {HOST: 1})
+
+  def test_errors(self):
+    # Test that refused commands keep the connection but other errors don't
+    def fail(error):
+      with self.pool.session(HOST, "anonymous", ""):
+        raise error
+
+    assert_raises(ftplib.error_perm, fail,
+                  ftplib.error_perm("550 No such file"))
+    assert_equal(len(self.pool.idle[(HOST, "anonymous")]), 1)
+
+    assert_raises(EOFError, fail, EOFError())
+    assert_equal(self.pool.idle[(HOST, "anonymous")], [])
+    assert_equal(self.pool.open[HOST], 0)
+    assert_true(self.server.connections[0].closed)
+
+  def test_stale(self):
+    # Test that a session that no longer answers "NOOP" is replaced
+    connection = self.pool.acquire(HOST, "anonymous", "")
+    self.pool.release(HOST, "anonymous", connection)
+    connection.stale = True
+
+    fresh = self.pool.acquire(HOST, "anonymous", "")
+
+    assert_false(fresh is connection)
+    assert_true(connection.closed)
+    assert_equal(self.pool.open[HOST], 1)
+
+  def test_limit(self):
+    # Test that leases block while the host is at its limit
+    first = self.pool.acquire(HOST, "anonymous", "")
+    self.pool.acquire(HOST, "anonymous", "")
+
+    leased = []
+    waiter = threading.Thread(target=lambda: leased.append(
+      self.pool.acquire(HOST, "anonymous", "")))
+    waiter.start()
+    waiter.join(0.1)
+
+    assert_true(waiter.is_alive())
+    assert_equal(len(self.server.connections), 2)
+
+    self.pool.release(HOST, "anonymous", first)
+    waiter.join()
+
+    assert_equal(leased, [first])
+    assert_equal(self.pool.open[HOST], 2)
+
+  def test_other_user(self):
+    # Test that an idle session makes way for another user at the limit
+    self.pool.limit = 1
+    connection = self.pool.acquire(HOST, "anonymous", "")
+    self.pool.release(HOST, "anonymous", connection)
+
+    other = self.pool.acquire(HOST, "guest", "")
+
+    assert_true(connection.closed)
+    assert_equal(other.user, "guest")
+    assert_equal(self.pool.open[HOST], 1)
+
+  def test_close_all(self):
+    # Test logging out of idle sessions
+    connection = self.pool.acquire(HOST, "anonymous", "")
+    self.pool.release(HOST, "anonymous", connection)
+    self.pool.closeAll()
+
+    assert_equal(connection.commands, ["QUIT"])
+    assert_equal(self.pool.open[HOST], 0)
+
+
+class TestRemoteFile:
+  """Testing streaming files from the server."""
+
+  def setUp(self):
+    self.server = serve({"pub/BuildInfo.txt": "#header\n" + "row\n" * 3})
+    self.original = core.pool
+    core.pool = ConnectionPool()
+    self.ftp = FTP(HOST, "anonymous", "")
+
+  def tearDown(self):
+    core.pool = self.original
+    ftplib.FTP = ORIGINAL_FTP
+
+  def test_lines(self):
+    # Test reading to the end and handing the connection back
+    with self.ftp.file("pub/BuildInfo.txt") as handle:
+      lines = list(handle)
+
+    assert_equal(lines, ["#header\n", "row\n", "row\n", "row\n"])
+
+    connection = self.server.connections[0]
+    assert_false("ABOR" in connection.commands)
+    assert_equal(core.pool.idle[(HOST, "anonymous")], [connection])
+
+  def test_close(self):
+    # Test that closing early aborts the rest of the transfer
+    handle = self.ftp.file("pub/BuildInfo.txt")
+    assert_equal(handle.readline(), "#header\n")
+    handle.close()
+
+    connection = self.server.connections[0]
+    assert_equal(connection.commands[-1], "ABOR")
+    assert_raises(ValueError, handle.readline)
+
+    # The connection is one reply behind and isn't reused
+    assert_true(connection.closed)
+    assert_equal(core.pool.idle.get((HOST, "anonymous"), []), [])
+
+    with self.ftp.file("pub/BuildInfo.txt") as handle:
+      assert_equal(handle.readline(), "#header\n")
+
+  def test_max_bytes(self):
+    # Test refusing to read past the limit
+    handle = self.ftp.file("pub/BuildInfo.txt", max_bytes=10)
+
+    assert_raises(IOError, handle.read)
+    assert_true(handle.closed)
+    assert_equal(self.server.connections[0].commands[-1], "ABOR")
+
+    # A file of exactly the limit is fine
+    with self.ftp.file("pub/BuildInfo.txt", max_bytes=20) as handle:
+      assert_equal(len(handle.read()), 20)
+
+  def test_missing(self):
+    # Test that a missing file doesn't hold on to the connection
+    assert_raises(ftplib.error_perm, self.ftp.file, "pub/missing.txt")
+    assert_equal(len(core.pool.idle[(HOST, "anonymous")]), 1)
+
+
+class TestResume:
+  """Testing resuming downloads from ".part" files."""
+
+  def setUp(self):
+    self.folder = tempfile.mkdtemp()
+    self.data = "".join(chr(index % 251) for index in range(50000))
+    self.server = serve({"pub/file.gz": self.data})
+    self.original = core.pool
+    core.pool = ConnectionPool()
+    self.ftp = FTP(HOST, "anonymous", "")
+    self.dest = os.path.join(self.folder, "file.gz")
+
+  def tearDown(self):
+    core.pool = self.original
+    ftplib.FTP = ORIGINAL_FTP
+    shutil.rmtree(self.folder)
+
+  def partial(self, data, modified="20140101000000"):
+    with open(self.dest + ".part", "wb") as handle:
+      handle.write(data)
+
+    # Left behind by a download of the current remote file
+    with open(self.dest + ".part.meta", "w") as handle:
+      json.dump({"path": "pub/file.gz", "size": len(self.data),
+                 "modified": modified}, handle)
+
+  def read(self):
+    with open(self.dest, "rb") as handle:
+      return handle.read()
+
+  def test_resume(self):
+    # Test that a partial download is picked up where it left off
+    self.partial(self.data[:1000])
+    digest = self.ftp.commit("pub/file.gz", self.dest, algorithm="md5")
+
+    assert_equal(self.read(), self.data)
+    assert_equal(digest, hashlib.md5(self.data).hexdigest())
+    assert_equal(self.server.transfers, [("pub/file.gz", 1000)])
+    assert_false(os.path.exists(self.dest + ".part"))
+    assert_false(os.path.exists(self.dest + ".part.meta"))
+
+  def test_release(self):
+    # Test that a partial download of an earlier release is started over
+    self.partial("x" * 1000, modified="20130101000000")
+    self.ftp.commit("pub/file.gz", self.dest)
+
+    assert_equal(self.read(), self.data)
+    assert_equal(self.server.transfers, [("pub/file.gz", 0)])
+
+  def test_unknown(self):
+    # Test that a partial file of unknown origin isn't resumed
+    self.partial("x" * 1000)
+    os.remove(self.dest + ".part.meta")
+    self.ftp.commit("pub/file.gz", self.dest)
+
+    assert_equal(self.read(), self.data)
+    assert_equal(self.server.transfers, [("pub/file.gz", 0)])
+
+  def test_retry(self):
+    # Test resuming from where the connection dropped
+    self.server.drops["pub/file.gz"] = 3000
+    self.ftp.commit("pub/file.gz", self.dest)
+
+    assert_equal(self.read(), self.data)
+    assert_equal(self.server.transfers, [("pub/file.gz", 0),
+                                         ("pub/file.gz", 3000)])
+
+  def test_rest_refused(self):
+    # Test starting over when the server doesn't support "REST"
+    self.server.rest = False
+    self.partial(self.data[:1000])
+    self.ftp.commit("pub/file.gz", self.dest)
+
+    assert_equal(self.read(), self.data)
+    assert_equal(self.server.transfers, [("pub/file.gz", 0)])
+
+  def test_stale(self):
+    # Test that a partial file larger than the remote file is started over
+    self.partial(self.data + "left over")
+    self.ftp.commit("pub/file.gz", self.dest)
+
+    assert_equal(self.read(), self.data)
+    assert_equal(self.server.transfers, [("pub/file.gz", 0)])
+
+  def test_mismatch(self):
+    # Test that a corrupt download is fetched once more before giving up
+    assert_raises(IOError, self.ftp.commit, "pub/file.gz", self.dest,
+                  algorithm="md5", checksum="0" * 32)
+
+    assert_equal(len(self.server.transfers), 2)
+    assert_false(os.path.exists(self.dest))
+    assert_false(os.path.exists(self.dest + ".part"))
+    assert_false(os.path.exists(self.dest + ".part.meta"))
+
+
+class TestInflate:
+  """Testing decompressing (and indexing) files while downloading."""
+
+  def setUp(self):
+    self.folder = tempfile.mkdtemp()
+    self.fasta = ">chr1\nACGTACGTAC\nACGTA\n>chr2\nNNNN\n"
+    buffer = StringIO()
+    with gzip.GzipFile(fileobj=buffer, mode="wb") as handle:
+      handle.write(self.fasta)
+    self.data = buffer.getvalue()
+
+    self.server = serve({"pub/chr1.fa.gz": self.data})
+    self.original = core.pool
+    core.pool = ConnectionPool()
+    self.ftp = FTP(HOST, "anonymous", "")
+    self.dest = os.path.join(self.folder, "chr1.fa")
+
+  def tearDown(self):
+    core.pool = self.original
+    ftplib.FTP = ORIGINAL_FTP
+    shutil.rmtree(self.folder)
+
+  def read(self, file_path):
+    with open(file_path, "rb") as handle:
+      return handle.read()
+
+  def test_drop(self):
+    # Test starting over from scratch when the connection drops
+    self.server.drops["pub/chr1.fa.gz"] = 20
+    digest = self.ftp.commit("pub/chr1.fa.gz", self.dest, decompress=True,
+                             algorithm="md5", index=True)
+
+    assert_equal(self.read(self.dest), self.fasta)
+    assert_equal(self.server.transfers, [("pub/chr1.fa.gz", 0),
+                                         ("pub/chr1.fa.gz", 0)])
+
+    # The checksum is of the compressed data, the index of the FASTA
+    assert_equal(digest, hashlib.md5(self.data).hexdigest())
+    assert_equal(self.read(self.dest + ".fai"),
+                 "chr1\t15\t6\t10\t11\nchr2\t4\t29\t4\t5\n")
+    assert_false(os.path.exists(self.dest + ".part"))
+
+  def test_mismatch(self):
+    # Test that a corrupt download is thrown away, index and all
+    assert_raises(IOError, self.ftp.commit, "pub/chr1.fa.gz", self.dest,
+                  decompress=True, algorithm="md5", checksum="0" * 32,
+                  index=True)
+
+    assert_equal(len(self.server.transfers), 2)
+    assert_equal(os.listdir(self.folder), [])
+
+
+class TestSegmented:
+  """Testing downloading a file as byte ranges over several connections."""
+
+  def setUp(self):
+    self.folder = tempfile.mkdtemp()
+    self.data = "".join(chr(index % 251) for index in range(100000))
+    self.server = serve({"pub/file.gz": self.data})
+    self.original = core.pool
+    core.pool = ConnectionPool()
+    self.ftp = FTP(HOST, "anonymous", "")
+    self.ftp.min_segment = 1000
+    self.dest = os.path.join(self.folder, "file.gz")
+
+  def tearDown(self):
+    core.pool = self.original
+    ftplib.FTP = ORIGINAL_FTP
+    shutil.rmtree(self.folder)
+
+  def read(self):
+    with open(self.dest, "rb") as handle:
+      return handle.read()
+
+  def test_segments(self):
+    # Test that the ranges end up in order in the file
+    digest = self.ftp.commit("pub/file.gz", self.dest, segments=4,
+                             algorithm="md5")
+
+    assert_equal(self.read(), self.data)
+    assert_equal(digest, hashlib.md5(self.data).hexdigest())
+    assert_equal(sorted(self.server.transfers),
+                 [("pub/file.gz", offset)
+                  for offset in (0, 25000, 50000, 75000)])
+    assert_false(os.path.exists(self.dest + ".part.segments"))
+
+  def test_resume(self):
+    # Test that only the rest of each range is fetched again
+    with open(self.dest + ".part", "wb") as handle:
+      handle.write(self.data[:10000])
+      handle.truncate(len(self.data))
+
+    with open(self.dest + ".part.segments", "w") as handle:
+      json.dump([[0, 10000, 50000], [50000, 50000, 100000]], handle)
+
+    with open(self.dest + ".part.meta", "w") as handle:
+      json.dump({"path": "pub/file.gz", "size": len(self.data),
+                 "modified": "20140101000000"}, handle)
+
+    self.ftp.commit("pub/file.gz", self.dest, segments=2)
+
+    assert_equal(self.read(), self.data)
+    assert_equal(sorted(self.server.transfers),
+                 [("pub/file.gz", 10000), ("pub/file.gz", 50000)])
+
+  def test_drop(self):
+    # Test that a range resumes from where its connection dropped
+    self.server.drops["pub/file.gz"] = 1000
+    self.ftp.commit("pub/file.gz", self.dest, segments=4)
+
+    assert_equal(self.read(), self.data)
+    assert_equal(len(self.server.transfers), 5)
+
+  def test_rest_refused(self):
+    # Test falling back to a single stream when "REST" is refused
+    self.server.rest = False
+    self.ftp.commit("pub/file.gz", self.dest, segments=4)
+
+    assert_equal(self.read(), self.data)
+    assert_equal(self.server.transfers[-1], ("pub/file.gz", 0))
+    assert_false(os.path.exists(self.dest + ".part.segments"))
+
+  def test_crash(self):
+    # Test that any error in a range fails the download and keeps progress
+    def crash(fullPath, partial, segment, size, stop):
+      raise ValueError("Out of memory")
+
+    self.ftp._retrieveRange = crash
+
+    assert_raises(ValueError, self.ftp.commit, "pub/file.gz", self.dest,
+                  segments=4)
+    assert_false(os.path.exists(self.dest))
+    assert_true(os.path.exists(self.dest + ".part.segments"))
+
+  def test_unfinished(self):
+    # Test that a preallocated file isn't taken for a complete one
+    def halt(fullPath, partial, segment, size, stop):
+      stop.set()
+
+    self.ftp._retrieveRange = halt
+
+    assert_raises(IOError, self.ftp.commit, "pub/file.gz", self.dest,
+                  segments=4)
+    assert_false(os.path.exists(self.dest))
+    assert_true(os.path.exists(self.dest + ".part.segments"))
+
+  def test_small(self):
+    # Test that small files aren't split up
+    self.ftp.min_segment = 50000
+    self.ftp.commit("pub/file.gz", self.dest, segments=4)
+
+    assert_equal(self.read(), self.data)
+    assert_equal(self.server.transfers, [("pub/file.gz", 0)])
+
+
+class FakeClock(object):
+  """Time that only moves on when someone sleeps (or it's told to)."""
+
+  def __init__(self):
+    self.now = 1000.0
+    self.sleeps = []
+
+  def time(self):
+    return self.now
+
+  def sleep(self, seconds):
+    self.sleeps.append(seconds)
+    self.now += seconds
+
+
+class TestScheduler:
+  """Testing the bandwidth ceiling and per-host transfer caps."""
+
+  def setUp(self):
+    self.clock = FakeClock()
+    self.scheduler = Scheduler(bandwidth=1000, clock=self.clock.time,
+                               sleep=self.clock.sleep)
+
+  def test_throttle(self):
+    # Test that transfers wait to pay off what they take beyond the rate
+    self.scheduler.throttle(500)
+    self.scheduler.throttle(500)
+
+    assert_equal(self.clock.sleeps, [0.5, 0.5])
+
+    # Idle time fills up the bucket, but only up to a second's worth
+    self.clock.now += 10
+    self.scheduler.throttle(1000)
+    self.scheduler.throttle(250)
+
+    assert_equal(self.clock.sleeps, [0.5, 0.5, 0.25])
+
+  def test_metered(self):
+    # Test that metered callbacks are throttled before passing data on
+    chunks = []
+    callback = self.scheduler.metered(chunks.append)
+    callback("x" * 2000)
+
+    assert_equal(chunks, ["x" * 2000])
+    assert_equal(self.clock.sleeps, [2.0])
+
+    # Without a ceiling the callback is left alone
+    self.scheduler.configure(bandwidth=None)
+    assert_true(self.scheduler.metered(chunks.append) == chunks.append)
+    self.scheduler.throttle(10 ** 9)
+    assert_equal(self.clock.sleeps, [2.0])
+
+  def test_limit(self):
+    # Test per-host limits with a default for the rest
+    self.scheduler.configure(transfers={HOST: 1, "default": 3})
+
+    assert_equal(self.scheduler.limit(HOST), 1)
+    assert_equal(self.scheduler.limit("ftp.ensembl.org"), 3)
+
+    self.scheduler.configure(transfers=2)
+    assert_equal(self.scheduler.limit(HOST), 2)
+
+    self.scheduler.configure()
+    assert_equal(self.scheduler.limit(HOST), None)
+
+  def test_transfers(self):
+    # Test that a host at its limit holds up its own transfers only
+    self.scheduler.configure(transfers={HOST: 1})
+    started = threading.Event()
+
+    def transfer(host):
+      with self.scheduler.transfer(host):
+        started.set()
+
+    with self.scheduler.transfer(HOST):
+      other = threading.Thread(target=transfer, args=("ftp.ensembl.org",))
+      other.start()
+      other.join()
+
+      assert_true(started.is_set())
+      started.clear()
+
+      waiter = threading.Thread(target=transfer, args=(HOST,))
+      waiter.start()
+
+      assert_false(started.wait(0.1))
+      assert_equal(self.scheduler.active[HOST], 1)
+
+    waiter.join()
+
+    assert_true(started.is_set())
+    assert_equal(self.scheduler.active[HOST], 0)
+
+
+class Bundle(object):
+  """Resource with a compressed and a plain file."""
+
+  def __init__(self):
+    self.id = "example"
+    self.names = ["exampleFASTA.fasta.gz", "exampleBAM.bam"]
+
+
+class TestUnchanged:
+  """Testing which files can be left alone on update."""
+
+  def setUp(self):
+    self.folder = tempfile.mkdtemp()
+    self.registry = Registry()
+    self.registry.__dict__["history"] = HistoryReader(None)
+    self.resource = Bundle()
+
+    self.dl_paths = ["bundle/2.8/exampleFASTA.fasta.gz",
+                     "bundle/2.8/exampleBAM.bam"]
+    self.save_paths = [os.path.join(self.folder, name)
+                       for name in self.resource.names]
+    self.stats = [{"size": 10, "modified": "20140101000000"},
+                  {"size": 20, "modified": "20140101000000"}]
+
+    files = dict((name, dict(stat, source=dl_path))
+                 for name, dl_path, stat in zip(self.resource.names,
+                                                self.dl_paths, self.stats))
+    self.registry.history.add("example", {"files": files})
+
+    # The FASTA file was decompressed after download
+    for name in ("exampleFASTA.fasta", "exampleBAM.bam"):
+      open(os.path.join(self.folder, name), "w").close()
+
+  def tearDown(self):
+    shutil.rmtree(self.folder)
+
+  def unchanged(self, dl_paths=None, stats=None):
+    return self.registry.unchanged(self.resource, dl_paths or self.dl_paths,
+                                   self.save_paths, stats or self.stats)
+
+  def test_unchanged(self):
+    # Test that files are matched to their local (decompressed) copies
+    assert_equal(self.unchanged(), {
+      "bundle/2.8/exampleFASTA.fasta.gz": self.save_paths[0][:-3],
+      "bundle/2.8/exampleBAM.bam": self.save_paths[1]})
+
+  def test_changed(self):
+    # Test that files that changed upstream or locally are downloaded
+    stats = [dict(self.stats[0], modified="20150101000000"), self.stats[1]]
+    assert_equal(self.unchanged(stats=stats).keys(),
+                 ["bundle/2.8/exampleBAM.bam"])
+
+    os.remove(self.save_paths[1])
+    assert_equal(self.unchanged(stats=stats), {})
+
+  def test_new_source(self):
+    # Test that a new release under the same local name isn't skipped
+    dl_paths = [dl_path.replace("2.8", "2.9") for dl_path in self.dl_paths]
+
+    assert_equal(self.unchanged(dl_paths=dl_paths), {})
+
+
+class Recorder(object):
+  """Messenger that keeps the messages instead of printing them."""
+
+  def __init__(self):
+    self.messages = []
+
+  def send(self, category, message):
+    self.messages.append((category, message))
+    return self
+
+
+class TestGrab:
+  """Testing how resource IDs are matched before cloning."""
+
+  def setUp(self):
+    self.registry = Registry()
+    self.registry.messenger = Recorder()
+
+  def test_match(self):
+    # Test that misspelled IDs are matched against the IDs only
+    assert_equal(self.registry.matchResource("ccds"), "ccds")
+    assert_equal(self.registry.matchResource("ensembl"), "ensembl_assembly")
+    assert_equal(self.registry.matchResource("hapmap_3"), "hapmap")
+
+    # Found in the docstring of "gtf" but nowhere near any ID
+    assert_equal(self.registry.matchResource("genes"), None)
+
+  def test_suggest(self):
+    # Test that docstring matches are suggested rather than cloned
+    assert_equal(self.registry.grab("genes", "latest"),
+                 (None, None, None, None))
+
+    category, message = self.registry.messenger.messages[0]
+    assert_equal(category, "warning")
+    assert_true(message.startswith("Couldn't match resource ID: 'genes'"))
+    assert_in("did you mean: gtf", message)
+
+  def test_unknown(self):
+    # Test that nothing is suggested for queries that match nothing
+    assert_equal(self.registry.grab("zzzzzz", "latest"),
+                 (None, None, None, None))
+    assert_equal(self.registry.messenger.messages,
+                 [("warning", "Couldn't match resource ID: 'zzzzzz'")])
@@ -0,0 +1,146 @@
+import os
+import shutil
+import tempfile
+import threading
+
+from nose.tools import *  # PEP8 asserts
+from cosmid.core import Registry
+from cosmid.journal import Journal
+from cosmid.magicmethods import cd
+from cosmid.yml import HistoryReader
+
+
+def race(func, threads=8):
+  """Calls a function from several threads at once; returns the errors."""
+  errors = []
+  start = threading.Event()
+
+  def run():
+    start.wait()
+    try:
+      func()
+
+    except Exception as error:
+      errors.append(error)
+
+  workers = [threading.Thread(target=run) for _ in range(threads)]
+  for worker in workers:
+    worker.start()
+
+  start.set()
+  for worker in workers:
+    worker.join()
+
+  return errors
+
+
+class TestJournal:
+  """Testing the append-only journal."""
+
+  def setUp(self):
+    self.folder = tempfile.mkdtemp()
+    self.source = os.path.join(self.folder, ".cosmid.journal")
+    self.journal = Journal(self.source, slack=2)
+
+  def tearDown(self):
+    shutil.rmtree(self.folder)
+
+  def test_append(self):
+    # Test that the latest record of each key wins
+    self.journal.append("ccds", {"version": "Hs103"})
+    self.journal.append("ccds", {"version": "Hs104"})
+    self.journal.append("dbsnp", {"version": "2.8"})
+    self.journal.append("dbsnp", None)
+
+    items = Journal(self.source).load()
+
+    assert_equal(items, {"ccds": {"version": "Hs104"}})
+
+  def test_torn(self):
+    # Test that a half written record is dropped and cut off
+    self.journal.append("ccds", {"version": "Hs104"})
+    size = os.path.getsize(self.source)
+
+    with open(self.source, "a") as handle:
+      handle.write('{"key": "dbsnp", "item": {"vers')
+
+    journal = Journal(self.source)
+    assert_equal(journal.load(), {"ccds": {"version": "Hs104"}})
+    assert_equal(os.path.getsize(self.source), size)
+
+    journal.append("dbsnp", {"version": "2.8"})
+    assert_equal(sorted(Journal(self.source).load()), ["ccds", "dbsnp"])
+
+  def test_compact(self):
+    # Test that superseded records are dropped once they pile up
+    for release in range(5):
+      self.journal.append("ccds", {"version": release})
+
+    journal = Journal(self.source, slack=2)
+    journal.load()
+
+    assert_equal(journal.records, 1)
+    with open(self.source, "r") as handle:
+      assert_equal(len(handle.readlines()), 1)
+
+  def test_concurrent_replace(self):
+    # Test that journals replacing the same file don't share a temp file
+    items = {"ccds": {"version": "Hs104"}, "dbsnp": {"version": "2.8"}}
+
+    errors = race(lambda: Journal(self.source).replace(items))
+
+    assert_equal(errors, [])
+    assert_equal(Journal(self.source).load(), items)
+    assert_equal(os.listdir(self.folder), [".cosmid.journal"])
+
+
+class TestHistoryReader:
+  """Testing the journaled history."""
+
+  def setUp(self):
+    self.folder = tempfile.mkdtemp()
+    self.yaml_path = os.path.join(self.folder, ".cosmid.yaml")
+    self.journal_path = os.path.join(self.folder, ".cosmid.journal")
+
+  def tearDown(self):
+    shutil.rmtree(self.folder)
+
+  def test_migrate(self):
+    # Test that an existing YAML history is carried over to the journal
+    with open(self.yaml_path, "w") as handle:
+      handle.write("ccds:\n  target: latest\n  version: Hs104\n")
+
+    history = HistoryReader(self.yaml_path, self.journal_path)
+
+    assert_true(os.path.isfile(self.journal_path))
+    assert_equal(Journal(self.journal_path).load(), history.find())
+
+  def test_add(self):
+    # Test that records are committed before the YAML export is saved
+    history = HistoryReader(self.yaml_path, self.journal_path)
+    history.add("ccds", {"target": "latest", "version": "Hs104"})
+
+    assert_false(os.path.exists(self.yaml_path))
+
+    reloaded = HistoryReader(self.yaml_path, self.journal_path)
+    assert_equal(reloaded.find("ccds")["version"], "Hs104")
+
+    history.save()
+    assert_true(os.path.isfile(self.yaml_path))
+
+  def test_concurrent_load(self):
+    # Test that resolver threads share the history loaded by the first one
+    os.mkdir(os.path.join(self.folder, "resources"))
+    with open(os.path.join(self.folder, "resources", ".cosmid.yaml"),
+              "w") as handle:
+      handle.write("ccds:\n  target: latest\n  version: Hs104\n")
+
+    registry = Registry()
+    histories = []
+
+    with cd(self.folder):
+      errors = race(lambda: histories.append(registry.history))
+
+    assert_equal(errors, [])
+    assert_equal(len(set(map(id, histories))), 1)
+    assert_equal(histories[0].find("ccds")["version"], "Hs104")
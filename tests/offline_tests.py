@@ -0,0 +1,47 @@
+import ftplib
+import os
+import socket
+
+from nose.tools import *  # PEP8 asserts
+from cosmid.core import Registry
+
+RESOURCES = os.path.join(os.path.dirname(__file__), "..", "cosmid",
+                         "resources")
+
+
+class TestOffline:
+  """Testing that resources can be set up without touching the network."""
+
+  def setUp(self):
+    self.connections = []
+
+    def connect(*args, **kwargs):
+      self.connections.append(args)
+      raise socket.error("offline")
+
+    self.originals = (ftplib.FTP.connect, socket.create_connection)
+    ftplib.FTP.connect = connect
+    socket.create_connection = connect
+
+  def tearDown(self):
+    ftplib.FTP.connect, socket.create_connection = self.originals
+
+  def test_get(self):
+    # Test that every resource can be instantiated offline
+    hub = Registry()
+    for file_name in sorted(os.listdir(RESOURCES)):
+      name, extension = os.path.splitext(file_name)
+      if extension == ".py" and not name.startswith("_"):
+        resource = hub.get(name)
+
+        assert_equal(resource.id, name)
+        assert_true(resource.names is None or resource.names)
+
+    assert_equal(self.connections, [])
+
+  def test_versions(self):
+    # Test that asking the server is what opens a connection
+    resource = Registry().get("ccds")
+
+    assert_raises(socket.error, resource.versions)
+    assert_equal(len(self.connections), 1)
@@ -0,0 +1,243 @@
+import gzip
+import hashlib
+import os
+import shutil
+import tarfile
+import tempfile
+import threading
+import zipfile
+
+from nose.tools import *  # PEP8 asserts
+from cosmid.postprocess import (bgzfBlocks, bgzfOffsets, bgzip, concatenate,
+                                decompress, faidx, gunzip, isBgzf, matches,
+                                untar, unzip, verify, WorkerPool)
+
+
+def pid(task):
+  """Returns the ID of the process that handled the task."""
+  return os.getpid()
+
+
+class TestPostprocess:
+  """Testing processing downloaded files without system tools."""
+
+  def setUp(self):
+    self.folder = tempfile.mkdtemp()
+
+  def tearDown(self):
+    shutil.rmtree(self.folder)
+
+  def path(self, name):
+    return os.path.join(self.folder, name)
+
+  def gzip(self, name, *members):
+    # Write each member as a separate gzip stream (like BGZF)
+    with open(self.path(name), "wb") as handle:
+      for member in members:
+        writer = gzip.GzipFile(fileobj=handle, mode="wb")
+        writer.write(member)
+        writer.close()
+
+    return self.path(name)
+
+  def read(self, name):
+    with open(self.path(name), "rb") as handle:
+      return handle.read()
+
+  def test_gunzip(self):
+    # Test decompressing a multi-member file and removing the archive
+    source = self.gzip("chr1.fa.gz", ">chr1\n", "ACGT\n")
+
+    assert_equal(gunzip(source), 11)
+    assert_equal(self.read("chr1.fa"), ">chr1\nACGT\n")
+    assert_false(os.path.exists(source))
+
+  def test_decompress(self):
+    # Test decompressing several files at once
+    paths = [self.gzip("chr{}.fa.gz".format(chrom), ">chr{}\n".format(chrom))
+             for chrom in range(1, 5)]
+    paths.append(self.path("README"))
+
+    assert_equal(decompress(paths, jobs=2), 24)
+    assert_equal(self.read("chr4.fa"), ">chr4\n")
+
+  def test_verify(self):
+    # Test checking a BSD sum on disk (as printed by "sum")
+    with open(self.path("chr1.fa"), "w") as handle:
+      handle.write(">chr1\nACGT\n")
+
+    assert_equal(verify(self.path("chr1.fa"), "sum", "53588 1"),
+                 (True, "53588 1"))
+    assert_false(verify(self.path("chr1.fa"), "sum", "12345 1")[0])
+
+  def test_concatenate(self):
+    # Test concatenating files in order
+    for name in ("chr1.fa", "chr2.fa"):
+      with open(self.path(name), "w") as handle:
+        handle.write(">{}\n".format(name[:-3]))
+
+    written = concatenate([self.path("chr1.fa"), self.path("chr2.fa")],
+                          self.path("genome.fa"))
+
+    assert_equal(written, 12)
+    assert_equal(self.read("genome.fa"), ">chr1\n>chr2\n")
+    assert_false(os.path.exists(self.path("genome.fa.fai")))
+
+  def test_partial(self):
+    # Test that writing a file leaves a partial download for it alone
+    for name, data in (("chr1.fa", ">chr1\n"), ("genome.fa.part", ">ch")):
+      with open(self.path(name), "w") as handle:
+        handle.write(data)
+
+    concatenate([self.path("chr1.fa")], self.path("genome.fa"))
+    bgzip(self.path("genome.fa"), index=False)
+
+    assert_equal(self.read("genome.fa.part"), ">ch")
+    assert_equal(sorted(os.listdir(self.folder)),
+                 ["chr1.fa", "genome.fa.gz", "genome.fa.part"])
+
+  def test_index(self):
+    # Test indexing FASTA files in the same pass that writes them
+    paths = [self.gzip("chr1.fa.gz", ">chr1\nAC\nG\n"),
+             self.gzip("README.gz", "Not a FASTA file")]
+
+    decompress(paths, fasta=["*.fa"])
+
+    assert_equal(self.read("chr1.fa.fai"), "chr1\t3\t6\t2\t3\n")
+    assert_false(os.path.exists(self.path("README.fai")))
+
+    concatenate([self.path("chr1.fa"), self.path("chr1.fa")],
+                self.path("genome.fa"), index=True)
+
+    assert_equal(self.read("genome.fa.fai"),
+                 "chr1\t3\t6\t2\t3\nchr1\t3\t17\t2\t3\n")
+
+    # Files on disk are read once
+    os.remove(self.path("genome.fa.fai"))
+    faidx(self.path("genome.fa"))
+
+    assert_equal(self.read("genome.fa.fai"),
+                 "chr1\t3\t6\t2\t3\nchr1\t3\t17\t2\t3\n")
+
+    # ...along with the sequence dictionary
+    assert_in("\tSN:chr1\tLN:3\tM5:{}\tUR:file:{}\n"
+              .format(hashlib.md5("ACG").hexdigest(), self.path("genome.fa")),
+              self.read("genome.dict"))
+
+  def test_matches(self):
+    # Test that patterns match names with and without ".gz"
+    assert_true(matches("resources/decoy/hs37d5.fa.gz", ["*.fa"]))
+    assert_true(matches("resources/decoy/hs37d5.fa", ["*.fa"]))
+    assert_false(matches("resources/decoy/hs37d5.fa.gz.gzi", ["*.fa"]))
+
+  def test_archives(self):
+    # Test extracting tar and zip archives
+    member = self.path("chrM.fa")
+    with open(member, "w") as handle:
+      handle.write(">chrM\n")
+
+    with tarfile.open(self.path("chromFa.tar.gz"), "w:gz") as archive:
+      archive.add(member, "tar/chrM.fa")
+
+    archive = zipfile.ZipFile(self.path("chromFa.zip"), "w")
+    archive.write(member, "zip/chrM.fa")
+    archive.close()
+
+    assert_equal(untar(self.path("chromFa.tar.gz"), self.folder), 6)
+    assert_equal(unzip(self.path("chromFa.zip"), self.folder), 6)
+    assert_equal(self.read("tar/chrM.fa"), self.read("zip/chrM.fa"))
+
+    # FASTA files are indexed while they're extracted
+    untar(self.path("chromFa.tar.gz"), self.folder, fasta=["*.fa"])
+    unzip(self.path("chromFa.zip"), self.folder, fasta=["*.fa"])
+
+    assert_equal(self.read("tar/chrM.fa.fai"), "chrM\t0\t6\t0\t0\n")
+    assert_equal(self.read("zip/chrM.fa.fai"), "chrM\t0\t6\t0\t0\n")
+
+  def test_bgzip(self):
+    # Test recompressing a gzip file as BGZF with an index
+    source = self.gzip("dbsnp.vcf.gz", "#CHROM\n", "1\t100\n" * 20000)
+    data = gzip.open(source).read()
+
+    bgzip(source, threads=2)
+
+    assert_true(isBgzf(source))
+    assert_equal(gzip.open(source).read(), data)
+    assert_true(os.path.isfile(source + ".gzi"))
+
+    # Already BGZF: the index is worked out from the blocks
+    offsets = bgzfOffsets(source)
+    os.remove(source + ".gzi")
+
+    assert_equal(bgzip(source), 8 + 16 * len(offsets))
+    assert_equal(len(offsets), 1)
+
+  def test_bgzip_vcf(self):
+    # Test writing a tabix index in the pass that compresses the VCF
+    records = "".join("1\t{}\t.\tA\tG\n".format(pos * 50)
+                      for pos in range(1, 5000))
+    source = self.gzip("hapmap.vcf.gz", "#CHROM\tPOS\n", records)
+
+    bgzip(source, threads=2, vcf=True)
+    tbi = gzip.open(source + ".tbi").read()
+
+    # The same index is read from the blocks of a BGZF file upstream
+    os.remove(source + ".tbi")
+    bgzip(source, vcf=True)
+
+    assert_equal(gzip.open(source + ".tbi").read(), tbi)
+    assert_equal(bgzfBlocks(source)[1:-1], bgzfOffsets(source))
+    assert_equal(bgzfBlocks(source)[-1][1], len(records) + 11)
+
+  def test_bgzip_plain(self):
+    # Test compressing a file that was decompressed while downloading
+    with open(self.path("hs37d5.fa"), "w") as handle:
+      handle.write(">1\nACGT\n")
+
+    with open(self.path("hs37d5.fa.fai"), "w") as handle:
+      handle.write("1\t4\t3\t4\t5\n")
+
+    bgzip(self.path("hs37d5.fa"), index=False, fasta=True)
+
+    assert_false(os.path.exists(self.path("hs37d5.fa")))
+    assert_false(os.path.exists(self.path("hs37d5.fa.gz.gzi")))
+    assert_equal(gzip.open(self.path("hs37d5.fa.gz")).read(), ">1\nACGT\n")
+
+    # The index moves along with the FASTA file
+    assert_false(os.path.exists(self.path("hs37d5.fa.fai")))
+    assert_equal(self.read("hs37d5.fa.gz.fai"), "1\t4\t3\t4\t5\n")
+
+
+class TestWorkerPool:
+  """Testing when post processing is handed off to other processes."""
+
+  def setUp(self):
+    self.workers = WorkerPool()
+
+  def tearDown(self):
+    self.workers.close()
+
+  def test_started(self):
+    # Test that a started pool handles the tasks
+    self.workers.start(2)
+
+    assert_not_in(os.getpid(), self.workers.map(pid, range(4)))
+    assert_not_equal(self.workers.apply(pid, 0), os.getpid())
+
+  def test_threads(self):
+    # Test that nothing is forked once other threads are running
+    done = threading.Event()
+    thread = threading.Thread(target=done.wait)
+    thread.start()
+
+    try:
+      assert_equal(self.workers.map(pid, range(4), jobs=2),
+                   [os.getpid()] * 4)
+
+    finally:
+      done.set()
+      thread.join()
+
+  def test_apply(self):
+    # Test that work is done in-process without a started pool
+    assert_equal(self.workers.apply(pid, 0), os.getpid())
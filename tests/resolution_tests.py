@@ -0,0 +1,102 @@
+import threading
+
+from nose.tools import *  # PEP8 asserts
+from cosmid.core import Resolution
+
+
+class Server(object):
+  def __init__(self, url):
+    self.url = url
+
+
+class Resource(object):
+  def __init__(self, calls, url="ftp.broadinstitute.org", baseUrl="bundle"):
+    self.calls = calls
+    self.ftp = Server(url)
+    self.baseUrl = baseUrl
+
+  def versions(self):
+    self.calls.append("versions")
+    return ["2.5", "2.8"]
+
+  def latest(self):
+    return max(self.versions())
+
+  def paths(self, version):
+    return ["{}/{}".format(self.baseUrl, self.latest())]
+
+
+class OtherResource(Resource):
+  def versions(self):
+    self.calls.append("other")
+    return ["1.0"]
+
+
+class TestResolution:
+  """Testing sharing server lookups between resources."""
+
+  def setUp(self):
+    self.resolution = Resolution()
+    self.calls = []
+
+  def test_shared(self):
+    # Test that resources on the same server directory share lookups
+    dbsnp = self.resolution.bind(Resource(self.calls))
+    hapmap = self.resolution.bind(Resource(self.calls))
+
+    assert_equal(dbsnp.paths("2.8"), ["bundle/2.8"])
+    assert_equal(hapmap.latest(), "2.8")
+    assert_equal(hapmap.versions(), ["2.5", "2.8"])
+    assert_equal(self.calls, ["versions"])
+
+  def test_separate(self):
+    # Test that different directories and implementations aren't mixed up
+    self.resolution.bind(Resource(self.calls)).versions()
+    self.resolution.bind(Resource(self.calls, baseUrl="pub")).versions()
+    assert_equal(self.resolution.bind(OtherResource(self.calls)).versions(),
+                 ["1.0"])
+
+    assert_equal(self.calls, ["versions", "versions", "other"])
+
+  def test_copy(self):
+    # Test that changing a result doesn't affect other resources
+    resource = self.resolution.bind(Resource(self.calls))
+    resource.versions().append("3.0")
+
+    assert_equal(resource.versions(), ["2.5", "2.8"])
+
+  def test_failure(self):
+    # Test that failed lookups are tried again
+    attempts = []
+
+    def lookup():
+      attempts.append(1)
+      if len(attempts) == 1:
+        raise IOError("timed out")
+      return "ok"
+
+    assert_raises(IOError, self.resolution.call, "key", lookup)
+    assert_equal(self.resolution.call("key", lookup), "ok")
+
+  def test_threads(self):
+    # Test that concurrent lookups only happen once
+    release = threading.Event()
+
+    def lookup():
+      self.calls.append("lookup")
+      release.wait()
+      return "2.8"
+
+    results = []
+    threads = [threading.Thread(target=lambda: results.append(
+      self.resolution.call("key", lookup))) for _ in range(4)]
+
+    for thread in threads:
+      thread.start()
+
+    release.set()
+    for thread in threads:
+      thread.join()
+
+    assert_equal(results, ["2.8"] * 4)
+    assert_equal(self.calls, ["lookup"])
@@ -0,0 +1,32 @@
+from nose.tools import *  # PEP8 asserts
+from cosmid.search import SearchIndex
+
+
+class TestSearchIndex:
+  """Testing the trigram index over resources."""
+
+  def setUp(self):
+    self.index = SearchIndex.build([
+      ("ensembl_assembly", "Ensembl - automatically annotated human genome."),
+      ("gtf", "Human genes from Ensembl."),
+      ("ccds", "A curated database of generic element")
+    ])
+
+  def tearDown(self):
+    del self.index
+
+  def test_ids(self):
+    # Test matching (parts of) resource IDs despite typos
+    assert_equal(self.index.search("ensembl", limit=1),
+                 [("ensembl_assembly", 100)])
+    assert_equal(self.index.search("cdds", limit=1)[0][0], "ccds")
+
+  def test_docstrings(self):
+    # Test that docstring matches count (a little less than IDs)
+    assert_equal(self.index.search("genes", limit=1), [("gtf", 90)])
+
+  def test_dump(self):
+    # Test restoring a dumped index
+    index = SearchIndex.load(self.index.dump())
+
+    assert_equal(index.search("genome"), self.index.search("genome"))
@@ -0,0 +1,58 @@
+import json
+import os
+import subprocess
+import sys
+
+from nose.tools import *  # PEP8 asserts
+
+SCRIPT = os.path.join(os.path.dirname(__file__), "..", "scripts", "cosmid")
+
+# Only needed to actually download something
+HEAVY = ["yaml", "path", "sh", "ftplib", "multiprocessing", "cosmid.transfer",
+         "cosmid.store", "cosmid.resources.ensembl_assembly"]
+
+
+def modules(*arguments):
+  """Runs the CLI and returns the names of all modules it imported."""
+  code = ("import json, sys\n"
+          "sys.argv = {argv!r}\n"
+          "try:\n"
+          "  execfile({script!r}, {{'__name__': '__main__'}})\n"
+          "except SystemExit:\n"
+          "  pass\n"
+          "print('\\n' + json.dumps(sorted(sys.modules)))\n"
+          .format(argv=["cosmid"] + list(arguments), script=SCRIPT))
+
+  process = subprocess.Popen([sys.executable, "-c", code],
+                             stdout=subprocess.PIPE, stderr=subprocess.PIPE)
+  output, _ = process.communicate()
+
+  # The modules are listed on the last line
+  return json.loads(output.splitlines()[-1])
+
+
+def imported(*arguments):
+  """Runs the CLI and returns which of the heavy modules it imported."""
+  names = modules(*arguments)
+
+  return [name for name in HEAVY if name in names]
+
+
+class TestStartup:
+  """Testing that the quick commands don't import what they don't need."""
+
+  def test_version(self):
+    assert_equal(imported("--version"), [])
+
+  def test_help(self):
+    assert_equal(imported("--help"), [])
+
+  def test_help_colors(self):
+    # Nothing is printed in color
+    assert_not_in("termcolor", modules("--help"))
+
+  def test_list(self):
+    assert_equal(imported("list"), [])
+
+  def test_search(self):
+    assert_equal(imported("search", "ensembl"), [])
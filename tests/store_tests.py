@@ -0,0 +1,70 @@
+import gzip
+import os
+import shutil
+import tempfile
+
+from nose.tools import *  # PEP8 asserts
+from cosmid.store import ObjectStore
+
+
+class TestObjectStore:
+  """Testing the content-addressed store of downloaded files."""
+
+  def setUp(self):
+    self.folder = tempfile.mkdtemp()
+    self.store = ObjectStore(os.path.join(self.folder, ".objects"))
+
+  def tearDown(self):
+    shutil.rmtree(self.folder)
+
+  def write(self, name, data):
+    file_path = os.path.join(self.folder, name)
+    with open(file_path, "wb") as handle:
+      handle.write(data)
+
+    return file_path
+
+  def test_link(self):
+    # Test that stored files are hardlinked into place
+    source = self.write("dbsnp.vcf", "##fileformat=VCFv4.1\n")
+    stored = self.store.add(source, "md5", "ABCDEF")
+
+    assert_equal(self.store.find("md5", "abcdef"), stored)
+    assert_equal(self.store.find("md5", "012345"), None)
+
+    dest = self.store.link(stored, os.path.join(self.folder, "copy.vcf"))
+    assert_equal(os.stat(dest).st_ino, os.stat(source).st_ino)
+
+  def test_link_partial(self):
+    # Test that a partial download for the same file is left alone
+    source = self.write("dbsnp.vcf", "##fileformat=VCFv4.1\n")
+    stored = self.store.add(source, "md5", "ABCDEF")
+    partial = self.write("copy.vcf.part", "##file")
+
+    dest = self.store.link(stored, os.path.join(self.folder, "copy.vcf"))
+
+    with open(partial) as handle:
+      assert_equal(handle.read(), "##file")
+
+    assert_equal(sorted(os.listdir(self.folder)),
+                 [".objects", "copy.vcf", "copy.vcf.part", "dbsnp.vcf"])
+    assert_equal(os.stat(dest).st_ino, os.stat(source).st_ino)
+
+  def test_weak_checksums(self):
+    # Test that BSD sums are never used to identify files
+    source = self.write("Homo_sapiens.fa.gz", "ACGT")
+
+    assert_equal(self.store.add(source, "sum", "02372 2"), None)
+
+  def test_inflate(self):
+    # Test decompressing a stored gzip file into place
+    source = os.path.join(self.folder, "hapmap.vcf.gz")
+    archive = gzip.open(source, "wb")
+    archive.write("1\t100\t.\tA\tG\n")
+    archive.close()
+
+    stored = self.store.add(source, "md5", "0123ab")
+    dest = self.store.inflate(stored, os.path.join(self.folder, "hapmap.vcf"))
+
+    with open(dest) as handle:
+      assert_equal(handle.read(), "1\t100\t.\tA\tG\n")
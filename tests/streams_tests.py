@@ -0,0 +1,248 @@
+import gzip
+import hashlib
+import os
+import struct
+import tempfile
+from StringIO import StringIO
+
+from nose.tools import *  # PEP8 asserts
+from cosmid.streams import (Bgzf, BGZF_EOF, Checksum, dict_path, FastaIndex,
+                            Gunzip, reg2bin, TabixIndex)
+
+
+def gzipped(data):
+  """Compresses a string as a single gzip member."""
+  buf = StringIO()
+  archive = gzip.GzipFile(fileobj=buf, mode="wb")
+  archive.write(data)
+  archive.close()
+
+  return buf.getvalue()
+
+
+class TestGunzip:
+  """Testing decompressing gzip data on the fly."""
+
+  def setUp(self):
+    self.handle = StringIO()
+    self.writer = Gunzip(self.handle)
+
+  def tearDown(self):
+    del self.writer
+
+  def test_chunks(self):
+    # Test feeding compressed data in small chunks
+    data = gzipped("ACGT" * 1000)
+    for start in range(0, len(data), 7):
+      self.writer.write(data[start:start + 7])
+    self.writer.close()
+
+    assert_equal(self.handle.getvalue(), "ACGT" * 1000)
+    assert_equal(self.writer.consumed, len(data))
+
+  def test_multiple_members(self):
+    # Test concatenated gzip members (like BGZF files)
+    self.writer.write(gzipped(">chr1\n") + gzipped("ACGT\n"))
+    self.writer.close()
+
+    assert_equal(self.handle.getvalue(), ">chr1\nACGT\n")
+
+
+class TestChecksum:
+  """Testing checksumming data on the fly."""
+
+  def test_write(self):
+    # Test that data is passed through while checksummed
+    handle = StringIO()
+    checksum = Checksum(handle, "md5")
+    checksum.write("ACGT")
+    checksum.write("NNNN")
+
+    assert_equal(handle.getvalue(), "ACGTNNNN")
+    assert_equal(checksum.hexdigest(), hashlib.md5("ACGTNNNN").hexdigest())
+    assert_true(checksum.verify(hashlib.md5("ACGTNNNN").hexdigest().upper()))
+
+  def test_bsd_sum(self):
+    # Test BSD sums, ignoring zero padding (as printed by `sum`)
+    checksum = Checksum(algorithm="sum")
+    checksum.update("abc")
+
+    assert_equal(checksum.hexdigest(), "16556 1")
+    assert_true(checksum.verify("16556     1"))
+    assert_false(checksum.verify("16557 1"))
+
+  def test_sync(self):
+    # Test catching up with a partial file on disk
+    handle, partial = tempfile.mkstemp()
+    os.write(handle, "ACGTACGT")
+    os.close(handle)
+
+    checksum = Checksum(algorithm="sha256").sync(partial, 4)
+    checksum.update("ACGT")
+    os.remove(partial)
+
+    assert_equal(checksum.hexdigest(), hashlib.sha256("ACGTACGT").hexdigest())
+
+
+class TestBgzf:
+  """Testing compressing BGZF on the fly."""
+
+  def setUp(self):
+    self.data = "".join("{}\n".format(number) for number in range(40000))
+
+  def compress(self, threads):
+    handle = StringIO()
+    writer = Bgzf(handle, threads=threads)
+
+    for start in range(0, len(self.data), 5000):
+      writer.write(self.data[start:start + 5000])
+
+    writer.close()
+
+    return writer, handle.getvalue()
+
+  def test_blocks(self):
+    # Test that the output is gzip with blocks of the recorded sizes
+    writer, compressed = self.compress(threads=1)
+
+    assert_equal(gzip.GzipFile(fileobj=StringIO(compressed)).read(),
+                 self.data)
+    assert_true(compressed.endswith(BGZF_EOF))
+
+    for offset, _ in writer.offsets:
+      # Each recorded offset starts a block with the "BC" extra field
+      assert_equal(compressed[offset:offset + 4], "\x1f\x8b\x08\x04")
+      assert_equal(compressed[offset + 12:offset + 14], "BC")
+
+    # Blocks hold 0xff00 bytes each
+    assert_equal([uncompressed for _, uncompressed in writer.offsets],
+                 [0xff00 * (block + 1) for block in range(3)])
+
+  def test_threads(self):
+    # Test that compressing over several threads gives the same result
+    assert_equal(self.compress(threads=3)[1], self.compress(threads=1)[1])
+
+  def test_index(self):
+    # Test the ".gzi" layout: count followed by pairs of offsets
+    writer, _ = self.compress(threads=1)
+    index = writer.index()
+
+    assert_equal(struct.unpack("<Q", index[:8])[0], 3)
+    assert_equal(struct.unpack("<2Q", index[8:24]), writer.offsets[0])
+
+
+class TestFastaIndex:
+  """Testing building FASTA indexes on the fly."""
+
+  def setUp(self):
+    self.data = (">chr1 primary\n" + "ACGTACGTAC\n" * 3 + "ACG\n" +
+                 ">chr2\n" + "TTTT\n" * 2 + ">chrM\n")
+    self.expected = ("chr1\t33\t14\t10\t11\n"
+                     "chr2\t8\t57\t4\t5\n"
+                     "chrM\t0\t73\t0\t0\n")
+
+  def test_chunks(self):
+    # Test that the index doesn't depend on how the data is split up
+    for size in (1, 2, 5, 13, len(self.data)):
+      handle = StringIO()
+      index = FastaIndex(handle)
+
+      for start in range(0, len(self.data), size):
+        index.write(self.data[start:start + size])
+
+      assert_equal(index.dump(), self.expected)
+      assert_equal(handle.getvalue(), self.data)
+
+  def test_line_breaks(self):
+    # Test Windows line breaks and a missing line break at the end
+    index = FastaIndex()
+    index.update(">chr1\r\nACGT\r\nAC")
+
+    assert_equal(index.dump(), "chr1\t6\t7\t4\t6\n")
+
+  def test_line_lengths(self):
+    # Test that ragged sequences are refused like samtools does
+    index = FastaIndex()
+
+    assert_raises(ValueError, index.update, ">chr1\nACGT\nAC\nACGT\n")
+
+  def test_dictionary(self):
+    # Test that checksums are of the uppercase bases, however they're split
+    data = self.data.lower()
+
+    for size in (1, 3, len(data)):
+      index = FastaIndex()
+
+      for start in range(0, len(data), size):
+        index.update(data[start:start + size])
+
+      lines = index.dictionary("file:/tmp/genome.fa").splitlines()
+
+      assert_equal(lines[0], "@HD\tVN:1.6")
+      assert_equal(lines[1],
+                   "@SQ\tSN:chr1\tLN:33\tM5:{}\tUR:file:/tmp/genome.fa"
+                   .format(hashlib.md5("ACGTACGTAC" * 3 + "ACG").hexdigest()))
+      assert_equal(lines[2].split("\t")[3],
+                   "M5:" + hashlib.md5("TTTT" * 2).hexdigest())
+      assert_equal(lines[3].split("\t")[3], "M5:" + hashlib.md5().hexdigest())
+
+    assert_equal(dict_path("hs37d5.fa.gz"), "hs37d5.dict")
+    assert_equal(dict_path("resources/genome.fasta"), "resources/genome.dict")
+
+
+class TestTabixIndex:
+  """Testing building tabix indexes on the fly."""
+
+  def setUp(self):
+    self.header = "##fileformat=VCFv4.1\n#CHROM\tPOS\tID\tREF\tALT\n"
+    self.records = ["1\t100\t.\tA\tG\n", "1\t20000\t.\tAC\tA\n",
+                    "2\t5\t.\tN\t<DEL>\t.\t.\tSVTYPE=DEL;END=90000\n"]
+
+  def index(self, data):
+    index = TabixIndex()
+    for start in range(0, len(data), 7):
+      index.update(data[start:start + 7])
+
+    # A single block holds everything
+    tbi = index.dump([(0, 0), (100, len(data))])
+
+    return index, gzip.GzipFile(fileobj=StringIO(tbi)).read()
+
+  def test_layout(self):
+    # Test the header, sequence names and bins of the index
+    data = self.header + "".join(self.records)
+    index, tbi = self.index(data)
+
+    assert_equal(tbi[:4], "TBI\1")
+    assert_equal(struct.unpack("<8i", tbi[4:36]), (2, 2, 1, 2, 0, 35, 0, 4))
+    assert_equal(tbi[36:40], "1\x002\x00")
+
+    # The first record sits in its own bin and starts after the header
+    first = index.sequences[0]
+    assert_equal(first["bins"][reg2bin(99, 100)], [[len(self.header),
+                                                   len(self.header) + 12]])
+    assert_equal(first["records"], 2)
+    assert_equal(len(first["linear"]), 2)
+
+    # INFO/END widens the region of a record
+    assert_equal(index.sequences[1]["bins"].keys(), [reg2bin(4, 90000)])
+    assert_equal(len(index.sequences[1]["linear"]), 6)
+
+  def test_virtual_offsets(self):
+    # Test that offsets are split into block and offset within the block
+    data = self.header + "".join(self.records)
+    _, tbi = self.index(data)
+    start = len(self.header)
+
+    # After the header, names and the count of bins: bin, chunks, offsets
+    chunk = struct.unpack("<Ii2Q", tbi[44:68])
+    assert_equal(chunk, (reg2bin(99, 100), 1, start, start + 12))
+
+  def test_unsorted(self):
+    # Test that unsorted records are refused like tabix does
+    index = TabixIndex()
+    index.update("1\t200\t.\tA\tG\n")
+
+    assert_raises(ValueError, index.update, "1\t100\t.\tA\tG\n")
+    assert_raises(ValueError, index.update, "2\t1\t.\tA\tG\n"
+                                            "1\t300\t.\tA\tG\n")
@@ -0,0 +1,360 @@
+import ftplib
+import gzip
+import hashlib
+import os
+import shutil
+import tempfile
+import threading
+import time
+from StringIO import StringIO
+
+from nose.tools import *  # PEP8 asserts
+from cosmid.streams import Checksum
+from cosmid.transfer import Assembler, Batch, Dispatcher
+
+
+class LocalFTP(object):
+  """Local stand-in for a :class:`cosmid.core.FTP` server."""
+
+  def __init__(self, files):
+    self.files = files
+    self.saved = {}
+    self.lock = threading.Lock()
+
+  def commit(self, fullPath, dest, **kwargs):
+    if fullPath not in self.files:
+      raise IOError("550 No such file")
+
+    with self.lock:
+      self.saved[dest] = self.files[fullPath]
+
+
+class SlowFTP(LocalFTP):
+  """:class:`LocalFTP` that keeps track of how many files it sends at once."""
+
+  def __init__(self, files):
+    super(SlowFTP, self).__init__(files)
+    self.active = 0
+    self.most = 0
+
+  def commit(self, fullPath, dest, **kwargs):
+    with self.lock:
+      self.active += 1
+      self.most = max(self.most, self.active)
+
+    try:
+      # Give the other workers a chance to pile up
+      time.sleep(0.05)
+      super(SlowFTP, self).commit(fullPath, dest, **kwargs)
+
+    finally:
+      with self.lock:
+        self.active -= 1
+
+
+class WritingFTP(LocalFTP):
+  """:class:`LocalFTP` that writes the files and keeps the options used."""
+
+  def __init__(self, files):
+    super(WritingFTP, self).__init__(files)
+    self.options = {}
+
+  def commit(self, fullPath, dest, **kwargs):
+    super(WritingFTP, self).commit(fullPath, dest, **kwargs)
+    self.options[dest] = kwargs
+
+    with open(dest, "wb") as handle:
+      handle.write(self.files[fullPath])
+
+    return hashlib.md5(self.files[fullPath]).hexdigest()
+
+
+class CorruptingFTP(WritingFTP):
+  """:class:`WritingFTP` that garbles the first download of each file."""
+
+  def __init__(self, files):
+    super(CorruptingFTP, self).__init__(files)
+    self.commits = []
+
+  def commit(self, fullPath, dest, **kwargs):
+    digest = super(CorruptingFTP, self).commit(fullPath, dest, **kwargs)
+
+    with self.lock:
+      self.commits.append(fullPath)
+      first = self.commits.count(fullPath) == 1
+
+    if first:
+      with open(dest, "r+b") as handle:
+        handle.write("X")
+
+    return digest
+
+
+class FeedingFTP(object):
+  """Server that streams gzipped files, dropping the connection once."""
+
+  def __init__(self, files):
+    self.files = {}
+    self.dropped = set()
+
+    for name, data in files.items():
+      buf = StringIO()
+      archive = gzip.GzipFile(fileobj=buf, mode="wb")
+      archive.write(data)
+      archive.close()
+      self.files[name] = buf.getvalue()
+
+  def byteSize(self, fullPath):
+    if fullPath not in self.files:
+      raise ftplib.error_perm("550 No such file")
+
+    return len(self.files[fullPath])
+
+  def feed(self, fullPath, opener, retries=3, expected=None):
+    if fullPath not in self.files:
+      raise ftplib.error_perm("550 No such file")
+
+    data = self.files[fullPath]
+    writer = opener()
+
+    if fullPath not in self.dropped:
+      # Half the file arrives before the connection drops; start over
+      self.dropped.add(fullPath)
+      writer.write(data[:len(data) // 2])
+      writer = opener()
+
+    writer.write(data)
+    writer.close()
+
+
+class LocalResource(object):
+  """Minimal resource served by a :class:`LocalFTP`."""
+
+  def __init__(self, id, ftp):
+    self.id = id
+    self.ftp = ftp
+
+
+class TestDispatcher:
+  """Testing concurrent resolution and download of resources."""
+
+  def setUp(self):
+    self.folder = tempfile.mkdtemp()
+    self.ftp = LocalFTP({"pub/a.txt": "a", "pub/b.txt": "b"})
+    self.dispatcher = Dispatcher(jobs=3)
+
+  def tearDown(self):
+    del self.dispatcher
+    shutil.rmtree(self.folder)
+
+  def test_prepare(self):
+    # Test running lookups in the background
+    self.dispatcher.prepare(lambda value: value * 2, 2)
+    self.dispatcher.prepare(lambda value: value / 0, 1)
+
+    outcomes = sorted(self.dispatcher.prepared())
+    assert_equal(outcomes[0][0], (1,))
+    assert_true(isinstance(outcomes[0][2], ZeroDivisionError))
+    assert_equal(outcomes[1], ((2,), 4, None))
+
+  def test_jobs(self):
+    # Test that no more than `jobs` files are downloaded at once
+    files = dict(("pub/{}.txt".format(index), str(index))
+                 for index in range(6))
+    ftp = SlowFTP(files)
+    dispatcher = Dispatcher(jobs=2)
+    dispatcher.add(LocalResource("slow", ftp), sorted(files),
+                   [dl_path[4:] for dl_path in sorted(files)])
+
+    batches = list(dispatcher.results())
+
+    assert_equal(len(batches), 1)
+    assert_true(batches[0].ok)
+    assert_equal(ftp.most, 2)
+    assert_equal(len(ftp.saved), 6)
+
+  def test_finish(self):
+    # Test that only the last file to finish completes the batch
+    batch = Batch(None, ["a", "b"], ["a", "b"])
+
+    assert_false(batch.finish("a"))
+    assert_true(batch.finish("b", IOError("550")))
+    assert_false(batch.ok)
+
+  def test_results(self):
+    # Test that one failing file only fails its own resource
+    good = LocalResource("good", self.ftp)
+    bad = LocalResource("bad", self.ftp)
+    self.dispatcher.add(good, ["pub/a.txt", "pub/b.txt"], ["a.txt", "b.txt"])
+    self.dispatcher.add(bad, ["pub/a.txt", "pub/c.txt"], ["a2", "c.txt"])
+
+    batches = dict((batch.resource.id, batch)
+                   for batch in self.dispatcher.results())
+
+    assert_true(batches["good"].ok)
+    assert_equal(batches["good"].cloned, ["a.txt", "b.txt"])
+    assert_false(batches["bad"].ok)
+    assert_equal(batches["bad"].errors.keys(), ["pub/c.txt"])
+    assert_true(isinstance(batches["bad"].errors["pub/c.txt"], IOError))
+    assert_equal(self.ftp.saved["b.txt"], "b")
+
+  def test_assembly_errors(self):
+    # Test that failing parts are reported and the combined file dropped
+    ftp = FeedingFTP({"chr1.fa.gz": ">chr1\nACGT\n",
+                      "chr3.fa.gz": ">chr3\nACGT\n"})
+    resource = LocalResource("genome", ftp)
+    resource.stream = True
+    resource.assembly = "genome.fa"
+
+    dispatcher = Dispatcher(jobs=3, stream=True)
+    dl_paths = ["chr1.fa.gz", "chr2.fa.gz", "chr3.fa.gz"]
+    dispatcher.add(resource, dl_paths,
+                   [os.path.join(self.folder, dl_path) for dl_path in dl_paths],
+                   checksums={"chr3.fa.gz": ("md5", "0" * 32)})
+
+    batch = next(dispatcher.results())
+
+    assert_false(batch.ok)
+    assert_equal(sorted(batch.errors), ["chr2.fa.gz", "chr3.fa.gz"])
+    assert_true(isinstance(batch.errors["chr2.fa.gz"], ftplib.error_perm))
+    assert_true(isinstance(batch.errors["chr3.fa.gz"], IOError))
+    assert_equal(os.listdir(self.folder), [])
+
+  def test_slow_checksums(self):
+    # Test that BSD sums are checked on disk instead of while downloading
+    ftp = WritingFTP({"pub/a.fa.gz": "a" * 2000, "pub/b.fa.gz": "b" * 2000})
+    resource = LocalResource("ensembl", ftp)
+    resource.stream = True
+
+    bsd = Checksum(algorithm="sum")
+    bsd.update(ftp.files["pub/a.fa.gz"])
+
+    dispatcher = Dispatcher(jobs=2, stream=True)
+    dl_paths = ["pub/a.fa.gz", "pub/b.fa.gz"]
+    save_paths = [os.path.join(self.folder, "a.fa.gz"),
+                  os.path.join(self.folder, "b.fa.gz")]
+    dispatcher.add(resource, dl_paths, save_paths,
+                   checksums={"pub/a.fa.gz": ("sum", bsd.hexdigest()),
+                              "pub/b.fa.gz": ("sum", "00000 2")})
+
+    batch = next(dispatcher.results())
+
+    # The compressed file is kept to check it and only MD5 is computed inline
+    options = ftp.options[save_paths[0]]
+    assert_false(options["decompress"])
+    assert_equal(options["algorithm"], "md5")
+    assert_equal(options["checksum"], None)
+    assert_equal(batch.digests["pub/a.fa.gz"],
+                 "md5:" + hashlib.md5("a" * 2000).hexdigest())
+
+    assert_equal(batch.errors.keys(), ["pub/b.fa.gz"])
+    assert_true(isinstance(batch.errors["pub/b.fa.gz"], IOError))
+    assert_equal(os.listdir(self.folder), ["a.fa.gz"])
+
+  def test_slow_refetch(self):
+    # Test that a download failing its BSD sum is fetched once more
+    ftp = CorruptingFTP({"pub/a.fa.gz": "a" * 2000})
+    resource = LocalResource("ensembl", ftp)
+
+    bsd = Checksum(algorithm="sum")
+    bsd.update(ftp.files["pub/a.fa.gz"])
+
+    dispatcher = Dispatcher()
+    save_path = os.path.join(self.folder, "a.fa.gz")
+    dispatcher.add(resource, ["pub/a.fa.gz"], [save_path],
+                   checksums={"pub/a.fa.gz": ("sum", bsd.hexdigest())})
+
+    batch = next(dispatcher.results())
+
+    assert_true(batch.ok)
+    assert_equal(ftp.commits, ["pub/a.fa.gz", "pub/a.fa.gz"])
+    with open(save_path, "rb") as handle:
+      assert_equal(handle.read(), "a" * 2000)
+
+  def test_unchanged(self):
+    # Test that unchanged files are left alone but still handed back
+    resource = LocalResource("partial", self.ftp)
+    self.dispatcher.add(resource, ["pub/a.txt", "pub/b.txt"],
+                        ["a.txt.gz", "b.txt"],
+                        unchanged={"pub/a.txt": "a.txt"})
+
+    batch = next(self.dispatcher.results())
+
+    assert_true(batch.ok)
+    assert_equal(batch.cloned, ["a.txt", "b.txt"])
+    assert_equal(self.ftp.saved.keys(), ["b.txt"])
+
+
+class TestAssembler:
+  """Testing combining parts into one file while downloading."""
+
+  def setUp(self):
+    self.folder = tempfile.mkdtemp()
+    self.ftp = FeedingFTP({"chr1.fa.gz": ">chr1\n" + "ACGT\n" * 500,
+                           "chr2.fa.gz": ">chr2\nAC\nA\n"})
+
+  def tearDown(self):
+    shutil.rmtree(self.folder)
+
+  def read(self, name):
+    with open(os.path.join(self.folder, name)) as handle:
+      return handle.read()
+
+  def test_order(self):
+    # Test that parts finishing out of order are combined in order
+    self.ftp = FeedingFTP(dict(("chr{}.fa.gz".format(number),
+                                ">chr{}\n".format(number) + "ACGT\n" * 100)
+                               for number in range(1, 5)))
+    dest = os.path.join(self.folder, "genome.fa")
+
+    # Waiting parts spill to disk after a few bytes
+    assembler = Assembler(dest, 4, buffer=16)
+    assembler.fetch(self.ftp, "chr3.fa.gz", 2)
+    assembler.fetch(self.ftp, "chr1.fa.gz", 0)
+
+    # The rest arrive at the same time
+    threads = [threading.Thread(target=assembler.fetch,
+                                args=(self.ftp, "chr{}.fa.gz".format(index + 1),
+                                      index))
+               for index in (3, 1)]
+    for thread in threads:
+      thread.start()
+    for thread in threads:
+      thread.join()
+
+    assembler.close()
+
+    assert_equal(self.read("genome.fa"),
+                 "".join(">chr{}\n".format(number) + "ACGT\n" * 100
+                         for number in range(1, 5)))
+    assert_equal(sorted(os.listdir(self.folder)), ["genome.fa"])
+
+  def test_abort(self):
+    # Test that aborting leaves nothing behind
+    dest = os.path.join(self.folder, "genome.fa")
+    assembler = Assembler(dest, 2, buffer=16)
+    assembler.fetch(self.ftp, "chr2.fa.gz", 1)
+    assembler.abort()
+
+    assert_equal(os.listdir(self.folder), [])
+
+  def test_index(self):
+    # Test that the combined file is indexed in order, despite restarts
+    dest = os.path.join(self.folder, "genome.fa")
+    assembler = Assembler(dest, 2, index=True)
+
+    assembler.fetch(self.ftp, "chr2.fa.gz", 1)
+    assembler.fetch(self.ftp, "chr1.fa.gz", 0)
+    assembler.close()
+
+    with open(dest) as handle:
+      assert_equal(handle.read(), ">chr1\n" + "ACGT\n" * 500 +
+                   ">chr2\nAC\nA\n")
+
+    with open(dest + ".fai") as handle:
+      assert_equal(handle.read(), "chr1\t2000\t6\t4\t5\n"
+                                  "chr2\t3\t2512\t2\t3\n")
+
+    with open(os.path.join(self.folder, "genome.dict")) as handle:
+      assert_in("\tSN:chr1\tLN:2000\tM5:{}\t".format(
+        hashlib.md5("ACGT" * 500).hexdigest()), handle.read())